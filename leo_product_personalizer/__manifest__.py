@@ -1,6 +1,6 @@
 {
     'name': 'Product Personalization Editor',
-    'version': '1.0',
+    'version': '1.4',
     'category': 'Website/eCommerce',
     'summary': 'Allows customers to customize products directly from the product details page.',
     'description': """
@@ -21,12 +21,16 @@
     'depends': ['website_sale', 'product'],
     'data': [
         'security/ir.model.access.csv',
+        'data/sale_order_actions.xml',
+        'data/ir_cron_data.xml',
         'views/product_template_views.xml',
         'views/product_personalized_preview_template.xml',
         'views/website_templates.xml',
         'views/cart_templates.xml',
         'views/sale_order_line_personalization_views.xml',
         'views/sale_order_views.xml',
+        'views/personalization_request_stat_views.xml',
+        'views/sale_order_line_personalization_job_views.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -1,12 +1,54 @@
 # -*- coding: utf-8 -*-
+import base64
+import functools
+import hashlib
 import json
 import logging
-from odoo import http
-from odoo.http import request
+import tempfile
+from odoo import api, fields, http
+from odoo.exceptions import AccessError
+from odoo.http import Response, content_disposition, request
 from werkzeug.exceptions import NotFound
 
+from ..models.sale_order_line_personalization_draft import MAX_DRAFT_SIZE
+from ..tools.instrumentation import add_size, phase, start_profile
+from ..tools.print_export import iter_zip, render_jobs, start_render_pool
+
 _logger = logging.getLogger(__name__)
 
+RENDER_FORMATS = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+MAX_RENDER_SIZE = 8000
+# uploaded previews: largest accepted size, and size kept in memory while spooling
+MAX_PREVIEW_UPLOAD_SIZE = 20 * 1024 * 1024
+MAX_PREVIEW_UPLOADS = 20
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def profiled(func):
+    """Measure the decorated route on the sampled requests.
+
+    See ``personalization.request.stat`` and ``tools/instrumentation.py``.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        Stat = request.env["personalization.request.stat"]
+        if not Stat._is_sampled():
+            return func(self, *args, **kwargs)
+        with start_profile(request.httprequest.path, request.env.cr) as profile:
+            add_size("request", request.httprequest.content_length or 0)
+            result = func(self, *args, **kwargs)
+            if isinstance(result, Response):
+                add_size("response", result.content_length or 0)
+            else:
+                add_size("response", len(json.dumps(result, default=str)))
+        try:
+            Stat._log_profile(profile)
+        except Exception:
+            _logger.warning("Could not store the measure of %s", profile.route, exc_info=True)
+        return result
+    return wrapper
+
 
 class ProductPersonalizerController(http.Controller):
 
@@ -20,9 +62,22 @@ class ProductPersonalizerController(http.Controller):
         product = request.env["product.template"].sudo().browse(product_id)
         return request.render(
             "leo_product_personalizer.product_personalization_page",
-            {"product": product},
+            {
+                "product": product,
+                "initial_data_json": self._get_initial_data_json(product),
+            },
         )
 
+    def _get_initial_data_json(self, product, variant_id=None):
+        """Metadata of the active variant, embedded in the page so the
+        editor does not have to fetch it before drawing."""
+        if not product.exists():
+            return ""
+        payload = product._get_personalization_payload(
+            variant_id=variant_id, website_id=request.website.id,
+        )
+        return json.dumps(payload) if "error" not in payload else ""
+
     # ---------------------------------------------------------------------------
     # Product metadata endpoint
     # ---------------------------------------------------------------------------
@@ -32,85 +87,61 @@ class ProductPersonalizerController(http.Controller):
         auth="public",
         methods=["POST"],
         csrf=False,
+        website=True,
     )
+    @profiled
     def product_personalization_data(self, product_id=None, variant_id=None, **kwargs):
         if not product_id:
             return {"error": "Missing product_id"}
 
         product_template = request.env["product.template"].sudo().browse(int(product_id))
-        if not product_template:
-            return {"error": "Product not found"}
-
-        variants_data = self._get_variants_data(product_template)
-        active_variant_id = (
-            int(variant_id) if variant_id
-            else variants_data[0]["id"] if variants_data else None
-        )
-
-        if not active_variant_id:
-            return {"error": "No variants found"}
-
-        designs, design_types = self._get_variant_designs(active_variant_id)
-        fallback_image = self._get_image_url(None, active_variant_id)
-
-        return {
-            "product_id": product_template.id,
-            "variants": variants_data,
-            "active_variant_id": active_variant_id,
-            "design_types": design_types,
-            "default_design_type": design_types[0] if design_types else None,
-            "designs": designs,
-            "fallback_image_url": fallback_image,
-        }
-
-    def _get_variants_data(self, product_template):
-        """Get list of variants with their images."""
-        variants_data = []
-        for variant in product_template.product_variant_ids:
-            image_url = (
-                f"/web/image/product.product/{variant.id}/image_1920"
-                if variant.image_1920 else None
+        with phase("payload"):
+            return product_template._get_personalization_payload(
+                variant_id=int(variant_id) if variant_id else None,
+                website_id=request.website.id,
             )
-            variants_data.append({
-                "id": variant.id,
-                "name": variant.display_name,
-                "image_url": image_url,
-            })
-        return variants_data
-
-    def _get_variant_designs(self, variant_id):
-        """Get design configurations for a variant."""
-        variant = request.env["product.product"].sudo().browse(variant_id)
-        if not variant.exists():
-            return {}, []
-
-        designs = {}
-        design_types = []
 
-        for config in variant.design_config_ids:
-            design_type = config.design_type or str(config.id)
-            designs[design_type] = {
-                "id": config.id,
-                "design_type": config.design_type,
-                "image_url": self._get_image_url(config, variant_id),
-                "is_restricted_area": config.is_restricted_area,
-                "bound_x": float(config.bound_x or 0.0),
-                "bound_y": float(config.bound_y or 0.0),
-                "bound_width": float(config.bound_width or 0.0),
-                "bound_height": float(config.bound_height or 0.0),
-            }
-            design_types.append(design_type)
-        return designs, design_types
+    @http.route(
+        ["/shop/product_personalization_data/<int:product_id>"],
+        type="http",
+        auth="public",
+        methods=["GET"],
+        website=True,
+        sitemap=False,
+    )
+    def product_personalization_data_get(self, product_id, variant_id=None, **kwargs):
+        """Cacheable GET variant of ``/shop/product_personalization_data``.
 
-    def _get_image_url(self, config, variant_id):
-        """Get image URL for design config or fallback to variant image."""
-        if config and config.design_image:
-            return f"/web/image/product.design.config/{config.id}/design_image"
+        Answers 304 when the client (or a proxy) holds the current version.
+        """
+        try:
+            variant_id = int(variant_id) if variant_id else None
+        except ValueError:
+            raise NotFound()
+        product_template = request.env["product.template"].sudo().browse(product_id)
+        payload = product_template._get_personalization_payload(
+            variant_id=variant_id,
+            website_id=request.website.id,
+        )
+        return self._make_conditional_json_response(
+            payload, payload.get("version"), payload.get("last_modified"), "public, no-cache",
+        )
 
-        variant = request.env["product.product"].sudo().browse(variant_id)
-        if variant.exists() and variant.image_1920:
-            return f"/web/image/product.product/{variant_id}/image_1920"
-        return None
+    def _make_conditional_json_response(self, payload, etag, last_modified, cache_control):
+        """JSON response with validators, turned into a 304 when the request
+        conditions match."""
+        response = request.make_json_response(payload, headers=[("Cache-Control", cache_control)])
+        if etag:
+            response.set_etag(etag)
+        if last_modified:
+            response.last_modified = fields.Datetime.to_datetime(last_modified)
+        return response.make_conditional(request.httprequest)
+
+    def _defer_processing(self):
+        """Leave the image and JSON processing of the designs saved by this
+        request to the personalization job queue, when enabled."""
+        if request.env["sale.order.line.personalization"].sudo()._use_deferred_processing():
+            request.update_context(defer_personalization_processing=True)
 
     def _parse_designs_payload(self, designs):
         """Parse designs payload, handle string or dict format."""
@@ -121,53 +152,209 @@ class ProductPersonalizerController(http.Controller):
                 return {}
         return designs or {}
 
-    def _save_personalization(self, line, variant, designs):
-        """Save personalization records for a cart line."""
-        created = []
-        for config in variant.design_config_ids:
-            d_type = config.design_type
-            d_data = designs.get(d_type, {})
+    def _prepare_design_json(self, d_data):
+        """Design JSON of one side as stored, with its background URL.
 
-            personalized_json = d_data.get("json") if isinstance(d_data, dict) else None
-            preview_dataurl = d_data.get("preview") if isinstance(d_data, dict) else None
-            background_url = d_data.get("background_url") if isinstance(d_data, dict) else None
+        :return: (JSON string, parsed design or None when not parsable)
+        """
+        personalized_json = d_data.get("json") if isinstance(d_data, dict) else None
+        background_url = d_data.get("background_url") if isinstance(d_data, dict) else None
 
-            # Convert base64 preview to binary
-            preview_bin = False
-            if preview_dataurl and "data:image" in str(preview_dataurl):
-                # It's a data URL from canvas, extract base64 part
-                try:
-                    preview_bin = preview_dataurl.split(",", 1)[1].encode("utf-8")
-                except Exception as e:
-                    _logger.warning("Could not decode preview dataURL for design type %s: %s", d_type, e)
-            # Fallback to config image if no custom preview
-            if not preview_bin and config.design_image:
-                preview_bin = config.design_image
+        # Store background URL in personalized JSON if available
+        json_data = None
+        if personalized_json and isinstance(personalized_json, str):
+            try:
+                json_data = json.loads(personalized_json)
+                json_data["background_url"] = background_url
+                personalized_json = json.dumps(json_data)
+            except Exception as e:
+                _logger.warning("Failed to add background_url to JSON: %s", e)
+        personalized_json = personalized_json or json.dumps({"version": "5.3.0", "objects": [], "background_url": background_url})
+        return personalized_json, json_data
+
+    def _prepare_designs(self, variant, designs):
+        """Design JSON of each side of ``variant`` as stored, parsed and
+        checksummed once for the fingerprint and the saved values.
+
+        :return: ``{design type: (JSON string, parsed design or None, checksum)}``
+        """
+        Personalization = request.env["sale.order.line.personalization"].sudo()
+        prepared = {}
+        for config in variant.design_config_ids:
+            personalized_json, json_data = self._prepare_design_json(designs.get(config.design_type, {}))
+            prepared[config.design_type] = (
+                personalized_json, json_data, Personalization._get_json_checksum(personalized_json),
+            )
+        return prepared
 
-            # Store background URL in personalized JSON if available
-            if personalized_json and isinstance(personalized_json, str):
+    def _get_designs_fingerprint(self, prepared):
+        """Fingerprint of designs returned by ``_prepare_designs``, as the
+        ``personalization_fingerprint`` of a line holding them would be."""
+        return request.env["sale.order.line"]._get_personalization_fingerprint(
+            (design_type, checksum) for design_type, (_json, _data, checksum) in prepared.items()
+        )
+
+    def _prepare_personalization_vals(self, config, variant, d_data, personalization=None,
+                                      server_side_preview=False, prepared=None):
+        """Values to save one design side.
+
+        When ``personalization`` is given, only the values that differ from
+        it are returned: its JSON is compared by checksum and its preview by
+        the checksum of the shared image, so an unchanged side yields ``{}``.
+
+        :param tuple prepared: the side as returned by ``_prepare_designs``,
+            prepared from ``d_data`` when not given
+        """
+        Image = request.env["sale.order.line.personalization.image"].sudo()
+        Personalization = request.env["sale.order.line.personalization"].sudo()
+        d_type = config.design_type
+
+        preview_dataurl = d_data.get("preview") if isinstance(d_data, dict) else None
+        preview_checksum = d_data.get("preview_checksum") if isinstance(d_data, dict) else None
+        if prepared:
+            personalized_json, json_data, json_checksum = prepared
+        else:
+            personalized_json, json_data = self._prepare_design_json(d_data)
+            json_checksum = Personalization._get_json_checksum(personalized_json)
+
+        json_changed = not personalization or personalization.json_checksum != json_checksum
+        # the checksum is given, so the stored one is not computed again
+        vals = {"personalized_json": personalized_json, "json_checksum": json_checksum} if json_changed else {}
+
+        # Previews are shared by content hash: identical uploads and the
+        # config image fallback all point to a single stored image.
+        current_image = personalization.image_id if personalization else Image.browse()
+        preview_image = None
+        deferred = request.env.context.get("defer_personalization_processing")
+        if server_side_preview and deferred:
+            # rendered by the personalization job queue
+            if not json_changed:
+                preview_image = current_image
+        elif server_side_preview and isinstance(json_data, dict) and json_data.get("objects"):
+            # Rendered from the design itself, the client bitmap is ignored
+            if json_changed or not current_image:
                 try:
-                    json_data = json.loads(personalized_json)
-                    json_data["background_url"] = background_url
-                    personalized_json = json.dumps(json_data)
+                    with phase("render"):
+                        raw = Personalization._render_design(json_data, config, variant)
+                    add_size("preview", len(raw), design_type=d_type)
+                    with phase("image_store"):
+                        preview_image = Image._get_or_create(raw)
                 except Exception as e:
-                    _logger.warning("Failed to add background_url to JSON: %s", e)
-
-            vals = {
+                    _logger.warning("Could not render preview for design type %s: %s", d_type, e)
+            else:
+                preview_image = current_image
+        elif preview_checksum and isinstance(preview_checksum, str):
+            # Uploaded beforehand to /shop/personalize/upload_previews
+            if preview_checksum == current_image.checksum:
+                preview_image = current_image
+            else:
+                preview_image = Image.search([("checksum", "=", preview_checksum)], limit=1)
+                if not preview_image:
+                    _logger.warning("Unknown uploaded preview %s for design type %s", preview_checksum, d_type)
+        elif preview_dataurl and "data:image" in str(preview_dataurl):
+            # It's a data URL from canvas, extract base64 part
+            try:
+                with phase("image_decode"):
+                    raw = base64.b64decode(preview_dataurl.split(",", 1)[1])
+                    checksum = hashlib.sha1(raw).hexdigest()
+                add_size("preview", len(raw), design_type=d_type)
+                if checksum == current_image.checksum:
+                    preview_image = current_image
+                else:
+                    with phase("image_store"):
+                        preview_image = Image._get_or_create(raw, checksum=checksum)
+            except Exception as e:
+                _logger.warning("Could not decode preview dataURL for design type %s: %s", d_type, e)
+        elif not json_changed and current_image:
+            preview_image = current_image
+        # Fallback to config image if no custom preview
+        if not preview_image and config.has_design_image:
+            with phase("image_store"):
+                preview_image = Image._get_or_create_from_field(config, "design_image")
+
+        preview_image = preview_image or Image.browse()
+        if preview_image != current_image or not personalization:
+            vals["image_id"] = preview_image.id
+        return vals
+
+    def _prepare_personalization_create_vals(self, line, variant, designs, server_side_preview=False,
+                                             prepared=None):
+        """Values to create the personalization records of a new cart line.
+
+        :param dict prepared: ``designs`` as returned by ``_prepare_designs``
+        """
+        vals_list = []
+        prepared = prepared or {}
+        for config in variant.design_config_ids:
+            d_type = config.design_type
+            vals = self._prepare_personalization_vals(
+                config, variant, designs.get(d_type, {}), server_side_preview=server_side_preview,
+                prepared=prepared.get(d_type),
+            )
+            vals.update({
                 "sale_order_line_id": line.id,
                 "design_type": d_type,
                 "design_config_id": config.id,
-                "personalized_json": personalized_json or json.dumps({"version": "5.3.0", "objects": [], "background_url": background_url}),
-                "product_image": preview_bin,
-            }
-
-            try:
-                rec = request.env["sale.order.line.personalization"].sudo().create(vals)
-                created.append(rec.id)
-            except Exception as e:
-                _logger.exception("Error saving personalization for %s: %s", d_type, e)
+            })
+            vals_list.append(vals)
+        return vals_list
+
+    def _save_personalization(self, line, variant, designs, prepared=None):
+        """Save personalization records for a cart line; errors propagate so
+        the caller rolls back the line with them."""
+        Personalization = request.env["sale.order.line.personalization"].sudo()
+        vals_list = self._prepare_personalization_create_vals(
+            line, variant, designs, server_side_preview=Personalization._use_server_side_preview(),
+            prepared=prepared,
+        )
+        with phase("create"):
+            return Personalization.create(vals_list).ids
+
+    def _upsert_personalization(self, line, designs):
+        """Update the personalization records of a cart line side by side.
+
+        Only the sides whose JSON or preview changed are written; sides that
+        no longer have a design config are removed.
+
+        :return: (ids of all personalizations, design types that changed)
+        """
+        Personalization = request.env["sale.order.line.personalization"].sudo()
+        server_side_preview = Personalization._use_server_side_preview()
+        existing = {}
+        obsolete = Personalization
+        for personalization in line.sudo().personalization_ids:
+            if personalization.design_type in existing:
+                obsolete |= personalization
+            else:
+                existing[personalization.design_type] = personalization
 
-        return created
+        kept = Personalization
+        changed_types = []
+        for config in line.product_id.design_config_ids:
+            d_type = config.design_type
+            personalization = existing.pop(d_type, Personalization)
+            vals = self._prepare_personalization_vals(
+                config, line.product_id, designs.get(d_type, {}),
+                personalization=personalization, server_side_preview=server_side_preview,
+            )
+            if not personalization:
+                vals.update({
+                    "sale_order_line_id": line.id,
+                    "design_type": d_type,
+                    "design_config_id": config.id,
+                })
+                personalization = Personalization.create(vals)
+            elif vals:
+                personalization.write(vals)
+            if vals:
+                changed_types.append(d_type)
+            kept |= personalization
+
+        obsolete |= Personalization.concat(*existing.values())
+        if obsolete:
+            changed_types += obsolete.mapped("design_type")
+            obsolete.unlink()
+        return kept.ids, changed_types
 
     @http.route(
         ["/shop/cart/update_personalization"],
@@ -177,6 +364,7 @@ class ProductPersonalizerController(http.Controller):
         csrf=False,
         website=True,
     )
+    @profiled
     def update_personalization(self, variant_id=None, designs=None, add_qty=1, **kwargs):
         """Add product with personalization to cart."""
         if not variant_id:
@@ -187,61 +375,227 @@ class ProductPersonalizerController(http.Controller):
             return {"error": "Invalid designs payload"}
 
         try:
+            self._defer_processing()
             website = request.env["website"].sudo().get_current_website()
             order_sudo = request.cart or website._create_cart()
 
-            values = order_sudo.with_context(skip_cart_verification=True)._cart_add(
-                product_id=int(variant_id),
-                quantity=float(add_qty),
-            )
-
-            line_id = values.get("line_id")
-            if not line_id:
-                return {"error": "Could not create cart line"}
-
-            line = request.env["sale.order.line"].sudo().browse(int(line_id))
             variant = request.env["product.product"].sudo().browse(int(variant_id))
-            created = self._save_personalization(line, variant, designs)
+            # the same designs already in the cart only add to that line
+            prepared = self._prepare_designs(variant, designs)
+            fingerprint = self._get_designs_fingerprint(prepared)
+            # a line is only added along with its designs
+            with request.env.cr.savepoint():
+                with phase("cart_add"):
+                    values = order_sudo.with_context(
+                        skip_cart_verification=True, personalization_fingerprint=fingerprint,
+                    )._cart_add(
+                        product_id=variant.id,
+                        quantity=float(add_qty),
+                    )
+
+                line_id = values.get("line_id")
+                if not line_id:
+                    return {"error": "Could not create cart line"}
+
+                line = request.env["sale.order.line"].sudo().browse(int(line_id))
+                merged = bool(line.personalization_ids)
+                if merged:
+                    created = line.personalization_ids.ids
+                else:
+                    created = self._save_personalization(line, variant, designs, prepared)
+            request.env["sale.order.line.personalization.draft"].sudo()._discard(
+                self._get_draft_key(variant_id=variant.id)
+            )
 
             return {
                 "success": True,
                 "line_id": line.id,
                 "created_personalization_ids": created,
+                "merged": merged,
                 "cart_quantity": order_sudo.cart_quantity,
             }
         except Exception as e:
             _logger.exception("Cart update error: %s", e)
             return {"error": str(e)}
 
+    @http.route(
+        ["/shop/cart/update_personalization_bulk"],
+        type="jsonrpc",
+        auth="public",
+        methods=["POST"],
+        csrf=False,
+        website=True,
+    )
+    @profiled
+    def update_personalization_bulk(self, entries=None, **kwargs):
+        """Add several personalized variants to the cart in one call.
+
+        ``entries`` is a list of ``{"variant_id", "add_qty", "designs"}``.
+        Each entry is applied in its own savepoint so an invalid one does not
+        prevent the others; the personalization records of all the valid
+        entries are then created with a single ``create()``.
+
+        :return: ``results`` in the order of ``entries``, each with either
+            ``line_id`` and ``created_personalization_ids`` or ``error``
+        """
+        if not isinstance(entries, list) or not entries:
+            return {"error": "Missing entries"}
+
+        self._defer_processing()
+        Personalization = request.env["sale.order.line.personalization"].sudo()
+        server_side_preview = Personalization._use_server_side_preview()
+        cr = request.env.cr
+        results = []
+        vals_list = []
+        entry_slices = []
+        # line id -> results of the later entries merged into it
+        pending_lines = {}
+        # (variant id, fingerprint) -> line id, for the lines created here
+        batch_lines = {}
+        try:
+            with cr.savepoint():
+                website = request.env["website"].sudo().get_current_website()
+                order_sudo = request.cart or website._create_cart()
+
+                for entry in entries:
+                    variant_id = entry.get("variant_id") if isinstance(entry, dict) else None
+                    if not variant_id:
+                        results.append({"success": False, "error": "Missing variant_id"})
+                        continue
+                    designs = self._parse_designs_payload(entry.get("designs"))
+                    if not isinstance(designs, dict):
+                        results.append({"success": False, "variant_id": variant_id, "error": "Invalid designs payload"})
+                        continue
+                    try:
+                        with cr.savepoint():
+                            variant = request.env["product.product"].sudo().browse(int(variant_id))
+                            prepared = self._prepare_designs(variant, designs)
+                            fingerprint = self._get_designs_fingerprint(prepared)
+                            with phase("cart_add"):
+                                values = order_sudo.with_context(
+                                    skip_cart_verification=True,
+                                    personalization_fingerprint=fingerprint,
+                                    # designs of an earlier entry, not created yet
+                                    personalization_line_id=batch_lines.get((variant.id, fingerprint)),
+                                )._cart_add(
+                                    product_id=variant.id,
+                                    quantity=float(entry.get("add_qty") or 1),
+                                )
+                            line_id = values.get("line_id")
+                            if not line_id:
+                                raise ValueError("Could not create cart line")
+                            line = request.env["sale.order.line"].sudo().browse(int(line_id))
+                            # an identical line, from the cart or an earlier entry
+                            merged = bool(line.personalization_ids) or line.id in pending_lines
+                            entry_vals = [] if merged else self._prepare_personalization_create_vals(
+                                line, variant, designs, server_side_preview=server_side_preview,
+                                prepared=prepared,
+                            )
+                    except Exception as e:
+                        _logger.warning("Bulk cart entry for variant %s failed: %s", variant_id, e)
+                        results.append({"success": False, "variant_id": variant_id, "error": str(e)})
+                        continue
+                    result = {"success": True, "variant_id": variant.id, "line_id": line.id, "merged": merged}
+                    if merged:
+                        result["created_personalization_ids"] = line.personalization_ids.ids
+                        pending_lines.setdefault(line.id, []).append(len(results))
+                    else:
+                        entry_slices.append((len(results), len(vals_list), len(entry_vals)))
+                        pending_lines[line.id] = []
+                        batch_lines[variant.id, fingerprint] = line.id
+                    results.append(result)
+                    vals_list.extend(entry_vals)
+
+                with phase("create"):
+                    created_ids = Personalization.create(vals_list).ids
+                for result_index, start, count in entry_slices:
+                    results[result_index]["created_personalization_ids"] = created_ids[start:start + count]
+                    for merged_index in pending_lines[results[result_index]["line_id"]]:
+                        results[merged_index]["created_personalization_ids"] = created_ids[start:start + count]
+        except Exception as e:
+            _logger.exception("Bulk cart update error: %s", e)
+            return {"error": str(e)}
+
+        return {
+            "success": all(result["success"] for result in results),
+            "results": results,
+            "cart_quantity": order_sudo.cart_quantity,
+        }
+
     @http.route(
         ["/shop/cart/preview_personalization"],
         type="jsonrpc",
         auth="public",
         methods=["POST"],
         csrf=False,
+        website=True,
     )
-    def preview_personalization(self, line_id=None, **kwargs):
-        """Get preview images for a cart line."""
+    @profiled
+    def preview_personalization(self, line_id=None, size="medium", **kwargs):
+        """Get preview images for a cart line.
+
+        ``preview_url`` points at the ``size`` derivative (small, medium,
+        large or original); ``preview_urls`` lists all of them.
+        """
         if not line_id:
             return {"error": "Missing line_id"}
 
-        line = request.env["sale.order.line"].sudo().browse(int(line_id))
-        if not line.exists():
+        line = self._get_visitor_line(line_id)
+        if not line:
             return {"error": "Cart line not found"}
+        return self._get_preview_payload(line, size)
+
+    @http.route(
+        ["/shop/cart/preview_personalization/<int:line_id>"],
+        type="http",
+        auth="public",
+        methods=["GET"],
+        website=True,
+        sitemap=False,
+    )
+    def preview_personalization_get(self, line_id, size="medium", **kwargs):
+        """Cacheable GET variant of ``/shop/cart/preview_personalization``.
+
+        The validators come from the write dates of the personalizations,
+        so the browser revalidates with a 304 until the design is edited.
+        """
+        line = self._get_visitor_line(line_id)
+        if not line:
+            raise NotFound()
+        payload = self._get_preview_payload(line, size)
+        personalizations = line.personalization_ids
+        last_modified = max(personalizations.mapped("write_date") + [line.write_date])
+        etag = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+        return self._make_conditional_json_response(payload, etag, last_modified, "private, no-cache")
+
+    def _get_visitor_line(self, line_id):
+        """The line ``line_id`` (in sudo) when it is in the current cart or in
+        an order the visitor may read, e.g. from the portal; an empty
+        recordset otherwise."""
+        try:
+            line = request.env["sale.order.line"].sudo().browse(int(line_id)).exists()
+        except ValueError:
+            return request.env["sale.order.line"]
+        if not line or (request.cart and line.order_id == request.cart):
+            return line
+        try:
+            request.env["sale.order"].browse(line.order_id.id).check_access("read")
+        except AccessError:
+            return line.browse()
+        return line
 
+    def _get_preview_payload(self, line, size="medium"):
         previews = []
-        for personalization in line.personalization_ids:
+        for personalization in line.sudo().personalization_ids:
             preview_data = {
                 "design_type": personalization.design_type,
                 "design_title": personalization.design_title or personalization.design_type,
             }
 
-            if personalization.product_image:
-                preview_data["preview_url"] = (
-                    f"/web/image/sale.order.line.personalization/{personalization.id}/product_image"
-                )
-            else:
-                preview_data["preview_url"] = None
+            # content-addressed, so the URLs can be cached for good
+            preview_urls = personalization._get_preview_urls()
+            preview_data["preview_url"] = preview_urls.get(size) or preview_urls.get("medium")
+            preview_data["preview_urls"] = preview_urls
 
             previews.append(preview_data)
 
@@ -264,13 +618,20 @@ class ProductPersonalizerController(http.Controller):
         if not line.exists():
             raise NotFound()
 
+        product = line.product_id.product_tmpl_id
         return request.render(
             "leo_product_personalizer.product_personalization_page",
             {
-                "product": line.product_id.product_tmpl_id,
+                "product": product,
                 "edit_mode": True,
                 "line_id": line.id,
                 "variant_id": line.product_id.id,
+                "initial_data_json": self._get_initial_data_json(product, line.product_id.id),
+                "line_designs_json": json.dumps({
+                    "success": True,
+                    "line_id": line.id,
+                    "designs": self._get_line_designs(line),
+                }),
             },
         )
 
@@ -282,6 +643,7 @@ class ProductPersonalizerController(http.Controller):
         csrf=False,
         website=True,
     )
+    @profiled
     def get_line_personalization(self, line_id=None, **kwargs):
         """Get personalization data for editing an existing cart line."""
         if not line_id:
@@ -291,8 +653,16 @@ class ProductPersonalizerController(http.Controller):
         if not line.exists():
             return {"error": "Cart line not found", "success": False}
 
+        return {
+            "success": True,
+            "line_id": line.id,
+            "designs": self._get_line_designs(line),
+        }
+
+    def _get_line_designs(self, line):
+        """Saved designs of a cart line, by design type, as the editor loads them."""
         designs = {}
-        for personalization in line.personalization_ids:
+        for personalization in line.sudo().personalization_ids:
             design_type = personalization.design_type
             try:
                 personalized_json = personalization.personalized_json
@@ -328,13 +698,9 @@ class ProductPersonalizerController(http.Controller):
                     "background_url": None,
                     "is_customized": False,
                 }
+        return designs
+
 
-        return {
-            "success": True,
-            "line_id": line.id,
-            "designs": designs,
-        }    
-    
     @http.route(
         ["/shop/cart/update_line_personalization"],
         type="jsonrpc",
@@ -343,6 +709,7 @@ class ProductPersonalizerController(http.Controller):
         csrf=False,
         website=True,
     )
+    @profiled
     def update_line_personalization(self, line_id=None, designs=None, add_qty=1, **kwargs):
         """Update personalization records for an existing cart line."""
         if not line_id:
@@ -353,25 +720,285 @@ class ProductPersonalizerController(http.Controller):
             return {"error": "Invalid designs payload", "success": False}
 
         try:
+            self._defer_processing()
             line = request.env["sale.order.line"].sudo().browse(int(line_id))
             if not line.exists():
                 return {"error": "Cart line not found", "success": False}
             
             # Update quantity
-            line.sudo().write({"product_uom_qty": float(add_qty)})
-            
-            # Delete old personalization records
-            _logger.info(f"Deleting {len(line.personalization_ids)} old personalization records for line {line_id}")
-            line.personalization_ids.unlink()
-            
-            # Create new personalization records with updated data
-            created = self._save_personalization(line, line.product_id, designs)
+            if line.product_uom_qty != float(add_qty):
+                line.sudo().write({"product_uom_qty": float(add_qty)})
+
+            # Rewrite only the sides that actually changed
+            with phase("upsert"):
+                personalization_ids, changed_types = self._upsert_personalization(line, designs)
+            request.env["sale.order.line.personalization.draft"].sudo()._discard(
+                self._get_draft_key(line_id=line.id)
+            )
 
             return {
                 "success": True,
                 "line_id": line.id,
-                "updated_personalization_ids": created,
+                "updated_personalization_ids": personalization_ids,
+                "changed_design_types": changed_types,
             }
         except Exception as e:
             _logger.exception("Update line personalization error: %s", e)
             return {"error": str(e), "success": False}
+
+    # ---------------------------------------------------------------------------
+    # Preview uploads
+    # ---------------------------------------------------------------------------
+    @http.route(
+        ["/shop/personalize/upload_previews"],
+        type="http",
+        auth="public",
+        methods=["POST"],
+        csrf=False,
+        website=True,
+    )
+    @profiled
+    def upload_previews(self, design_type=None, variant_id=None, line_id=None, **kwargs):
+        """Store preview images sent as binary, instead of data URLs in the
+        JSON-RPC calls.
+
+        Either a multipart form with one file per design type (the field name
+        is the design type), or a raw image body for ``design_type``. The
+        previews are for the sides of ``variant_id``, or of the cart line
+        ``line_id`` of the current cart. The answer gives the
+        ``preview_checksum`` to send with each design.
+        """
+        design_types = self._get_editable_design_types(variant_id=variant_id, line_id=line_id)
+        if not design_types:
+            return request.make_json_response({"error": "Unknown product or cart line"}, status=403)
+
+        httprequest = request.httprequest
+        if httprequest.mimetype.startswith("image/"):
+            if not design_type:
+                return request.make_json_response({"error": "Missing design_type"}, status=400)
+            uploads = {design_type: httprequest.stream}
+        else:
+            uploads = {name: upload.stream for name, upload in httprequest.files.items()}
+        if not uploads:
+            return request.make_json_response({"error": "No preview sent"}, status=400)
+        if len(uploads) > min(len(design_types), MAX_PREVIEW_UPLOADS):
+            return request.make_json_response({"error": "Too many previews"}, status=400)
+
+        Image = request.env["sale.order.line.personalization.image"].sudo()
+        previews, errors = {}, {}
+        for d_type, stream in uploads.items():
+            if d_type not in design_types:
+                errors[d_type] = "Unknown design type"
+                continue
+            try:
+                with phase("image_store"):
+                    spool, checksum, size = self._spool_upload(stream)
+                    with spool:
+                        add_size("preview", size, design_type=d_type)
+                        image = Image._get_or_create_from_file(spool, checksum)
+                previews[d_type] = {"checksum": image.checksum, "size": size}
+            except Exception as e:
+                _logger.warning("Could not store uploaded preview for design type %s: %s", d_type, e)
+                errors[d_type] = str(e)
+        return request.make_json_response({"success": not errors, "previews": previews, "errors": errors})
+
+    def _get_editable_design_types(self, variant_id=None, line_id=None):
+        """Design types the visitor may upload previews or save drafts for:
+        the sides of a personalizable variant, or of a line of the current
+        cart."""
+        try:
+            if line_id:
+                line = request.env["sale.order.line"].sudo().browse(int(line_id)).exists()
+                if not line or not request.cart or line.order_id != request.cart:
+                    return set()
+                variant = line.product_id
+            elif variant_id:
+                variant = request.env["product.product"].sudo().browse(int(variant_id)).exists()
+            else:
+                return set()
+        except ValueError:
+            return set()
+        if not variant.product_tmpl_id.is_product_personalization:
+            return set()
+        return set(variant.design_config_ids.mapped("design_type"))
+
+    def _spool_upload(self, stream):
+        """Copy an upload stream to a spooled file, hashing it on the way.
+
+        :return: (spooled file rewound, SHA-1, size in bytes)
+        :raise ValueError: when empty or over ``MAX_PREVIEW_UPLOAD_SIZE``
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+        sha1 = hashlib.sha1()
+        size = 0
+        try:
+            while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_PREVIEW_UPLOAD_SIZE:
+                    raise ValueError("Preview over %s bytes" % MAX_PREVIEW_UPLOAD_SIZE)
+                sha1.update(chunk)
+                spool.write(chunk)
+            if not size:
+                raise ValueError("Empty preview")
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool, sha1.hexdigest(), size
+
+    # ---------------------------------------------------------------------------
+    # Draft autosave
+    # ---------------------------------------------------------------------------
+    def _get_draft_key(self, line_id=None, variant_id=None):
+        Draft = request.env["sale.order.line.personalization.draft"]
+        return Draft._get_draft_key(request.session.sid, line_id=line_id, variant_id=variant_id)
+
+    @http.route(
+        ["/shop/personalize/draft/load"],
+        type="jsonrpc",
+        auth="public",
+        methods=["POST"],
+        csrf=False,
+        website=True,
+    )
+    def load_personalization_draft(self, line_id=None, variant_id=None, **kwargs):
+        """Autosaved designs of this session for a cart line or a variant."""
+        if not line_id and not variant_id:
+            return {"error": "Missing line_id or variant_id", "success": False}
+        Draft = request.env["sale.order.line.personalization.draft"].sudo()
+        draft_key = self._get_draft_key(line_id=line_id, variant_id=variant_id)
+        return {"success": True, "drafts": Draft._get_drafts(draft_key)}
+
+    @http.route(
+        ["/shop/personalize/draft/sync"],
+        type="jsonrpc",
+        auth="public",
+        methods=["POST"],
+        csrf=False,
+        website=True,
+    )
+    @profiled
+    def sync_personalization_draft(self, design_type=None, base_revision=0, patch=None, design=None,
+                                   line_id=None, variant_id=None, **kwargs):
+        """Autosave the edits of one side as a JSON patch against
+        ``base_revision``, or as the full ``design``.
+
+        A ``conflict`` answer asks the editor to resend its full design.
+        """
+        if not design_type or (not line_id and not variant_id):
+            return {"error": "Missing design_type, line_id or variant_id", "success": False}
+        if design is not None and not isinstance(design, dict):
+            return {"error": "Invalid design", "success": False}
+        if (request.httprequest.content_length or 0) > MAX_DRAFT_SIZE:
+            return {"error": "Design too large", "success": False}
+        if design_type not in self._get_editable_design_types(variant_id=variant_id, line_id=line_id):
+            return {"error": "Unknown product, cart line or design type", "success": False}
+        Draft = request.env["sale.order.line.personalization.draft"].sudo()
+        with phase("draft_sync"):
+            result = Draft._sync(
+                self._get_draft_key(line_id=line_id, variant_id=variant_id),
+                design_type,
+                int(base_revision or 0),
+                patch=patch,
+                design=design,
+                line_id=int(line_id) if line_id else None,
+                variant_id=int(variant_id) if variant_id and not line_id else None,
+            )
+        return dict(result, success=not result.get("conflict") and not result.get("error"))
+
+    @http.route(
+        ["/leo_product_personalizer/render/<int:personalization_id>"],
+        type="http",
+        auth="user",
+    )
+    def render_personalization(self, personalization_id, size=None, image_format="png", **kwargs):
+        """Download a design rendered server-side, e.g. as a print file.
+
+        Only users who can read the order of the design may download it.
+        """
+        personalization = request.env["sale.order.line.personalization"].browse(personalization_id)
+        order = personalization.exists().sale_order_line_id.order_id
+        if not order:
+            raise NotFound()
+        try:
+            order.check_access("read")
+        except AccessError:
+            raise NotFound()
+        image_format = image_format.lower() if image_format.lower() in RENDER_FORMATS else "png"
+        size = self._get_render_size(size, default=personalization._get_print_size())
+        content = personalization.sudo()._render_preview(size=size, output_format=image_format)
+        filename = "%s-%s.%s" % (
+            personalization.sale_order_line_id.order_id.name or "design",
+            personalization.design_type,
+            "jpg" if image_format == "jpeg" else image_format,
+        )
+        return request.make_response(content, headers=[
+            ("Content-Type", RENDER_FORMATS[image_format]),
+            ("Content-Disposition", content_disposition(filename)),
+        ])
+
+    @http.route(
+        ["/leo_product_personalizer/export/print_files"],
+        type="http",
+        auth="user",
+    )
+    def export_print_files(self, order_ids="", size=None, image_format="png", **kwargs):
+        """Stream a ZIP of the print files of the given orders.
+
+        The archive is produced while the response is sent, with its own
+        cursor: the request cursor is closed by then.
+        """
+        try:
+            ids = [int(order_id) for order_id in order_ids.split(",") if order_id]
+        except ValueError:
+            raise NotFound()
+        orders = request.env["sale.order"].search([("id", "in", ids)])
+        if not orders:
+            raise NotFound()
+        image_format = image_format.lower() if image_format.lower() in RENDER_FORMATS else "png"
+        size = self._get_render_size(size)
+
+        registry = request.env.registry
+        uid, context, order_ids = request.env.uid, dict(request.env.context), orders.ids
+        workers = orders.sudo()._get_print_export_workers()
+
+        def generate():
+            # the request cursor is closed by now and the export cursor is
+            # not opened yet: nothing in use is inherited by the processes
+            executor = start_render_pool(workers)
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, context)
+                    orders = env["sale.order"].browse(order_ids)
+                    # rendering needs the images of the designs, not the order rights
+                    jobs = orders.sudo()._iter_print_file_jobs(size=size, output_format=image_format)
+                    for chunk in iter_zip(self._print_file_entries(render_jobs(jobs, executor, workers))):
+                        if chunk:
+                            yield chunk
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+        filename = "print-files-%s.zip" % (orders[:1].name if len(orders) == 1 else len(orders))
+        return request.make_response(generate(), headers=[
+            ("Content-Type", "application/zip"),
+            ("Content-Disposition", content_disposition(filename)),
+        ])
+
+    def _get_render_size(self, size, default=None):
+        """Requested render size clamped to the accepted range, ``default``
+        when it is missing or not a number."""
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return default
+        return min(max(size, 64), MAX_RENDER_SIZE)
+
+    def _print_file_entries(self, rendered):
+        """ZIP entries of rendered print files; failed renders become a note."""
+        for name, content, error in rendered:
+            if error:
+                _logger.warning("Could not render print file %s: %s", name, error)
+                yield name + ".error.txt", error.encode()
+            else:
+                yield name, content
@@ -0,0 +1,32 @@
+import logging
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Move the per-record preview attachments into shared images."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Image = env["sale.order.line.personalization.image"]
+    attachment_ids = env["ir.attachment"].search([
+        ("res_model", "=", "sale.order.line.personalization"),
+        ("res_field", "=", "product_image"),
+    ]).ids
+
+    for batch_ids in split_every(500, attachment_ids):
+        attachments = env["ir.attachment"].browse(batch_ids)
+        for attachment in attachments:
+            image = Image._get_or_create(attachment.raw, checksum=attachment.checksum)
+            cr.execute(
+                "UPDATE sale_order_line_personalization SET image_id = %s WHERE id = %s",
+                (image.id or None, attachment.res_id),
+            )
+        attachments.unlink()
+        env.invalidate_all()
+
+    _logger.info(
+        "Moved %s personalization previews into %s shared images",
+        len(attachment_ids), Image.search_count([]),
+    )
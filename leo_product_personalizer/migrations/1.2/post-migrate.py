@@ -0,0 +1,16 @@
+import logging
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Generate the thumbnail derivatives of the existing preview images."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    image_ids = env["sale.order.line.personalization.image"].search([]).ids
+    for batch_ids in split_every(200, image_ids):
+        env["sale.order.line.personalization.image"].browse(batch_ids)._generate_derivatives()
+        env.invalidate_all()
+    _logger.info("Generated thumbnails for %s personalization images", len(image_ids))
@@ -0,0 +1,47 @@
+import base64
+import logging
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools import split_every
+from odoo.tools.sql import column_exists
+
+from odoo.addons.leo_product_personalizer.tools.fabric_json import compress_json
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Compress the plain ``personalized_json`` column and report the space saved."""
+    table = "sale_order_line_personalization"
+    if not column_exists(cr, table, "personalized_json"):
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Personalization = env["sale.order.line.personalization"]
+
+    cr.execute(f"""
+        SELECT COUNT(personalized_json), COALESCE(SUM(pg_column_size(personalized_json)), 0)
+          FROM {table}
+    """)
+    count, size_before = cr.fetchone()
+
+    cr.execute(f"SELECT id FROM {table} WHERE personalized_json IS NOT NULL ORDER BY id")
+    ids = [row[0] for row in cr.fetchall()]
+    for batch_ids in split_every(500, ids):
+        cr.execute(f"SELECT id, personalized_json FROM {table} WHERE id IN %s", (batch_ids,))
+        for personalization_id, value in cr.fetchall():
+            data = compress_json(value)
+            Personalization.browse(personalization_id).write({
+                "personalized_json_data": base64.b64encode(data) if data else False,
+            })
+        env.flush_all()
+        env.invalidate_all()
+
+    cr.execute(f"SELECT COALESCE(SUM(pg_column_size(personalized_json_data)), 0) FROM {table}")
+    size_after = cr.fetchone()[0]
+    cr.execute(f"ALTER TABLE {table} DROP COLUMN personalized_json")
+
+    _logger.info(
+        "Compressed %s personalization designs: %s bytes -> %s bytes (%.1f%% saved)",
+        count, size_before, size_after,
+        100.0 * (size_before - size_after) / size_before if size_before else 0.0,
+    )
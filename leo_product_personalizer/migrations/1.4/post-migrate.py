@@ -0,0 +1,22 @@
+import logging
+
+from odoo import SUPERUSER_ID, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Lift the images embedded in saved designs out into shared images."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    Personalization = env["sale.order.line.personalization"]
+    count = 0
+    for batch_ids in split_every(500, Personalization.search([]).ids):
+        for personalization in Personalization.browse(batch_ids):
+            value = personalization.personalized_json
+            if value and "data:" in value:
+                personalization.write({"personalized_json": value})
+                count += 1
+        env.flush_all()
+        env.invalidate_all()
+    _logger.info("Extracted the embedded images of %s personalization designs", count)
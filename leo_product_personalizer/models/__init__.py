@@ -3,6 +3,13 @@
 
 from . import product_template
 from . import product_product
+from . import product_attribute_value
+from . import sale_order
 from . import sale_order_line
 from . import product_design_config
-from . import sale_order_line_personalization
\ No newline at end of file
+from . import sale_order_line_personalization
+from . import sale_order_line_personalization_image
+from . import personalization_request_stat
+from . import personalization_request_stat_phase
+from . import sale_order_line_personalization_draft
+from . import sale_order_line_personalization_job
@@ -0,0 +1,113 @@
+import json
+import logging
+import random
+from datetime import timedelta
+
+from odoo import Command, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+STAT_RETENTION_DAYS = 30
+
+
+class PersonalizationRequestStat(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _name = "personalization.request.stat"
+    _description = "Sampled measurement of a personalizer request"
+    _order = "create_date desc, id desc"
+    _rec_name = "route"
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    route = fields.Char(string="Route", required=True, readonly=True, index=True)
+    duration_ms = fields.Float(string="Duration (ms)", readonly=True, aggregator="avg")
+    query_count = fields.Integer(string="SQL Queries", readonly=True, aggregator="avg")
+    request_bytes = fields.Integer(string="Request Size (bytes)", readonly=True, aggregator="avg")
+    response_bytes = fields.Integer(string="Response Size (bytes)", readonly=True, aggregator="avg")
+    image_sizes = fields.Text(
+        string="Image Sizes",
+        readonly=True,
+        help="Bytes of the images handled, per design type, as JSON.",
+    )
+    phase_ids = fields.One2many(
+        "personalization.request.stat.phase",
+        "stat_id",
+        string="Phases",
+        readonly=True,
+    )
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_sample_rate(self):
+        """Share of the requests measured, from 0 (off) to 1 (all)."""
+        try:
+            return float(self.env["ir.config_parameter"].sudo().get_param(
+                "leo_product_personalizer.instrumentation_sample_rate", 0
+            ))
+        except ValueError:
+            return 0.0
+
+    @api.model
+    def _is_sampled(self):
+        rate = self._get_sample_rate()
+        return rate > 0 and random.random() < rate
+
+    @api.model
+    def _log_profile(self, profile):
+        """Write a measured request to the logs and to the stats."""
+        values = profile.to_dict()
+        _logger.info("personalizer request %s", json.dumps(values, sort_keys=True))
+        self.sudo().create({
+            "route": profile.route,
+            "duration_ms": values["duration_ms"],
+            "query_count": values["query_count"],
+            "request_bytes": profile.sizes.get("request", 0),
+            "response_bytes": profile.sizes.get("response", 0),
+            "image_sizes": json.dumps(profile.image_sizes, sort_keys=True) if profile.image_sizes else False,
+            "phase_ids": [
+                Command.create({
+                    "name": name,
+                    "duration_ms": phase["duration_ms"],
+                    "query_count": phase["query_count"],
+                    "calls": phase["calls"],
+                })
+                for name, phase in values["phases"].items()
+            ],
+        })
+
+    @api.autovacuum
+    def _gc_old_stats(self):
+        limit_date = fields.Datetime.now() - timedelta(days=STAT_RETENTION_DAYS)
+        self.search([("create_date", "<", limit_date)]).unlink()
@@ -0,0 +1,32 @@
+from odoo import fields, models
+
+
+class PersonalizationRequestStatPhase(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _name = "personalization.request.stat.phase"
+    _description = "Timing of one phase of a measured personalizer request"
+    _order = "duration_ms desc"
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    stat_id = fields.Many2one(
+        "personalization.request.stat",
+        string="Request",
+        required=True,
+        ondelete="cascade",
+        index=True,
+    )
+    route = fields.Char(related="stat_id.route", store=True)
+    name = fields.Char(string="Phase", required=True, readonly=True)
+    duration_ms = fields.Float(string="Duration (ms)", readonly=True, aggregator="avg")
+    query_count = fields.Integer(string="SQL Queries", readonly=True, aggregator="avg")
+    calls = fields.Integer(string="Calls", readonly=True, aggregator="avg")
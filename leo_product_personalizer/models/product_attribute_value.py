@@ -0,0 +1,54 @@
+from odoo import models
+
+
+class ProductAttributeValue(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _inherit = "product.attribute.value"
+
+    # Fields whose change alters the cached personalization payload: the
+    # value names make the variant names
+    _PERSONALIZATION_CACHE_FIELDS = {
+        "name",
+    }
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self._PERSONALIZATION_CACHE_FIELDS.intersection(vals):
+            templates = self.pav_attribute_line_ids.product_tmpl_id
+            templates.filtered("is_product_personalization")._invalidate_personalization_payload()
+        return res
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
@@ -1,4 +1,13 @@
-from odoo import fields, models
+import logging
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools.image import base64_to_image
+
+_logger = logging.getLogger(__name__)
+
+# bounding square of the image the backend area editor works on
+PROXY_IMAGE_SIZE = 1024
 
 
 class ProductDesignConfig(models.Model):
@@ -9,6 +18,18 @@ class ProductDesignConfig(models.Model):
     _name = "product.design.config"
     _description = "Product Design Config (sides/areas for personalization)"
 
+    # Fields whose change alters the cached personalization payload
+    _PERSONALIZATION_CACHE_FIELDS = {
+        "bound_height",
+        "bound_width",
+        "bound_x",
+        "bound_y",
+        "design_image",
+        "design_type",
+        "is_restricted_area",
+        "product_variant_id",
+    }
+
     # ------------------------------------------------------------------
     # 2. DEFAULT METHODS AND default_get
     # ------------------------------------------------------------------
@@ -37,6 +58,29 @@ class ProductDesignConfig(models.Model):
         help="Identifier for the design side (e.g. front, back)",
     )
     design_image = fields.Image("Image")
+    design_image_proxy = fields.Image(
+        "Editing Image",
+        related="design_image",
+        max_width=PROXY_IMAGE_SIZE,
+        max_height=PROXY_IMAGE_SIZE,
+        store=True,
+        help="Technical field: downscaled design image for the restricted area editor.",
+    )
+    design_image_width = fields.Integer(
+        "Image Width (px)",
+        compute="_compute_design_image_size",
+        store=True,
+    )
+    design_image_height = fields.Integer(
+        "Image Height (px)",
+        compute="_compute_design_image_size",
+        store=True,
+    )
+    has_design_image = fields.Boolean(
+        compute="_compute_has_design_image",
+        store=True,
+        help="Technical field: a design image is set, without loading it.",
+    )
 
     is_restricted_area = fields.Boolean(
         "Has Restricted Area",
@@ -51,6 +95,23 @@ class ProductDesignConfig(models.Model):
     # 4. COMPUTE, INVERSE AND SEARCH METHODS
     # ------------------------------------------------------------------
 
+    @api.depends("design_image")
+    def _compute_has_design_image(self):
+        for config in self.with_context(bin_size=True):
+            config.has_design_image = bool(config.design_image)
+
+    @api.depends("design_image")
+    def _compute_design_image_size(self):
+        for config in self:
+            width = height = 0
+            if config.design_image:
+                try:
+                    width, height = base64_to_image(config.design_image).size
+                except UserError:
+                    _logger.warning("Could not read the design image of config %s", config.id)
+            config.design_image_width = width
+            config.design_image_height = height
+
     # ------------------------------------------------------------------
     # 5. SELECTION METHODS
     # ------------------------------------------------------------------
@@ -63,6 +124,27 @@ class ProductDesignConfig(models.Model):
     # 7. CRUD METHODS
     # ------------------------------------------------------------------
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        configs = super().create(vals_list)
+        configs.product_tmpl_id._invalidate_personalization_payload()
+        return configs
+
+    def write(self, vals):
+        if not self._PERSONALIZATION_CACHE_FIELDS.intersection(vals):
+            return super().write(vals)
+        # a config moved to another variant changes both templates
+        templates = self.product_tmpl_id
+        res = super().write(vals)
+        (templates | self.product_tmpl_id)._invalidate_personalization_payload()
+        return res
+
+    def unlink(self):
+        templates = self.product_tmpl_id
+        res = super().unlink()
+        templates.exists()._invalidate_personalization_payload()
+        return res
+
     # ------------------------------------------------------------------
     # 8. ACTION METHODS
     # ------------------------------------------------------------------
@@ -70,3 +152,15 @@ class ProductDesignConfig(models.Model):
     # ------------------------------------------------------------------
     # 9. BUSINESS METHODS
     # ------------------------------------------------------------------
+
+    def _get_restricted_box(self):
+        """Restricted area as (left, top, right, bottom) canvas pixels, or None."""
+        self.ensure_one()
+        if not self.is_restricted_area or self.bound_width <= 0 or self.bound_height <= 0:
+            return None
+        return (
+            self.bound_x,
+            self.bound_y,
+            self.bound_x + self.bound_width,
+            self.bound_y + self.bound_height,
+        )
@@ -1,4 +1,6 @@
-from odoo import fields, models
+import hashlib
+
+from odoo import api, fields, models
 
 
 class ProductProduct(models.Model):
@@ -8,6 +10,15 @@ class ProductProduct(models.Model):
 
     _inherit = "product.product"
 
+    # Fields whose change alters the cached personalization payload
+    _PERSONALIZATION_CACHE_FIELDS = {
+        "active",
+        "default_code",
+        "design_config_ids",
+        "image_variant_1920",
+        "product_template_attribute_value_ids",
+    }
+
     # ------------------------------------------------------------------
     # 2. DEFAULT METHODS AND default_get
     # ------------------------------------------------------------------
@@ -21,11 +32,24 @@ class ProductProduct(models.Model):
         "product_variant_id",
         string="Design Configurations",
     )
+    has_personalization_image = fields.Boolean(
+        compute="_compute_has_personalization_image",
+        store=True,
+        help="Technical field: the variant (or its template) has an image, "
+             "so the personalizer can build image URLs without loading it.",
+    )
 
     # ------------------------------------------------------------------
     # 4. COMPUTE, INVERSE AND SEARCH METHODS
     # ------------------------------------------------------------------
 
+    @api.depends("image_variant_1920", "product_tmpl_id.image_1920")
+    def _compute_has_personalization_image(self):
+        for product in self.with_context(bin_size=True):
+            product.has_personalization_image = bool(
+                product.image_variant_1920 or product.product_tmpl_id.image_1920
+            )
+
     # ------------------------------------------------------------------
     # 5. SELECTION METHODS
     # ------------------------------------------------------------------
@@ -38,6 +62,24 @@ class ProductProduct(models.Model):
     # 7. CRUD METHODS
     # ------------------------------------------------------------------
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        products = super().create(vals_list)
+        products.product_tmpl_id.filtered("is_product_personalization")._invalidate_personalization_payload()
+        return products
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self._PERSONALIZATION_CACHE_FIELDS.intersection(vals):
+            self.product_tmpl_id._invalidate_personalization_payload()
+        return res
+
+    def unlink(self):
+        templates = self.product_tmpl_id.filtered("is_product_personalization")
+        res = super().unlink()
+        templates.exists()._invalidate_personalization_payload()
+        return res
+
     # ------------------------------------------------------------------
     # 8. ACTION METHODS
     # ------------------------------------------------------------------
@@ -45,3 +87,63 @@ class ProductProduct(models.Model):
     # ------------------------------------------------------------------
     # 9. BUSINESS METHODS
     # ------------------------------------------------------------------
+
+    def _get_personalization_designs(self):
+        """Get design configurations for a variant.
+
+        Configs are fetched with a single ``read`` on metadata fields only;
+        image presence comes from stored flags so no binary is loaded.
+        """
+        if not self.exists():
+            return {}, []
+
+        designs = {}
+        design_types = []
+
+        configs_data = self.design_config_ids.read([
+            "design_type",
+            "has_design_image",
+            "is_restricted_area",
+            "bound_x",
+            "bound_y",
+            "bound_width",
+            "bound_height",
+            "write_date",
+        ])
+        for config in configs_data:
+            design_type = config["design_type"] or str(config["id"])
+            designs[design_type] = {
+                "id": config["id"],
+                "design_type": config["design_type"],
+                "image_url": self._get_personalization_image_url(config),
+                "is_restricted_area": config["is_restricted_area"],
+                "bound_x": float(config["bound_x"] or 0.0),
+                "bound_y": float(config["bound_y"] or 0.0),
+                "bound_width": float(config["bound_width"] or 0.0),
+                "bound_height": float(config["bound_height"] or 0.0),
+            }
+            design_types.append(design_type)
+        return designs, design_types
+
+    def _get_personalization_image_url(self, config=None):
+        """Get image URL for design config or fallback to variant image.
+
+        The URLs carry a version key, so they can be cached for good.
+
+        :param dict config: design config values as returned by ``read``
+        """
+        if config and config["has_design_image"]:
+            unique = self._get_personalization_unique(config["write_date"])
+            return f"/web/image/product.design.config/{config['id']}/design_image?unique={unique}"
+
+        if self.has_personalization_image:
+            # the variant image falls back to the template one
+            unique = self._get_personalization_unique(self.write_date, self.product_tmpl_id.write_date)
+            return f"/web/image/product.product/{self.id}/image_1920?unique={unique}"
+        return None
+
+    @api.model
+    def _get_personalization_unique(self, *write_dates):
+        """Version key of an image URL, changing with the given write dates."""
+        last = max(filter(None, write_dates), default=None)
+        return hashlib.sha1(str(last).encode()).hexdigest()[:7] if last else ""
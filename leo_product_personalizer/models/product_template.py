@@ -1,4 +1,14 @@
-from odoo import fields, models
+import copy
+import hashlib
+import json
+from collections import Counter
+
+from odoo import api, fields, models
+from odoo.tools import SQL, ormcache
+
+# Per-worker counters of the personalization payload cache. Hits are derived
+# from calls - misses since ormcache does not expose them to the caller.
+_PERSONALIZATION_CACHE_STATS = Counter()
 
 
 class ProductTemplate(models.Model):
@@ -8,6 +18,16 @@ class ProductTemplate(models.Model):
 
     _inherit = "product.template"
 
+    # Fields whose change alters the cached personalization payload
+    _PERSONALIZATION_CACHE_FIELDS = {
+        "active",
+        "attribute_line_ids",
+        "image_1920",
+        "is_product_personalization",
+        "name",
+        "product_variant_ids",
+    }
+
     # ------------------------------------------------------------------
     # 2. DEFAULT METHODS AND default_get
     # ------------------------------------------------------------------
@@ -20,6 +40,14 @@ class ProductTemplate(models.Model):
         string="Is Product Personalization",
         help="Enables personalization features for this product.",
     )
+    personalization_cache_version = fields.Integer(
+        default=0,
+        readonly=True,
+        copy=False,
+        help="Technical field: raised whenever a value of the cached "
+             "personalization payload changes, so that the stale payloads "
+             "are no longer looked up.",
+    )
 
     # ------------------------------------------------------------------
     # 4. COMPUTE, INVERSE AND SEARCH METHODS
@@ -37,10 +65,122 @@ class ProductTemplate(models.Model):
     # 7. CRUD METHODS
     # ------------------------------------------------------------------
 
+    def write(self, vals):
+        res = super().write(vals)
+        if self._PERSONALIZATION_CACHE_FIELDS.intersection(vals):
+            self._invalidate_personalization_payload()
+        return res
+
     # ------------------------------------------------------------------
     # 8. ACTION METHODS
     # ------------------------------------------------------------------
 
     # ------------------------------------------------------------------
     # 9. BUSINESS METHODS
-    # ------------------------------------------------------------------
\ No newline at end of file
+    # ------------------------------------------------------------------
+
+    def _get_personalization_payload(self, variant_id=None, website_id=None):
+        """Return the ``/shop/product_personalization_data`` payload.
+
+        The payload is cached per (template, version, variant, website,
+        lang); the version of a template is raised whenever a value the
+        payload reads changes, see ``_invalidate_personalization_payload``.
+        A cache hit costs one query, reading the version.
+        """
+        self.ensure_one()
+        _PERSONALIZATION_CACHE_STATS["calls"] += 1
+        self.env.cr.execute(SQL(
+            "SELECT personalization_cache_version FROM %s WHERE id = %s",
+            SQL.identifier(self._table), self.id,
+        ))
+        row = self.env.cr.fetchone()
+        if not row:
+            _PERSONALIZATION_CACHE_STATS["misses"] += 1
+            return {"error": "Product not found"}
+        payload = self._get_personalization_payload_cached(row[0], variant_id, website_id)
+        return copy.deepcopy(payload)
+
+    @ormcache("self.id", "version", "variant_id", "website_id", "self.env.lang")
+    def _get_personalization_payload_cached(self, version, variant_id, website_id):
+        _PERSONALIZATION_CACHE_STATS["misses"] += 1
+
+        variants_data = self._get_personalization_variants_data()
+        active_variant_id = (
+            int(variant_id) if variant_id
+            else variants_data[0]["id"] if variants_data else None
+        )
+        if not active_variant_id:
+            return {"error": "No variants found"}
+
+        variant = self.env["product.product"].browse(active_variant_id)
+        designs, design_types = variant._get_personalization_designs()
+
+        payload = {
+            "product_id": self.id,
+            "variants": variants_data,
+            "active_variant_id": active_variant_id,
+            "design_types": design_types,
+            "default_design_type": design_types[0] if design_types else None,
+            "designs": designs,
+            "fallback_image_url": variant._get_personalization_image_url(),
+            "server_side_preview": self.env["sale.order.line.personalization"]._use_server_side_preview(),
+        }
+        # the records were just read, no query is needed for their dates
+        last_modified = max(filter(None, [
+            self.write_date,
+            *self.product_variant_ids.mapped("write_date"),
+            *variant.design_config_ids.mapped("write_date"),
+        ]), default=None)
+        payload["last_modified"] = fields.Datetime.to_string(last_modified) if last_modified else None
+        payload["version"] = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+        return payload
+
+    def _invalidate_personalization_payload(self):
+        """Make the cached personalization payloads of ``self`` stale, in
+        every worker, without touching the other caches.
+
+        The version is raised in SQL, in the transaction of the change: a
+        worker sees the new version together with the data it stands for,
+        and cannot cache the old data under it.
+        """
+        if not self.ids:
+            return
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET personalization_cache_version = COALESCE(personalization_cache_version, 0) + 1 "
+            "WHERE id IN %s",
+            SQL.identifier(self._table), tuple(self.ids),
+        ))
+        self.invalidate_recordset(["personalization_cache_version"])
+
+    def _get_personalization_variants_data(self):
+        """Get list of variants with their images.
+
+        Variants are read in one batch and image presence comes from the
+        stored ``has_personalization_image`` flag, so no binary is loaded.
+        """
+        variants_data = []
+        Product = self.env["product.product"]
+        for variant in self.product_variant_ids.read(["display_name", "has_personalization_image", "write_date"]):
+            unique = Product._get_personalization_unique(variant["write_date"], self.write_date)
+            image_url = (
+                f"/web/image/product.product/{variant['id']}/image_1920?unique={unique}"
+                if variant["has_personalization_image"] else None
+            )
+            variants_data.append({
+                "id": variant["id"],
+                "name": variant["display_name"],
+                "image_url": image_url,
+            })
+        return variants_data
+
+    @api.model
+    def _get_personalization_cache_stats(self):
+        """Hit/miss counters of the payload cache for the current worker."""
+        calls = _PERSONALIZATION_CACHE_STATS["calls"]
+        misses = _PERSONALIZATION_CACHE_STATS["misses"]
+        hits = max(calls - misses, 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / calls, 4) if calls else 0.0,
+        }
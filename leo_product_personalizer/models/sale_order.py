@@ -0,0 +1,128 @@
+import re
+
+from odoo import api, fields, models
+from odoo.tools import split_every
+
+# characters kept in the file names of exported print files
+FILENAME_UNSAFE_RE = re.compile(r"[^\w.-]+")
+
+
+class SaleOrder(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _inherit = "sale.order"
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    personalized_line_count = fields.Integer(
+        string="Personalized Lines",
+        compute="_compute_personalization_summary",
+        store=True,
+    )
+    is_personalized = fields.Boolean(
+        string="Personalized",
+        compute="_compute_personalization_summary",
+        store=True,
+        index=True,
+        help="At least one line of the order carries a personalized design.",
+    )
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    @api.depends("order_line.is_personalized")
+    def _compute_personalization_summary(self):
+        for order in self:
+            order.personalized_line_count = len(order.order_line.filtered("is_personalized"))
+            order.is_personalized = bool(order.personalized_line_count)
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    def action_export_print_files(self):
+        """Download the print files of all the personalizations of the orders."""
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/leo_product_personalizer/export/print_files?order_ids=%s" % ",".join(map(str, self.ids)),
+            "target": "self",
+        }
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
+
+    def _cart_find_product_line(self, *args, **kwargs):
+        """Only merge an add-to-cart into a line with the same designs.
+
+        The personalizer passes ``personalization_fingerprint`` (see
+        ``sale.order.line._get_personalization_fingerprint``), and may pass
+        ``personalization_line_id``, a line whose identical designs are not
+        saved yet. Other adds never merge into a personalized line.
+        """
+        lines = super()._cart_find_product_line(*args, **kwargs)
+        fingerprint = self.env.context.get("personalization_fingerprint") or False
+        line_id = self.env.context.get("personalization_line_id")
+        if line_id:
+            return lines.filtered(lambda line: line.id == line_id)
+        return lines.filtered(lambda line: line.personalization_fingerprint == fingerprint)
+
+    def _get_print_export_workers(self):
+        """Number of processes rendering an export, 1 renders in the worker.
+
+        More processes are only worth it on a server with idle cores: they
+        escape the memory and time limits of the HTTP worker.
+        """
+        try:
+            workers = int(self.env["ir.config_parameter"].sudo().get_param(
+                "leo_product_personalizer.export_workers", 1
+            ))
+        except ValueError:
+            workers = 1
+        return max(workers, 1)
+
+    def _iter_print_file_jobs(self, size=None, output_format="png", batch_size=50):
+        """Yield the ``(file name, render kwargs)`` of each personalization.
+
+        Personalizations are read in batches and the cache is dropped after
+        each one, so only one batch of designs is in memory at a time.
+        """
+        Personalization = self.env["sale.order.line.personalization"]
+        size = size or Personalization._get_print_size()
+        extension = "jpg" if output_format.lower() == "jpeg" else output_format.lower()
+        personalization_ids = Personalization.search(
+            [("order_id", "in", self.ids)], order="order_id, sale_order_line_id, id",
+        ).ids
+        for batch_ids in split_every(batch_size, personalization_ids):
+            for personalization in Personalization.browse(batch_ids):
+                line = personalization.sale_order_line_id
+                name = "%s/%s-%s-%s.%s" % (
+                    FILENAME_UNSAFE_RE.sub("_", line.order_id.name or "order"),
+                    line.id,
+                    FILENAME_UNSAFE_RE.sub("_", line.product_id.default_code or line.product_id.name or "product"),
+                    FILENAME_UNSAFE_RE.sub("_", personalization.design_type),
+                    extension,
+                )
+                yield name, personalization._get_render_kwargs(size=size, output_format=output_format)
+            self.env.invalidate_all()
@@ -1,4 +1,7 @@
-from odoo import fields, models
+import hashlib
+import json
+
+from odoo import api, fields, models
 
 
 class SaleOrderLine(models.Model):
@@ -22,11 +25,52 @@ class SaleOrderLine(models.Model):
         string="Personalizations",
         help="Personalized designs saved against this sale order line.",
     )
+    personalization_fingerprint = fields.Char(
+        string="Design Fingerprint",
+        compute="_compute_personalization_fingerprint",
+        store=True,
+        index="btree_not_null",
+        help="Technical field: fingerprint of the designs of all the sides of "
+             "the line, used to merge identical personalized lines in a cart.",
+    )
+    personalization_count = fields.Integer(
+        string="Personalized Sides",
+        compute="_compute_personalization_summary",
+        store=True,
+    )
+    customized_side_count = fields.Integer(
+        string="Customized Sides",
+        compute="_compute_personalization_summary",
+        store=True,
+        help="Sides with the customer's own design, not the bare product image.",
+    )
+    is_personalized = fields.Boolean(
+        string="Personalized",
+        compute="_compute_personalization_summary",
+        store=True,
+        index=True,
+    )
 
     # ------------------------------------------------------------------
     # 4. COMPUTE, INVERSE AND SEARCH METHODS
     # ------------------------------------------------------------------
 
+    @api.depends("personalization_ids", "personalization_ids.is_customized")
+    def _compute_personalization_summary(self):
+        for line in self:
+            personalizations = line.personalization_ids
+            line.personalization_count = len(personalizations)
+            line.customized_side_count = len(personalizations.filtered("is_customized"))
+            line.is_personalized = bool(personalizations)
+
+    @api.depends("personalization_ids.design_type", "personalization_ids.json_checksum")
+    def _compute_personalization_fingerprint(self):
+        for line in self:
+            line.personalization_fingerprint = self._get_personalization_fingerprint(
+                (personalization.design_type, personalization.json_checksum)
+                for personalization in line.personalization_ids
+            )
+
     # ------------------------------------------------------------------
     # 5. SELECTION METHODS
     # ------------------------------------------------------------------
@@ -59,3 +103,12 @@ class SaleOrderLine(models.Model):
             "view_mode": "kanban,list,form",
             "domain": [("sale_order_line_id", "=", self.id)],
         }
+
+    @api.model
+    def _get_personalization_fingerprint(self, sides):
+        """Fingerprint of a set of designs, from their ``(design type, JSON
+        checksum)``; False without designs."""
+        sides = sorted((design_type or "", checksum or "") for design_type, checksum in sides)
+        if not sides:
+            return False
+        return hashlib.sha1(json.dumps(sides).encode()).hexdigest()
@@ -1,4 +1,42 @@
-from odoo import fields, models
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from odoo import Command, api, fields, models
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL, str2bool
+
+from ..tools.fabric_json import canonical_json, compress_json, decompress_json
+from ..tools.fabric_renderer import CANVAS_SIZE, decode_data_url, render_fabric_json
+from ..tools.pack_archive import PACK_SUFFIX, PackError, drop_reader, get_reader, write_pack
+
+_logger = logging.getLogger(__name__)
+
+# image URLs that may be resolved server-side when rendering a design
+IMAGE_URL_RE = re.compile(r"^(?:https?://[^/]+)?/web/image/(?P<model>[\w.]+)/(?P<id>\d+)/(?P<field>\w+)")
+# uploaded artwork lifted out of the design JSON, see _extract_embedded_images
+ASSET_URL = "/web/image/sale.order.line.personalization.image/{id}/image?unique={checksum}"
+# the browser may give the source back as an absolute URL
+ASSET_URL_RE = re.compile(
+    r"^(?:https?://[^/]+)?/web/image/sale\.order\.line\.personalization\.image/\d+/image"
+    r"\?unique=(?P<checksum>[0-9a-f]{40})$"
+)
+# hours before an unreferenced pack file is deleted, see _gc_packs
+PACK_GRACE_HOURS = 24
+# packs whose share of live designs fell under this ratio are rewritten
+PACK_COMPACT_RATIO = 0.5
+RENDER_IMAGE_MODELS = {
+    "product.design.config",
+    "product.product",
+    "product.template",
+    "sale.order.line.personalization.image",
+}
 
 
 class SaleOrderLinePersonalization(models.Model):
@@ -34,13 +72,129 @@ class SaleOrderLinePersonalization(models.Model):
     design_config_id = fields.Many2one(
         "product.design.config", string="Design Config"
     )
-    personalized_json = fields.Text("Fabric JSON")
-    product_image = fields.Image("Preview Image", store=True)
+    personalized_json = fields.Text(
+        "Fabric JSON",
+        compute="_compute_personalized_json",
+        inverse="_inverse_personalized_json",
+    )
+    personalized_json_data = fields.Binary(
+        "Compressed Fabric JSON",
+        attachment=False,
+        readonly=True,
+        help="Technical field: the design JSON without Fabric default values, "
+             "zlib-compressed. Decompressed on read into Fabric JSON.",
+    )
+    archive_pack = fields.Char(
+        "Archive Pack",
+        readonly=True,
+        copy=False,
+        index="btree_not_null",
+        help="Technical field: pack file holding the compressed design JSON "
+             "once archived; the design is then read from the pack.",
+    )
+    json_checksum = fields.Char(
+        compute="_compute_json_checksum",
+        store=True,
+        help="Technical field: fingerprint of the design JSON, used to skip "
+             "rewriting sides that did not change.",
+    )
+    is_customized = fields.Boolean(
+        string="Customized",
+        compute="_compute_is_customized",
+        store=True,
+        help="The design has objects on it, it is not the bare product image.",
+    )
+    image_id = fields.Many2one(
+        "sale.order.line.personalization.image",
+        string="Shared Preview Image",
+        ondelete="restrict",
+        index=True,
+        readonly=True,
+    )
+    asset_image_ids = fields.Many2many(
+        "sale.order.line.personalization.image",
+        "sale_order_line_personalization_asset_rel",
+        "personalization_id",
+        "image_id",
+        string="Uploaded Images",
+        readonly=True,
+        help="Images uploaded in the design, referenced by URL from the Fabric JSON.",
+    )
+    product_image = fields.Image(
+        "Preview Image",
+        compute="_compute_product_image",
+        inverse="_inverse_product_image",
+    )
+    product_image_small = fields.Binary(
+        "Preview Image (Small)", compute="_compute_product_image_derivatives",
+    )
+    product_image_medium = fields.Binary(
+        "Preview Image (Medium)", compute="_compute_product_image_derivatives",
+    )
+    product_image_large = fields.Binary(
+        "Preview Image (Large)", compute="_compute_product_image_derivatives",
+    )
 
     # ------------------------------------------------------------------
     # 4. COMPUTE, INVERSE AND SEARCH METHODS
     # ------------------------------------------------------------------
 
+    @api.depends("personalized_json_data", "archive_pack")
+    def _compute_personalized_json(self):
+        archived = self.filtered("archive_pack")._read_archived_data()
+        for personalization, data in zip(self, self.with_context(bin_size=False).mapped("personalized_json_data")):
+            if personalization.archive_pack and not data:
+                raw = archived.get(personalization.id, b"")
+            else:
+                raw = base64.b64decode(data or b"")
+            personalization.personalized_json = decompress_json(raw)
+
+    def _inverse_personalized_json(self):
+        if self.env.context.get("defer_personalization_processing"):
+            # stored as sent; compacted and split by _process_deferred
+            for personalization in self:
+                data = compress_json(personalization.personalized_json, canonical=False)
+                personalization.personalized_json_data = base64.b64encode(data) if data else False
+                personalization.archive_pack = False
+            return
+        for personalization in self:
+            value, asset_images = self._extract_embedded_images(personalization.personalized_json)
+            data = compress_json(value)
+            personalization.personalized_json_data = base64.b64encode(data) if data else False
+            personalization.asset_image_ids = [Command.set(asset_images.ids)]
+            # an edited design is live again
+            personalization.archive_pack = False
+
+    @api.depends("personalized_json_data")
+    def _compute_json_checksum(self):
+        for personalization in self:
+            personalization.json_checksum = self._get_json_checksum(personalization.personalized_json)
+
+    @api.depends("personalized_json_data")
+    def _compute_is_customized(self):
+        for personalization in self:
+            personalization.is_customized = bool(personalization._get_design_json()["objects"])
+
+    @api.depends("image_id")
+    def _compute_product_image(self):
+        for personalization in self:
+            personalization.product_image = personalization.image_id.image
+
+    @api.depends("image_id.image_small", "image_id.image_medium", "image_id.image_large")
+    def _compute_product_image_derivatives(self):
+        # the full image stands in until the derivatives are generated
+        for personalization in self:
+            image = personalization.image_id
+            personalization.product_image_small = image.image_small or image.image
+            personalization.product_image_medium = image.image_medium or image.image
+            personalization.product_image_large = image.image_large or image.image
+
+    def _inverse_product_image(self):
+        Image = self.env["sale.order.line.personalization.image"].sudo()
+        for personalization in self:
+            raw = base64.b64decode(personalization.product_image or b"")
+            personalization.image_id = Image._get_or_create(raw)
+
     # ------------------------------------------------------------------
     # 5. SELECTION METHODS
     # ------------------------------------------------------------------
@@ -53,10 +207,533 @@ class SaleOrderLinePersonalization(models.Model):
     # 7. CRUD METHODS
     # ------------------------------------------------------------------
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        personalizations = super().create(vals_list)
+        if self.env.context.get("defer_personalization_processing"):
+            self.env["sale.order.line.personalization.job"].sudo()._enqueue(personalizations)
+        return personalizations
+
+    def write(self, vals):
+        if not {"image_id", "asset_image_ids", "personalized_json"} & vals.keys():
+            return super().write(vals)
+        previous_images = self.image_id | self.asset_image_ids
+        res = super().write(vals)
+        (previous_images - self.image_id - self.asset_image_ids)._gc_unreferenced()
+        if self.env.context.get("defer_personalization_processing"):
+            self.env["sale.order.line.personalization.job"].sudo()._enqueue(self)
+        return res
+
+    def unlink(self):
+        images = self.image_id | self.asset_image_ids
+        res = super().unlink()
+        images._gc_unreferenced()
+        return res
+
     # ------------------------------------------------------------------
     # 8. ACTION METHODS
     # ------------------------------------------------------------------
 
+    def action_download_print_file(self):
+        """Download the server-rendered, print-ready file of this design."""
+        self.ensure_one()
+        return {
+            "type": "ir.actions.act_url",
+            "url": f"/leo_product_personalizer/render/{self.id}",
+            "target": "self",
+        }
+
     # ------------------------------------------------------------------
     # 9. BUSINESS METHODS
     # ------------------------------------------------------------------
+
+    @api.model
+    def _get_json_checksum(self, value):
+        """Fingerprint of a design JSON string, as stored: insensitive to key
+        order, spacing and Fabric default values.
+
+        Uploaded images count by content, so a ``data:`` source and the URL
+        it is stored as give the same fingerprint.
+        """
+        if not value:
+            return False
+        try:
+            design = json.loads(value)
+        except (TypeError, ValueError):
+            return hashlib.sha1(value.encode()).hexdigest()
+        for obj in self._iter_image_objects(design):
+            raw = decode_data_url(obj["src"])
+            match = ASSET_URL_RE.match(obj["src"])
+            if raw:
+                obj["src"] = hashlib.sha1(raw).hexdigest()
+            elif match:
+                obj["src"] = match["checksum"]
+        return hashlib.sha1(canonical_json(json.dumps(design)).encode()).hexdigest()
+
+    @api.model
+    def _iter_image_objects(self, canvas_json):
+        """Yield the image objects of ``canvas_json``, including grouped ones."""
+        stack = list((canvas_json or {}).get("objects") or []) if isinstance(canvas_json, dict) else []
+        while stack:
+            obj = stack.pop()
+            if not isinstance(obj, dict):
+                continue
+            stack.extend(obj.get("objects") or [])
+            if obj.get("type") == "image" and isinstance(obj.get("src"), str):
+                yield obj
+
+    @api.model
+    def _extract_embedded_images(self, value):
+        """Move the ``data:`` images of a design JSON string to shared images.
+
+        Their sources are replaced by cacheable ``/web/image`` URLs, so the
+        JSON stays small and identical uploads are stored once.
+
+        :return: (JSON string, images referenced by the design)
+        """
+        Image = self.env["sale.order.line.personalization.image"].sudo()
+        images = Image.browse()
+        if not value or "data:" not in value and "/web/image/" not in value:
+            return value, images
+        try:
+            design = json.loads(value)
+        except (TypeError, ValueError):
+            return value, images
+        for obj in self._iter_image_objects(design):
+            match = ASSET_URL_RE.match(obj["src"])
+            if match:
+                image = Image.search([("checksum", "=", match["checksum"])], limit=1)
+                if image:
+                    # stored relative, whatever the host it was loaded from
+                    obj["src"] = ASSET_URL.format(id=image.id, checksum=image.checksum)
+                    images |= image
+                continue
+            raw = decode_data_url(obj["src"])
+            if not raw:
+                continue
+            try:
+                image = Image._get_or_create(raw)
+            except UserError:
+                _logger.warning("Keeping an embedded image that is not a supported image file", exc_info=True)
+                continue
+            obj["src"] = ASSET_URL.format(id=image.id, checksum=image.checksum)
+            images |= image
+        return json.dumps(design), images
+
+    @api.model
+    def _use_server_side_preview(self):
+        """Whether previews are rendered server-side instead of sent by the browser."""
+        return bool(self.env["ir.config_parameter"].sudo().get_param(
+            "leo_product_personalizer.server_side_preview"
+        ))
+
+    @api.model
+    def _get_cleanup_params(self):
+        """Abandoned cart age in days (0 disables the cleanup), batch size
+        and time budget in seconds of the cleanup cron."""
+        ICP = self.env["ir.config_parameter"].sudo()
+        return (
+            int(ICP.get_param("leo_product_personalizer.abandoned_cart_days", 30)),
+            int(ICP.get_param("leo_product_personalizer.cleanup_batch_size", 500)),
+            int(ICP.get_param("leo_product_personalizer.cleanup_time_budget", 300)),
+        )
+
+    @api.model
+    def _get_archive_params(self):
+        """Age in days of the confirmed orders whose designs are archived
+        (0 disables the archival) and number of designs per pack."""
+        ICP = self.env["ir.config_parameter"].sudo()
+        return (
+            int(ICP.get_param("leo_product_personalizer.archive_after_days", 0)),
+            int(ICP.get_param("leo_product_personalizer.archive_pack_size", 5000)),
+        )
+
+    @api.model
+    def _use_deferred_processing(self):
+        """Whether the website routes leave the image and JSON processing of
+        the saved designs to the job queue."""
+        return str2bool(self.env["ir.config_parameter"].sudo().get_param(
+            "leo_product_personalizer.deferred_processing", "True"
+        ))
+
+    @api.model
+    def _get_print_size(self):
+        """Default size in pixels of the rendered print files."""
+        return int(self.env["ir.config_parameter"].sudo().get_param(
+            "leo_product_personalizer.print_size", 3200
+        ))
+
+    def _process_deferred(self):
+        """Finish the processing skipped when the design was saved: check
+        the JSON, compact it and move its images out, render the preview
+        when server-side and build the missing image sizes.
+
+        :raise ValidationError: when the design JSON is not a Fabric canvas
+        """
+        self.ensure_one()
+        personalization = self.with_context(defer_personalization_processing=False)
+        value = personalization.personalized_json
+        try:
+            design = json.loads(value or "{}")
+        except ValueError as e:
+            raise ValidationError(self.env._("The design is not valid JSON: %s", e)) from e
+        if not isinstance(design, dict) or not isinstance(design.get("objects", []), list):
+            raise ValidationError(self.env._("The design is not a Fabric canvas."))
+
+        # rewritten through the inverse, even when unchanged
+        personalization.write({"personalized_json": value})
+        if design.get("objects") and personalization._use_server_side_preview():
+            config = personalization.design_config_id
+            raw = personalization._render_design(design, config, personalization.sale_order_line_id.product_id)
+            Image = self.env["sale.order.line.personalization.image"].sudo()
+            personalization.image_id = Image._get_or_create(raw)
+        images = (personalization.image_id | personalization.asset_image_ids).with_context(bin_size=True)
+        images.filtered(lambda image: not image.image_large)._generate_derivatives()
+
+    def _get_design_json(self):
+        """Parsed ``personalized_json``; an empty design when unreadable."""
+        self.ensure_one()
+        try:
+            design = json.loads(self.personalized_json or "{}")
+        except (TypeError, ValueError):
+            _logger.warning("Invalid personalized_json on personalization %s", self.id)
+            design = {}
+        if not isinstance(design, dict):
+            design = {}
+        design.setdefault("objects", [])
+        return design
+
+    def _render_preview(self, size=CANVAS_SIZE, output_format="PNG"):
+        """Render this design server-side and return the image bytes."""
+        self.ensure_one()
+        return render_fabric_json(**self._get_render_kwargs(size=size, output_format=output_format))
+
+    def _get_render_kwargs(self, size=CANVAS_SIZE, output_format="PNG"):
+        """Arguments of ``render_fabric_json`` for this design, e.g. to render
+        it in another process."""
+        self.ensure_one()
+        return self._prepare_render_kwargs(
+            self._get_design_json(),
+            self.design_config_id,
+            self.sale_order_line_id.product_id,
+            size=size,
+            output_format=output_format,
+        )
+
+    @api.model
+    def _render_design(self, canvas_json, config, product, size=CANVAS_SIZE, output_format="PNG"):
+        """Composite ``canvas_json`` onto the background of ``config``.
+
+        The variant image is used as background when the config has none,
+        like the customizer does.
+        """
+        return render_fabric_json(**self._prepare_render_kwargs(
+            canvas_json, config, product, size=size, output_format=output_format,
+        ))
+
+    @api.model
+    def _prepare_render_kwargs(self, canvas_json, config, product, size=CANVAS_SIZE, output_format="PNG"):
+        return {
+            "canvas_json": canvas_json,
+            "background": self._get_render_background(config, product),
+            "clip_box": config._get_restricted_box() if config else None,
+            "size": size,
+            "images": self._get_render_images(canvas_json),
+            "output_format": output_format,
+        }
+
+    @api.model
+    def _get_render_background(self, config, product):
+        if config and config.has_design_image:
+            return base64.b64decode(config.design_image)
+        if product and product.has_personalization_image:
+            return base64.b64decode(product.image_1920)
+        return None
+
+    @api.model
+    def _get_render_images(self, canvas_json):
+        """Raw content of the ``/web/image`` sources used by image objects.
+
+        Only the models the customizer links to are resolved; ``data:``
+        sources are decoded by the renderer itself.
+        """
+        images = {}
+        for obj in self._iter_image_objects(canvas_json):
+            src = obj["src"]
+            if src in images or decode_data_url(src):
+                continue
+            match = IMAGE_URL_RE.match(src)
+            if not match or match["model"] not in RENDER_IMAGE_MODELS:
+                continue
+            record = self.env[match["model"]].sudo().browse(int(match["id"])).exists()
+            field = record._fields.get(match["field"]) if record else None
+            if field and field.type == "binary" and record[match["field"]]:
+                images[src] = base64.b64decode(record[match["field"]])
+        return images
+
+    def _get_preview_urls(self):
+        """Cacheable URLs of the preview in every stored size."""
+        self.ensure_one()
+        image = self.image_id
+        if not image:
+            return {}
+        base_url = f"/web/image/sale.order.line.personalization.image/{image.id}"
+        return {
+            size: f"{base_url}/{field_name}?unique={image.checksum}"
+            for size, field_name in (
+                ("small", "image_small"),
+                ("medium", "image_medium"),
+                ("large", "image_large"),
+                ("original", "image"),
+            )
+        }
+
+    @api.model
+    def _get_abandoned_domain(self, days):
+        """Personalizations of website carts left untouched for ``days``."""
+        return [
+            ("order_id.state", "=", "draft"),
+            ("order_id.website_id", "!=", False),
+            ("order_id.write_date", "<", fields.Datetime.now() - timedelta(days=days)),
+        ]
+
+    @api.model
+    def _cron_cleanup_abandoned(self):
+        """Delete the personalized lines of abandoned carts with their
+        personalizations, then the orphan image attachments.
+
+        Runs in committed batches and stops when the time budget is spent;
+        the next run carries on where it stopped.
+        """
+        days, batch_size, time_budget = self._get_cleanup_params()
+        if days <= 0:
+            return {}
+        IrCron = self.env["ir.cron"]
+        deadline = time.monotonic() + time_budget
+        domain = self._get_abandoned_domain(days)
+        stats = {"lines": 0, "personalizations": 0, "images": 0, "attachments": 0, "bytes": 0}
+        remaining = self.search_count(domain)
+        while remaining and time.monotonic() < deadline:
+            batch = self.search(domain, limit=batch_size, order="id")
+            if not batch:
+                break
+            processed = batch._cleanup_batch(stats)
+            remaining = max(remaining - processed, 0)
+            # commits the batch; stops early when the cron worker is out of time
+            if IrCron._commit_progress(processed, remaining=remaining) <= 0:
+                break
+        if time.monotonic() < deadline:
+            self.env["sale.order.line.personalization.image"]._gc_orphan_attachments(stats)
+            IrCron._commit_progress()
+        _logger.info(
+            "Personalization cleanup: %(lines)s cart lines, %(personalizations)s personalizations, "
+            "%(images)s images and %(attachments)s orphan attachments deleted, %(bytes)s bytes reclaimed",
+            stats,
+        )
+        return stats
+
+    def _cleanup_batch(self, stats):
+        """Delete the cart lines of ``self`` with all their personalizations,
+        and add what was freed to ``stats``.
+
+        A line left without its designs would still be orderable, so the
+        whole line goes.
+
+        :return: number of personalizations deleted
+        """
+        Image = self.env["sale.order.line.personalization.image"]
+        lines = self.sale_order_line_id
+        personalizations = lines.personalization_ids
+        images = personalizations.image_id | personalizations.asset_image_ids
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT COALESCE(SUM(pg_column_size(personalized_json_data)), 0) FROM %s WHERE id IN %s",
+            SQL.identifier(self._table), tuple(personalizations.ids),
+        ))
+        json_bytes = self.env.cr.fetchone()[0]
+        image_bytes = Image._get_attachment_sizes(images.ids)
+        count = len(personalizations)
+        # through the ORM, so that the images they no longer share are freed
+        personalizations.unlink()
+        lines.unlink()
+        freed = images - images.exists()
+        stats["lines"] += len(lines)
+        stats["personalizations"] += count
+        stats["images"] += len(freed)
+        stats["bytes"] += json_bytes + sum(image_bytes.get(image_id, 0) for image_id in freed.ids)
+        return count
+
+    @api.model
+    def _get_archive_dir(self):
+        return os.path.join(self.env["ir.attachment"]._filestore(), "personalization_packs")
+
+    def _read_archived_data(self):
+        """Compressed design JSON of the archived records of ``self``, as
+        ``{personalization_id: bytes}``; records that cannot be read from
+        their pack are left out and logged."""
+        archive_dir = self._get_archive_dir()
+        data = {}
+        for personalization in self:
+            try:
+                payload = get_reader(os.path.join(archive_dir, personalization.archive_pack)).get(personalization.id)
+            except (OSError, PackError):
+                _logger.exception("Cannot read archived design of personalization %s", personalization.id)
+                continue
+            if payload is not None:
+                data[personalization.id] = payload
+        return data
+
+    @api.model
+    def _get_archivable_domain(self, days):
+        """Live designs of confirmed orders placed more than ``days`` ago."""
+        return [
+            ("archive_pack", "=", False),
+            ("order_id.state", "=", "sale"),
+            ("order_id.date_order", "<", fields.Datetime.now() - timedelta(days=days)),
+        ]
+
+    @api.model
+    def _cron_archive_old_orders(self):
+        """Move the design JSON of old confirmed orders to pack files.
+
+        One pack is written per batch, then the batch is committed; the run
+        stops when the cleanup time budget is spent.
+        """
+        days, pack_size = self._get_archive_params()
+        if days <= 0:
+            return {}
+        time_budget = self._get_cleanup_params()[2]
+        IrCron = self.env["ir.cron"]
+        deadline = time.monotonic() + time_budget
+        domain = self._get_archivable_domain(days)
+        stats = {"personalizations": 0, "packs": 0, "bytes": 0}
+        remaining = self.search_count(domain)
+        while remaining and time.monotonic() < deadline:
+            batch = self.search(domain, limit=pack_size, order="id")
+            if not batch:
+                break
+            stats["bytes"] += batch._archive_to_pack()
+            stats["personalizations"] += len(batch)
+            stats["packs"] += 1
+            remaining = max(remaining - len(batch), 0)
+            if IrCron._commit_progress(len(batch), remaining=remaining) <= 0:
+                break
+        _logger.info(
+            "Personalization archival: %(personalizations)s designs moved to %(packs)s packs, "
+            "%(bytes)s bytes",
+            stats,
+        )
+        return stats
+
+    def _archive_to_pack(self):
+        """Write the design JSON of ``self`` to a new pack and drop it from
+        the table.
+
+        The table is updated in SQL: the stored checksum and the design stay
+        the same, nothing is to be recomputed.
+
+        :return: size in bytes of the archived payloads
+        """
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT id, personalized_json_data FROM %s WHERE id IN %s FOR UPDATE",
+            SQL.identifier(self._table), tuple(self.ids),
+        ))
+        entries = [
+            (record_id, base64.b64decode(bytes(data)) if data else b"")
+            for record_id, data in self.env.cr.fetchall()
+        ]
+        self._write_new_pack(entries)
+        return sum(len(payload) for _record_id, payload in entries)
+
+    def _repack(self):
+        """Move the archived designs of ``self`` to a new pack, leaving the
+        entries of the designs deleted or edited since in the old packs.
+
+        :return: number of designs moved
+        """
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT id FROM %s WHERE id IN %s AND archive_pack IS NOT NULL FOR UPDATE",
+            SQL.identifier(self._table), tuple(self.ids),
+        ))
+        archived = self.browse([record_id for record_id, in self.env.cr.fetchall()])
+        archived.invalidate_recordset(["archive_pack"])
+        entries = sorted(archived._read_archived_data().items())
+        if entries:
+            self._write_new_pack(entries)
+        return len(entries)
+
+    @api.model
+    def _write_new_pack(self, entries):
+        """Write the ``(record id, compressed design)`` of ``entries`` to a
+        new pack and point their records to it.
+
+        The pack is written before the transaction commits, so that no
+        committed record points to a missing pack; the pack of a rolled back
+        transaction is deleted by ``_gc_packs``.
+        """
+        archive_dir = self._get_archive_dir()
+        os.makedirs(archive_dir, exist_ok=True)
+        pack_name = "%s-%s%s" % (fields.Datetime.now().strftime("%Y%m%d%H%M%S"), uuid.uuid4().hex[:8], PACK_SUFFIX)
+        write_pack(os.path.join(archive_dir, pack_name), entries)
+        record_ids = tuple(record_id for record_id, _data in entries)
+        self.env.cr.execute(SQL(
+            "UPDATE %s SET personalized_json_data = NULL, archive_pack = %s WHERE id IN %s",
+            SQL.identifier(self._table), pack_name, record_ids,
+        ))
+        self.browse(record_ids).invalidate_recordset(["personalized_json_data", "archive_pack"])
+        return pack_name
+
+    @api.autovacuum
+    def _gc_packs(self):
+        """Delete the pack files no design points to, and rewrite the packs
+        mostly holding designs deleted or edited since they were archived.
+
+        Only the files older than ``PACK_GRACE_HOURS`` are looked at: a
+        younger pack may belong to an archival that is not committed yet.
+        """
+        archive_dir = self._get_archive_dir()
+        if not os.path.isdir(archive_dir):
+            return
+        limit = time.time() - PACK_GRACE_HOURS * 3600
+        names = [
+            entry.name for entry in os.scandir(archive_dir)
+            if entry.is_file() and entry.stat().st_mtime < limit
+        ]
+        if not names:
+            return
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT archive_pack, array_agg(id) FROM %s WHERE archive_pack IN %s GROUP BY archive_pack",
+            SQL.identifier(self._table), tuple(names),
+        ))
+        live_ids = dict(self.env.cr.fetchall())
+        stats = {"deleted": 0, "compacted": 0, "moved": 0}
+        for name in names:
+            path = os.path.join(archive_dir, name)
+            record_ids = live_ids.get(name)
+            if not record_ids:
+                # also the leftovers of interrupted writes
+                drop_reader(path)
+                try:
+                    os.remove(path)
+                except OSError:
+                    _logger.warning("Cannot delete unused pack %s", path, exc_info=True)
+                    continue
+                stats["deleted"] += 1
+                continue
+            try:
+                total = len(get_reader(path))
+            except (OSError, PackError):
+                _logger.exception("Cannot read pack %s", path)
+                continue
+            if len(record_ids) < total * PACK_COMPACT_RATIO:
+                # the old pack is deleted by a next run, once unreferenced
+                stats["moved"] += self.browse(record_ids)._repack()
+                stats["compacted"] += 1
+        _logger.info(
+            "Personalization packs: %(deleted)s unused packs deleted, %(compacted)s packs "
+            "compacted (%(moved)s designs moved)",
+            stats,
+        )
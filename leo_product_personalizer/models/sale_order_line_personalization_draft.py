@@ -0,0 +1,187 @@
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from psycopg2.errors import UniqueViolation
+
+from odoo import api, fields, models
+from odoo.tools import SQL, mute_logger
+
+from ..tools.json_patch import JsonPatchError, apply_patch
+
+_logger = logging.getLogger(__name__)
+
+DRAFT_RETENTION_DAYS = 7
+# largest design JSON kept in a draft, in bytes
+MAX_DRAFT_SIZE = 2 * 1024 * 1024
+
+
+class SaleOrderLinePersonalizationDraft(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _name = "sale.order.line.personalization.draft"
+    _description = "In-progress personalized design, autosaved from the editor"
+    _rec_name = "design_type"
+
+    _draft_key_design_type_uniq = models.Constraint(
+        "UNIQUE(draft_key, design_type)",
+        "There is already a draft for this design side.",
+    )
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    draft_key = fields.Char(
+        string="Draft Key",
+        required=True,
+        readonly=True,
+        index=True,
+        help="Technical field: editing session (browser session and cart "
+             "line or variant) the draft belongs to.",
+    )
+    design_type = fields.Char(string="Design Type", required=True, readonly=True)
+    sale_order_line_id = fields.Many2one(
+        "sale.order.line",
+        string="Sale Order Line",
+        ondelete="cascade",
+        readonly=True,
+    )
+    product_id = fields.Many2one(
+        "product.product",
+        string="Product Variant",
+        ondelete="cascade",
+        readonly=True,
+    )
+    revision = fields.Integer(string="Revision", readonly=True, default=0)
+    design_json = fields.Text(string="Fabric JSON", readonly=True)
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_draft_key(self, session_id, line_id=None, variant_id=None):
+        """Key of the drafts of one editing session.
+
+        The session id is hashed, it must not be readable from the table.
+        """
+        session_hash = hashlib.sha1((session_id or "").encode()).hexdigest()
+        target = "line-%s" % line_id if line_id else "variant-%s" % variant_id
+        return "%s:%s" % (session_hash, target)
+
+    @api.model
+    def _get_drafts(self, draft_key):
+        """Drafts of ``draft_key``, as ``{design_type: {"revision", "json"}}``."""
+        return {
+            draft.design_type: {
+                "revision": draft.revision,
+                "json": draft._get_design(),
+            }
+            for draft in self.search([("draft_key", "=", draft_key)])
+        }
+
+    @api.model
+    def _sync(self, draft_key, design_type, base_revision, patch=None, design=None,
+              line_id=None, variant_id=None):
+        """Apply an editor update to the draft of one side.
+
+        The editor sends either a JSON patch against ``base_revision`` or the
+        full ``design``. A patch against another revision is refused: the
+        editor then resends its full design against the current revision.
+
+        :return: ``{"revision"}`` when applied, ``{"conflict", "revision"}``
+            when the editor is to resend its full design, ``{"error",
+            "revision"}`` when the design is over ``MAX_DRAFT_SIZE``
+        """
+        draft = self.search([("draft_key", "=", draft_key), ("design_type", "=", design_type)], limit=1)
+        if not draft:
+            if design is None:
+                return {"conflict": True, "revision": 0}
+            design_json = json.dumps(design)
+            if len(design_json) > MAX_DRAFT_SIZE:
+                return {"error": "Design too large", "revision": 0}
+            try:
+                with mute_logger("odoo.sql_db"), self.env.cr.savepoint():
+                    draft = self.create({
+                        "draft_key": draft_key,
+                        "design_type": design_type,
+                        "sale_order_line_id": line_id,
+                        "product_id": variant_id,
+                        "revision": 1,
+                        "design_json": design_json,
+                    })
+            except UniqueViolation:
+                # created by a concurrent request, the editor resends
+                return {"conflict": True, "revision": 0}
+            return {"revision": draft.revision}
+
+        # serialize the updates of the same side, e.g. from two tabs
+        self.env.cr.execute(SQL(
+            "SELECT revision FROM %s WHERE id = %s FOR UPDATE",
+            SQL.identifier(self._table), draft.id,
+        ))
+        current_revision = self.env.cr.fetchone()[0]
+        draft.invalidate_recordset()
+        if design is None:
+            if base_revision != current_revision:
+                return {"conflict": True, "revision": current_revision}
+            if not patch:
+                return {"revision": current_revision}
+            try:
+                design = apply_patch(draft._get_design(), patch)
+            except JsonPatchError as e:
+                _logger.info("Refused design patch on draft %s: %s", draft.id, e)
+                return {"conflict": True, "revision": current_revision}
+        design_json = json.dumps(design)
+        if len(design_json) > MAX_DRAFT_SIZE:
+            return {"error": "Design too large", "revision": current_revision}
+        draft.write({
+            "revision": current_revision + 1,
+            "design_json": design_json,
+        })
+        return {"revision": current_revision + 1}
+
+    @api.model
+    def _discard(self, draft_key):
+        """Drop the drafts of ``draft_key``, once the design is in the cart."""
+        self.search([("draft_key", "=", draft_key)]).unlink()
+
+    def _get_design(self):
+        self.ensure_one()
+        try:
+            return json.loads(self.design_json or "{}")
+        except ValueError:
+            return {}
+
+    @api.autovacuum
+    def _gc_old_drafts(self):
+        limit_date = fields.Datetime.now() - timedelta(days=DRAFT_RETENTION_DAYS)
+        self.search([("write_date", "<", limit_date)]).unlink()
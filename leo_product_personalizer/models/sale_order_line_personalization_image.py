@@ -0,0 +1,290 @@
+import base64
+import hashlib
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from PIL import Image, UnidentifiedImageError
+from psycopg2 import IntegrityError
+
+from odoo import api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import SQL, mute_logger
+from odoo.tools.image import IMAGE_MAX_RESOLUTION
+
+from ..tools.thumbnails import make_thumbnail
+
+_logger = logging.getLogger(__name__)
+
+# hours an image may stay unreferenced, see _gc_orphan_images
+UPLOAD_GRACE_HOURS = 1
+# formats accepted for uploaded previews, as named by Pillow
+UPLOAD_FORMATS = {"PNG", "JPEG", "WEBP"}
+# derivative field -> bounding square in pixels
+THUMBNAIL_SIZES = {
+    "image_small": 128,
+    "image_medium": 512,
+    "image_large": 1024,
+}
+
+
+class SaleOrderLinePersonalizationImage(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _name = "sale.order.line.personalization.image"
+    _description = "Personalization image shared by content hash"
+    _rec_name = "checksum"
+
+    _checksum_uniq = models.Constraint(
+        "UNIQUE(checksum)",
+        "A personalization image with this content already exists.",
+    )
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    checksum = fields.Char(
+        string="Checksum",
+        required=True,
+        readonly=True,
+        help="SHA-1 of the raw image content, used to share identical images.",
+    )
+    image = fields.Image("Image", readonly=True)
+    image_small = fields.Binary("Small Image", attachment=True, readonly=True)
+    image_medium = fields.Binary("Medium Image", attachment=True, readonly=True)
+    image_large = fields.Binary("Large Image", attachment=True, readonly=True)
+    personalization_ids = fields.One2many(
+        "sale.order.line.personalization",
+        "image_id",
+        string="Personalizations",
+    )
+    asset_personalization_ids = fields.Many2many(
+        "sale.order.line.personalization",
+        "sale_order_line_personalization_asset_rel",
+        "image_id",
+        "personalization_id",
+        string="Used In Designs",
+    )
+    ref_count = fields.Integer(
+        string="References",
+        compute="_compute_ref_count",
+        help="Number of personalizations using this image as preview or in their design.",
+    )
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    def _compute_ref_count(self):
+        counts = self._get_ref_counts()
+        for image in self:
+            image.ref_count = counts.get(image.id, 0)
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        images = super().create(vals_list)
+        # deferred saves leave the sizes to the personalization job queue
+        if not self.env.context.get("defer_personalization_processing"):
+            images._generate_derivatives()
+        return images
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
+
+    @api.autovacuum
+    def _gc_orphan_images(self):
+        """Free images whose personalizations were deleted by a cascade, and
+        uploaded previews that were never used."""
+        # leave time to the uploads to be referenced by their cart line
+        limit_date = fields.Datetime.now() - timedelta(hours=UPLOAD_GRACE_HOURS)
+        self.search([
+            ("personalization_ids", "=", False),
+            ("asset_personalization_ids", "=", False),
+            ("create_date", "<", limit_date),
+        ])._gc_unreferenced()
+
+    @api.model
+    def _get_or_create(self, raw, checksum=None):
+        """Return the image record holding ``raw``, creating it if needed.
+
+        :param bytes raw: decoded image content
+        :param str checksum: SHA-1 of ``raw`` when already known
+        """
+        if not raw:
+            return self.browse()
+        checksum = checksum or hashlib.sha1(raw).hexdigest()
+        image = self.search([("checksum", "=", checksum)], limit=1)
+        if image:
+            return image
+        try:
+            with mute_logger("odoo.sql_db"), self.env.cr.savepoint():
+                return self.create({
+                    "checksum": checksum,
+                    "image": base64.b64encode(raw),
+                })
+        except IntegrityError:
+            # created by a concurrent transaction in the meantime
+            image = self.search([("checksum", "=", checksum)], limit=1)
+            if not image:
+                raise
+            return image
+
+    @api.model
+    def _get_or_create_from_file(self, file, checksum):
+        """Return the image record holding the content of ``file``.
+
+        The content is only loaded in memory when no image has ``checksum``
+        yet, and once its header was checked to be a PNG, JPEG or WebP image
+        of a sane resolution.
+
+        :param file: readable binary file positioned at the start
+        :param str checksum: SHA-1 of the content of ``file``
+        :raise UserError: when the file is not an accepted image
+        """
+        image = self.search([("checksum", "=", checksum)], limit=1)
+        if image:
+            return image
+        try:
+            # only the header is read, the pixels are not decoded
+            with Image.open(file) as header:
+                image_format, (width, height) = header.format, header.size
+        except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+            raise UserError(self.env._("The preview is not a valid image.")) from e
+        if image_format not in UPLOAD_FORMATS:
+            raise UserError(self.env._("Unsupported preview format: %s", image_format))
+        if width * height > IMAGE_MAX_RESOLUTION:
+            raise UserError(self.env._("The preview resolution is too high."))
+        file.seek(0)
+        return self._get_or_create(file.read(), checksum=checksum)
+
+    @api.model
+    def _get_or_create_from_field(self, record, field_name):
+        """Return the image record for the content of an image field.
+
+        The checksum stored on the field attachment is used for the lookup,
+        so the content is only read when the image is not shared yet.
+        """
+        if not record:
+            return self.browse()
+        attachment = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", record._name),
+            ("res_field", "=", field_name),
+            ("res_id", "=", record.id),
+        ], limit=1)
+        if attachment.checksum:
+            image = self.search([("checksum", "=", attachment.checksum)], limit=1)
+            if image:
+                return image
+        value = record[field_name]
+        if not value:
+            return self.browse()
+        return self._get_or_create(base64.b64decode(value), checksum=attachment.checksum or None)
+
+    def _generate_derivatives(self):
+        """Store the small/medium/large WebP (or JPEG) versions of the images."""
+        for image in self:
+            if not image.image:
+                continue
+            raw = base64.b64decode(image.image)
+            vals = {}
+            for field_name, size in THUMBNAIL_SIZES.items():
+                try:
+                    vals[field_name] = base64.b64encode(make_thumbnail(raw, size))
+                except Exception:
+                    _logger.warning("Could not build %s of personalization image %s", field_name, image.id, exc_info=True)
+            image.write(vals)
+
+    def _get_ref_counts(self):
+        """Number of records referencing each image, as ``{image_id: count}``."""
+        if not self.ids:
+            return {}
+        Personalization = self.env["sale.order.line.personalization"]
+        counts = Counter()
+        for field_name in ("image_id", "asset_image_ids"):
+            for image, count in Personalization._read_group(
+                [(field_name, "in", self.ids)], [field_name], ["__count"],
+            ):
+                counts[image.id] += count
+        return dict(counts)
+
+    def _gc_unreferenced(self):
+        """Delete the images of ``self`` that are no longer referenced.
+
+        The rows are locked first: a concurrent transaction adding a
+        reference either waits for us or makes us wait on its foreign key.
+        """
+        images = self.exists()
+        if not images:
+            return self.browse()
+        self.env.flush_all()
+        self.env.cr.execute(SQL(
+            "SELECT id FROM %s WHERE id IN %s FOR UPDATE",
+            SQL.identifier(self._table), tuple(images.ids),
+        ))
+        counts = images._get_ref_counts()
+        unreferenced = images.filtered(lambda image: not counts.get(image.id))
+        if unreferenced:
+            _logger.info("Freeing %s unreferenced personalization images", len(unreferenced))
+            unreferenced.unlink()
+        return unreferenced
+
+    @api.model
+    def _get_attachment_sizes(self, image_ids):
+        """Size in bytes of the stored files of each image, as ``{image_id: size}``."""
+        if not image_ids:
+            return {}
+        return {
+            res_id: size
+            for res_id, size in self.env["ir.attachment"].sudo()._read_group(
+                [("res_model", "=", self._name), ("res_id", "in", image_ids), ("res_field", "!=", False)],
+                ["res_id"], ["file_size:sum"],
+            )
+        }
+
+    @api.model
+    def _gc_orphan_attachments(self, stats=None):
+        """Delete the image attachments of personalization records that no
+        longer exist, e.g. left over by a deletion in raw SQL."""
+        self.env.flush_all()
+        orphan_ids = []
+        for model in ("sale.order.line.personalization", self._name):
+            self.env.cr.execute(SQL(
+                """
+                SELECT a.id FROM ir_attachment a
+                 WHERE a.res_model = %s AND a.res_field IS NOT NULL
+                   AND NOT EXISTS (SELECT 1 FROM %s r WHERE r.id = a.res_id)
+                """,
+                model, SQL.identifier(self.env[model]._table),
+            ))
+            orphan_ids += [row[0] for row in self.env.cr.fetchall()]
+        attachments = self.env["ir.attachment"].sudo().browse(orphan_ids)
+        if stats is not None:
+            stats["attachments"] += len(attachments)
+            stats["bytes"] += sum(attachments.mapped("file_size"))
+        # the files themselves are freed by the filestore garbage collector
+        attachments.unlink()
+        return attachments
@@ -0,0 +1,174 @@
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.exceptions import ValidationError
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# minutes before the first retry, doubled at each attempt
+RETRY_DELAY = 2
+DONE_JOB_RETENTION_DAYS = 7
+
+
+class SaleOrderLinePersonalizationJob(models.Model):
+    # ------------------------------------------------------------------
+    # 1. PRIVATE ATTRIBUTES
+    # ------------------------------------------------------------------
+
+    _name = "sale.order.line.personalization.job"
+    _description = "Deferred processing of a saved personalization"
+    _order = "id desc"
+
+    _pending_next_attempt_idx = models.Index("(next_attempt) WHERE state = 'pending'")
+
+    # ------------------------------------------------------------------
+    # 2. DEFAULT METHODS AND default_get
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 3. FIELD DECLARATIONS
+    # ------------------------------------------------------------------
+
+    personalization_id = fields.Many2one(
+        "sale.order.line.personalization",
+        string="Personalization",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        string="Status",
+        required=True,
+        default="pending",
+        readonly=True,
+    )
+    attempts = fields.Integer(string="Attempts", readonly=True)
+    next_attempt = fields.Datetime(
+        string="Next Attempt",
+        default=fields.Datetime.now,
+        readonly=True,
+    )
+    date_done = fields.Datetime(string="Done On", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    # ------------------------------------------------------------------
+    # 4. COMPUTE, INVERSE AND SEARCH METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 5. SELECTION METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 6. CONSTRAINTS METHODS AND ONCHANGE METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 7. CRUD METHODS
+    # ------------------------------------------------------------------
+
+    # ------------------------------------------------------------------
+    # 8. ACTION METHODS
+    # ------------------------------------------------------------------
+
+    def action_retry(self):
+        """Queue failed jobs again."""
+        self.filtered(lambda job: job.state == "failed").write({
+            "state": "pending",
+            "attempts": 0,
+            "next_attempt": fields.Datetime.now(),
+        })
+        self._trigger_processing()
+
+    # ------------------------------------------------------------------
+    # 9. BUSINESS METHODS
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _enqueue(self, personalizations):
+        """Queue the processing of ``personalizations``, once each."""
+        pending = self.search([
+            ("personalization_id", "in", personalizations.ids),
+            ("state", "=", "pending"),
+        ]).personalization_id
+        to_queue = personalizations - pending
+        if not to_queue:
+            return self.browse()
+        jobs = self.create([{"personalization_id": personalization.id} for personalization in to_queue])
+        self._trigger_processing()
+        return jobs
+
+    @api.model
+    def _trigger_processing(self):
+        # runs the cron as soon as a worker is free, after the commit
+        self.env.ref("leo_product_personalizer.ir_cron_process_personalization_jobs")._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Run the due jobs one at a time, committing after each.
+
+        Jobs are picked with SKIP LOCKED so concurrent runs share the queue.
+        """
+        IrCron = self.env["ir.cron"]
+        while True:
+            self.env.cr.execute(SQL(
+                """
+                SELECT id FROM %s
+                 WHERE state = 'pending' AND next_attempt <= %s
+                 ORDER BY next_attempt, id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+                """,
+                SQL.identifier(self._table), fields.Datetime.now(),
+            ))
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            self.browse(row[0])._run()
+            remaining = self.search_count([("state", "=", "pending"), ("next_attempt", "<=", fields.Datetime.now())])
+            if IrCron._commit_progress(1, remaining=remaining) <= 0:
+                break
+
+    def _run(self):
+        """Process the personalization of the job and record the outcome."""
+        self.ensure_one()
+        attempts = self.attempts + 1
+        try:
+            with self.env.cr.savepoint():
+                self.personalization_id._process_deferred()
+        except ValidationError as e:
+            # the design itself is wrong, retrying would not help
+            _logger.warning("Personalization %s is invalid: %s", self.personalization_id.id, e)
+            self.write({"state": "failed", "attempts": attempts, "last_error": str(e)})
+        except Exception as e:
+            _logger.warning(
+                "Processing of personalization %s failed (attempt %s/%s)",
+                self.personalization_id.id, attempts, MAX_ATTEMPTS, exc_info=True,
+            )
+            self.write({
+                "state": "failed" if attempts >= MAX_ATTEMPTS else "pending",
+                "attempts": attempts,
+                "next_attempt": fields.Datetime.now() + timedelta(minutes=RETRY_DELAY * 2 ** (attempts - 1)),
+                "last_error": str(e),
+            })
+        else:
+            self.write({
+                "state": "done",
+                "attempts": attempts,
+                "date_done": fields.Datetime.now(),
+                "last_error": False,
+            })
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=DONE_JOB_RETENTION_DAYS)
+        self.search([("state", "=", "done"), ("date_done", "<", limit_date)]).unlink()
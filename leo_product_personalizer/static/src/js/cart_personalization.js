@@ -1,7 +1,6 @@
 /** @odoo-module **/
 
 import publicWidget from '@web/legacy/js/public/public_widget';
-import { rpc } from '@web/core/network/rpc';
 
 publicWidget.registry.CartPersonalizationButtons = publicWidget.Widget.extend({
     selector: '.o_cart_product',
@@ -19,8 +18,14 @@ publicWidget.registry.CartPersonalizationButtons = publicWidget.Widget.extend({
     _onClickPreviewDesign: function (ev) {
         ev.preventDefault();
         const lineId = $(ev.currentTarget).data('line-id');
-        rpc('/shop/cart/preview_personalization', {
-            line_id: parseInt(lineId)
+        fetch(`/shop/cart/preview_personalization/${parseInt(lineId)}`, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' },
+        }).then((response) => {
+            if (!response.ok) {
+                throw new Error(`Failed to load preview (${response.status})`);
+            }
+            return response.json();
         }).then((result) => {
             this._showPreviewModal(result);
         }).catch((error) => {
@@ -2,6 +2,7 @@
 
 import { registry } from "@web/core/registry";
 import { Component, onMounted, onWillUnmount, onPatched, useRef, useState } from "@odoo/owl";
+import { imageCacheKey } from "@web/views/fields/image/image_field";
 import { standardFieldProps } from "@web/views/fields/standard_field_props";
 
 class DesignAreaWidget extends Component {
@@ -17,7 +18,10 @@ class DesignAreaWidget extends Component {
             initialized: false,
             hasImage: false,
             isRestricted: false,
+            imageBox: null,
         });
+        // where the design image sits on the canvas, see loadBackgroundImage
+        this.imageLayout = null;
         this.fabricCanvas = null;
         this.restrictedRect = null;
         this.previousImageId = null;
@@ -82,6 +86,8 @@ class DesignAreaWidget extends Component {
             this.fabricCanvas.dispose();
             this.fabricCanvas = null;
             this.restrictedRect = null;
+            this.imageLayout = null;
+            this.state.imageBox = null;
         }
 
         if (!hasImage) {
@@ -101,8 +107,10 @@ class DesignAreaWidget extends Component {
                 backgroundColor: "#f5f5f5",
             });
 
-            // Load image
-            const imageUrl = `/web/image/product.design.config/${recordId}/design_image`;
+            // Edit against the downscaled proxy, laid out as the original
+            // write_date is loaded through the fieldDependencies below
+            const unique = this.record.data.write_date ? `?unique=${imageCacheKey(this.record.data.write_date)}` : '';
+            const imageUrl = `/web/image/product.design.config/${recordId}/design_image_proxy${unique}`;
             
             await this.loadBackgroundImage(imageUrl);            
             this.createRestrictedRect();
@@ -126,15 +134,24 @@ class DesignAreaWidget extends Component {
                     return;
                 }
 
+                // The proxy is placed where the full-size image would be, so
+                // the bounds mean the same as when editing the original.
+                const originalWidth = this.record.data.design_image_width || img.width;
+                const originalHeight = this.record.data.design_image_height || img.height;
                 const w = this.fabricCanvas.getWidth();
                 const h = this.fabricCanvas.getHeight();
-                const scale = Math.min(w / img.width, h / img.height);
+                const scale = Math.min(w / originalWidth, h / originalHeight);
+                this.imageLayout = {
+                    left: (w - originalWidth * scale) / 2,
+                    top: (h - originalHeight * scale) / 2,
+                    scale: scale,
+                };
 
                 img.set({
-                    left: (w - img.width * scale) / 2,
-                    top: (h - img.height * scale) / 2,
-                    scaleX: scale,
-                    scaleY: scale,
+                    left: this.imageLayout.left,
+                    top: this.imageLayout.top,
+                    scaleX: (originalWidth * scale) / img.width,
+                    scaleY: (originalHeight * scale) / img.height,
                     selectable: false,
                     evented: false,
                 });
@@ -242,6 +259,23 @@ class DesignAreaWidget extends Component {
             width: this.record.data.bound_width,
             height: this.record.data.bound_height
         };
+        this.state.imageBox = this.toImagePixels(this.previousBounds);
+    }
+
+    /**
+     * Canvas bounds as pixels of the original design image.
+     */
+    toImagePixels(bounds) {
+        if (!this.imageLayout) {
+            return null;
+        }
+        const { left, top, scale } = this.imageLayout;
+        return {
+            x: Math.round(((bounds.x || 0) - left) / scale),
+            y: Math.round(((bounds.y || 0) - top) / scale),
+            width: Math.round((bounds.width || 0) / scale),
+            height: Math.round((bounds.height || 0) / scale),
+        };
     }
 
     updateRectFromFields() {
@@ -309,4 +343,5 @@ class DesignAreaWidget extends Component {
 
 registry.category("fields").add("design_area_widget", {
     component: DesignAreaWidget,
+    fieldDependencies: [{ name: "write_date", type: "datetime" }],
 });
\ No newline at end of file
@@ -3,6 +3,66 @@
 import publicWidget from '@web/legacy/js/public/public_widget';
 import { rpc } from '@web/core/network/rpc';
 
+// design autosave: quiet time before syncing, and longest delay of an edit (ms)
+const DRAFT_DEBOUNCE = 1500;
+const DRAFT_MAX_WAIT = 10000;
+// undo/redo: steps kept, steps between checkpoints, and the props that
+// cannot be changed with ``set()`` and need the object to be rebuilt
+const HISTORY_LIMIT = 50;
+const HISTORY_CHECKPOINT = 10;
+const HISTORY_REBUILD_KEYS = ['type', 'src', 'objects', 'path', 'clipPath', 'filters'];
+// decoded background images kept for side switches and previews
+const IMAGE_CACHE_SIZE = 16;
+
+/**
+ * Bounded LRU of decoded images by URL, shared by all the editors of the
+ * page. Pending loads are cached too, so concurrent users share them.
+ */
+const imageCache = {
+    entries: new Map(),
+
+    /**
+     * Decoded ``<img>`` element of ``url``.
+     */
+    get: function (url) {
+        let promise = this.entries.get(url);
+        if (promise) {
+            // most recently used last
+            this.entries.delete(url);
+        } else {
+            promise = this._load(url).catch((error) => {
+                if (this.entries.get(url) === promise) {
+                    this.entries.delete(url);
+                }
+                throw error;
+            });
+        }
+        this.entries.set(url, promise);
+        while (this.entries.size > IMAGE_CACHE_SIZE) {
+            this.entries.delete(this.entries.keys().next().value);
+        }
+        return promise;
+    },
+
+    _load: function (url) {
+        return new Promise(function (resolve, reject) {
+            const element = new Image();
+            // keeps the preview canvases exportable
+            element.crossOrigin = 'anonymous';
+            element.onload = function () {
+                // decode now, not on the first draw
+                (element.decode ? element.decode() : Promise.resolve())
+                    .catch(function () {})
+                    .then(function () { resolve(element); });
+            };
+            element.onerror = function () {
+                reject(new Error(`Failed to load image ${url}`));
+            };
+            element.src = url;
+        });
+    },
+};
+
 publicWidget.registry.ProductPagePersonalization = publicWidget.Widget.extend({
     selector: '.oe_website_sale:not(.o_product_personalize_page)',
     events: {
@@ -49,7 +109,10 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
     start: function () {
         const self = this;
         self.history = [];
-        self.historyStep = -1;
+        self.historyStep = 0;
+        self._historySnapshot = null;
+        self._historyBase = null;
+        self._historyBusy = false;
         self.isUndoRedoAction = false;
         self.designData = {};
         self.activeDesignType = null;
@@ -62,6 +125,14 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         self.editMode = false;
         self.editLineId = null;
         self.editVariantId = null;
+        // autosave: last revision and JSON acknowledged by the server, per side
+        self.draftRevisions = {};
+        self.draftSynced = {};
+        self._draftTimer = null;
+        self._draftDirtySince = null;
+        self._draftInFlight = false;
+        // sides whose sync waits for the running one
+        self._draftPending = new Set();
 
         return this._super.apply(this, arguments).then(function () {
             // Check if we're in edit mode
@@ -74,6 +145,8 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                 if (self.editMode && self.editLineId) {
                     return self._loadEditModeData();
                 }
+            }).then(function () {
+                return self._loadDrafts();
             }).then(function () {
                 self._setupEventListeners();
                 self._setupKeyboardShortcuts();
@@ -84,11 +157,34 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
 
 
 
+    /**
+     * Parse the JSON the page was rendered with in the hidden input
+     * ``inputId``. It is only used once: later loads go to the server.
+     *
+     * @returns {Object|null}
+     */
+    _popInlineData: function (inputId) {
+        const $input = this.$(`#${inputId}`);
+        const raw = $input.val();
+        $input.val('');
+        if (!raw) {
+            return null;
+        }
+        try {
+            return JSON.parse(raw);
+        } catch (e) {
+            console.error(`Invalid inline data in #${inputId}:`, e);
+            return null;
+        }
+    },
+
     _loadEditModeData: function () {
         const self = this;
-        return rpc('/shop/cart/get_line_personalization', {
+        const inlineDesigns = self._popInlineData('personalization_line_designs');
+        const designsPromise = inlineDesigns ? Promise.resolve(inlineDesigns) : rpc('/shop/cart/get_line_personalization', {
             line_id: self.editLineId
-        }).then(function (result) {
+        });
+        return designsPromise.then(function (result) {
             if (!result.success) {
                 console.error('Failed to load line personalization:', result.error);
                 return;
@@ -178,6 +274,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                     console.warn('assignLayerId failed', err);
                 }
                 self._renderLayersList();
+                self._scheduleDraftSync();
             }
         });
 
@@ -188,6 +285,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                 }
                 self._clampObjectToZone(e.target);
                 self._renderLayersList();
+                self._scheduleDraftSync();
             }
         });
 
@@ -197,9 +295,19 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                     self._saveState();
                 }
                 self._renderLayersList();
+                self._scheduleDraftSync();
             }
         });
 
+        self.fabricCanvas.on('text:changed', function () {
+            self._scheduleDraftSync();
+        });
+
+        // a closed or crashed tab keeps what was typed last
+        window.addEventListener('pagehide', function () {
+            self._flushDraftOnHide();
+        });
+
         self.fabricCanvas.on('object:moving', function (e) {
             if (e.target && e.target.isZoneRect !== true && e.target !== self.zoneRect) {
                 self._clampObjectToZone(e.target);
@@ -315,16 +423,16 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         // In edit mode, use the stored variant ID
         const variantIdParam = self.editMode && self.editVariantId ? self.editVariantId : null;
 
-        return rpc('/shop/product_personalization_data', {
-            product_id: self.productId,
-            variant_id: variantIdParam
-        }).then(function (data) {
+        const inlineData = self._popInlineData('personalization_initial_data');
+        const dataPromise = inlineData ? Promise.resolve(inlineData) : self._fetchProductData(variantIdParam);
+        return dataPromise.then(function (data) {
             if (data.error) {
                 alert(data.error);
                 throw new Error(data.error);
             }
             self.productData = data;
             self.activeVariantId = data.active_variant_id;
+            self._prefetchBackgrounds();
             return data;
         }).catch(function (error) {
             console.error('Failed to load product data:', error);
@@ -333,6 +441,23 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         });
     },
 
+    /**
+     * Load the personalization metadata with a conditional GET, so the
+     * browser revalidates its cached copy instead of downloading it again.
+     */
+    _fetchProductData: function (variantId) {
+        const query = variantId ? `?variant_id=${variantId}` : '';
+        return fetch(`/shop/product_personalization_data/${this.productId}${query}`, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' },
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error(`Failed to load product data (${response.status})`);
+            }
+            return response.json();
+        });
+    },
+
     _onVariantChange: function (ev) {
         const self = this;
 
@@ -356,16 +481,15 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         // Switch variant
         self.activeVariantId = newVariantId;
         self.designData = {};
+        self._resetDraftState();
 
-        return rpc('/shop/product_personalization_data', {
-            product_id: self.productId,
-            variant_id: newVariantId
-        }).then(function (data) {
+        return self._fetchProductData(newVariantId).then(function (data) {
             if (data.error) {
                 alert(data.error);
                 return;
             }
             self.productData = data;
+            self._prefetchBackgrounds();
 
             // Update variant grid UI
             self._renderVariantGrid();
@@ -415,28 +539,6 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         this.$('#shapes_grid').show();
     },
 
-    _saveState: function () {
-        const self = this;
-        try {
-            self.history = self.history.slice(0, self.historyStep + 1);
-
-            const canvasJSON = self.fabricCanvas.toJSON();
-
-            // Filter out zone rectangles from history
-            if (canvasJSON.objects) {
-                canvasJSON.objects = canvasJSON.objects.filter(function (obj) {
-                    return !obj.isZoneRect && obj.name !== 'zoneRect';
-                });
-            }
-
-            self.history.push(JSON.stringify(canvasJSON));
-            self.historyStep++;
-            self._updateHistoryButtons();
-        } catch (e) {
-            console.error('saveState error', e);
-        }
-    },
-
     _updateFontSizeOnScale: function (obj) {
         const scale = Math.max(obj.scaleX, obj.scaleY);
         const newFontSize = (obj.fontSize || 20) * scale;
@@ -456,48 +558,294 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
             obj.set('diameter', (obj.diameter || 250) * scale);
         }
     },
+    // ---------------------------------------------------------------------
+    // Undo/redo history: a bounded ring of reversible diffs between canvas
+    // snapshots, with a checkpoint snapshot every HISTORY_CHECKPOINT steps.
+    // A snapshot maps the layer id of each object to its ``toObject()``
+    // props; unchanged props are shared between snapshots, not copied.
+    // ---------------------------------------------------------------------
+
+    _resetHistory: function () {
+        this.history = [];
+        this.historyStep = 0;
+        this._historySnapshot = this._takeHistorySnapshot();
+        this._historyBase = this._historySnapshot;
+        this._updateHistoryButtons();
+    },
+
+    _saveState: function () {
+        const self = this;
+        try {
+            if (!self._historySnapshot) {
+                self._resetHistory();
+                return;
+            }
+            const snapshot = self._takeHistorySnapshot();
+            const ops = self._diffHistorySnapshots(self._historySnapshot, snapshot);
+            if (!ops.length) {
+                return;
+            }
+            // a new edit drops the redo tail
+            self.history = self.history.slice(0, self.historyStep);
+            const entry = { ops: ops };
+            if ((self.history.length + 1) % HISTORY_CHECKPOINT === 0) {
+                entry.checkpoint = snapshot;
+            }
+            self.history.push(entry);
+            self.historyStep = self.history.length;
+            self._historySnapshot = snapshot;
+
+            while (self.history.length > HISTORY_LIMIT) {
+                const dropped = self.history.shift();
+                self._historyBase = dropped.checkpoint || self._applyOpsToSnapshot(self._historyBase, dropped.ops);
+                self.historyStep--;
+            }
+            self._updateHistoryButtons();
+        } catch (e) {
+            console.error('saveState error', e);
+        }
+    },
+
+    _getHistoryObjects: function () {
+        const self = this;
+        return self.fabricCanvas.getObjects().filter(function (obj) {
+            return obj !== self.zoneRect && !obj.isZoneRect && obj.name !== 'zoneRect';
+        });
+    },
+
+    _takeHistorySnapshot: function () {
+        const self = this;
+        const previous = self._historySnapshot;
+        const order = [];
+        const props = new Map();
+        self._assignLayerIds();
+        self._getHistoryObjects().forEach(function (obj) {
+            const id = obj.__layerId;
+            const current = obj.toObject();
+            const before = previous && previous.props.get(id);
+            props.set(id, before && !self._changedHistoryKeys(before, current).length ? before : current);
+            order.push(id);
+        });
+        return { order: order, props: props };
+    },
+
+    _changedHistoryKeys: function (before, after) {
+        const keys = new Set(Object.keys(before).concat(Object.keys(after)));
+        return Array.from(keys).filter(function (key) {
+            const a = before[key];
+            const b = after[key];
+            if (a === b) {
+                return false;
+            }
+            if (a && b && typeof a === 'object' && typeof b === 'object') {
+                return JSON.stringify(a) !== JSON.stringify(b);
+            }
+            return true;
+        });
+    },
+
+    /**
+     * Operations turning snapshot ``before`` into ``after``: removals
+     * (last first), additions, modifications, then the stacking order.
+     */
+    _diffHistorySnapshots: function (before, after) {
+        const self = this;
+        const ops = [];
+        for (let index = before.order.length - 1; index >= 0; index--) {
+            const id = before.order[index];
+            if (!after.props.has(id)) {
+                ops.push({ type: 'remove', id: id, index: index, props: before.props.get(id) });
+            }
+        }
+        after.order.forEach(function (id, index) {
+            if (!before.props.has(id)) {
+                ops.push({ type: 'add', id: id, index: index, props: after.props.get(id) });
+            }
+        });
+        after.order.forEach(function (id) {
+            const previous = before.props.get(id);
+            const current = after.props.get(id);
+            if (previous && previous !== current) {
+                ops.push({
+                    type: 'modify',
+                    id: id,
+                    keys: self._changedHistoryKeys(previous, current),
+                    before: previous,
+                    after: current,
+                });
+            }
+        });
+        const kept = before.order.filter(function (id) { return after.props.has(id); });
+        const order = after.order.filter(function (id) { return before.props.has(id); });
+        if (kept.join() !== order.join()) {
+            ops.push({ type: 'order', before: before.order, after: after.order });
+        }
+        return ops;
+    },
+
+    _invertHistoryOps: function (ops) {
+        return ops.slice().reverse().map(function (op) {
+            switch (op.type) {
+                case 'add': return Object.assign({}, op, { type: 'remove' });
+                case 'remove': return Object.assign({}, op, { type: 'add' });
+                case 'modify': return Object.assign({}, op, { before: op.after, after: op.before });
+                default: return Object.assign({}, op, { before: op.after, after: op.before });
+            }
+        });
+    },
+
+    _applyOpsToSnapshot: function (snapshot, ops) {
+        let order = snapshot.order.slice();
+        const props = new Map(snapshot.props);
+        ops.forEach(function (op) {
+            if (op.type === 'remove') {
+                order.splice(order.indexOf(op.id), 1);
+                props.delete(op.id);
+            } else if (op.type === 'add') {
+                order.splice(op.index, 0, op.id);
+                props.set(op.id, op.props);
+            } else if (op.type === 'modify') {
+                props.set(op.id, op.after);
+            } else if (op.type === 'order') {
+                order = op.after.slice();
+            }
+        });
+        return { order: order, props: props };
+    },
+
+    _enlivenHistoryObject: function (id, props) {
+        return new Promise(function (resolve) {
+            fabric.util.enlivenObjects([props], function (objects) {
+                objects[0].__layerId = id;
+                resolve(objects[0]);
+            });
+        });
+    },
+
+    /**
+     * Apply history operations to the live canvas, object by object.
+     */
+    _applyHistoryOps: async function (ops) {
+        const self = this;
+        const canvas = self.fabricCanvas;
+        const findObject = function (id) {
+            return self._getHistoryObjects().find(function (obj) { return obj.__layerId === id; });
+        };
+        for (const op of ops) {
+            if (op.type === 'remove') {
+                const obj = findObject(op.id);
+                if (!obj) {
+                    throw new Error(`Missing layer ${op.id}`);
+                }
+                canvas.remove(obj);
+            } else if (op.type === 'add') {
+                const obj = await self._enlivenHistoryObject(op.id, op.props);
+                canvas.insertAt(obj, Math.min(op.index, canvas.getObjects().length));
+            } else if (op.type === 'modify') {
+                const obj = findObject(op.id);
+                if (!obj) {
+                    throw new Error(`Missing layer ${op.id}`);
+                }
+                if (op.keys.some(function (key) { return HISTORY_REBUILD_KEYS.includes(key); })) {
+                    // not settable in place: rebuild this object only
+                    const index = canvas.getObjects().indexOf(obj);
+                    canvas.remove(obj);
+                    canvas.insertAt(await self._enlivenHistoryObject(op.id, op.after), index);
+                } else {
+                    const values = {};
+                    op.keys.forEach(function (key) { values[key] = op.after[key]; });
+                    obj.set(values);
+                    if (obj.initDimensions) {
+                        obj.initDimensions();
+                    }
+                    obj.setCoords();
+                }
+            } else if (op.type === 'order') {
+                op.after.forEach(function (id, index) {
+                    const obj = findObject(id);
+                    if (obj) {
+                        canvas.moveTo(obj, index);
+                    }
+                });
+            }
+        }
+    },
+
+    /**
+     * Fallback of the incremental undo: rebuild the objects from the
+     * nearest checkpoint before ``step``, replaying the diffs after it.
+     */
+    _rebuildHistoryStep: async function (step) {
+        const self = this;
+        let snapshot = self._historyBase;
+        let start = 0;
+        for (let index = step - 1; index >= 0; index--) {
+            if (self.history[index].checkpoint) {
+                snapshot = self.history[index].checkpoint;
+                start = index + 1;
+                break;
+            }
+        }
+        for (let index = start; index < step; index++) {
+            snapshot = self._applyOpsToSnapshot(snapshot, self.history[index].ops);
+        }
+        self._getHistoryObjects().forEach(function (obj) {
+            self.fabricCanvas.remove(obj);
+        });
+        for (const id of snapshot.order) {
+            self.fabricCanvas.add(await self._enlivenHistoryObject(id, snapshot.props.get(id)));
+        }
+        return snapshot;
+    },
+
     _updateHistoryButtons: function () {
         this.$('#undo_button').prop('disabled', this.historyStep <= 0);
-        this.$('#redo_button').prop('disabled', this.historyStep >= this.history.length - 1);
+        this.$('#redo_button').prop('disabled', this.historyStep >= this.history.length);
     },
 
     _onClickUndo: function () {
-        if (this.historyStep > 0) {
-            this.historyStep--;
-            this._loadHistoryState();
+        if (this.historyStep > 0 && !this._historyBusy) {
+            const entry = this.history[this.historyStep - 1];
+            this._moveHistory(this.historyStep - 1, this._invertHistoryOps(entry.ops));
         }
     },
 
     _onClickRedo: function () {
-        if (this.historyStep < this.history.length - 1) {
-            this.historyStep++;
-            this._loadHistoryState();
+        if (this.historyStep < this.history.length && !this._historyBusy) {
+            const entry = this.history[this.historyStep];
+            this._moveHistory(this.historyStep + 1, entry.ops);
         }
     },
 
-    _loadHistoryState: function () {
+    _moveHistory: async function (step, ops) {
         const self = this;
+        self._historyBusy = true;
         self.isUndoRedoAction = true;
-        const bg = self.fabricCanvas.backgroundImage;
-        const currentZone = self.zone;
-
-        self.fabricCanvas.loadFromJSON(self.history[self.historyStep], function () {
-            if (bg) {
-                self.fabricCanvas.setBackgroundImage(bg, self.fabricCanvas.renderAll.bind(self.fabricCanvas));
+        try {
+            try {
+                await self._applyHistoryOps(ops);
+                self._historySnapshot = self._applyOpsToSnapshot(self._historySnapshot, ops);
+            } catch (e) {
+                console.warn('Incremental undo failed, rebuilding from checkpoint', e);
+                self._historySnapshot = await self._rebuildHistoryStep(step);
             }
-            if (currentZone) {
-                self._setZone(currentZone);
-
-                self.fabricCanvas.getObjects().forEach(function (obj) {
-                    if (obj !== self.zoneRect && !obj.isZoneRect) {
-                        self._clampObjectToZone(obj);
-                    }
+            self.historyStep = step;
+            // an entry recorded before the zone changed may lie outside it
+            if (self.zone) {
+                self._getHistoryObjects().forEach(function (obj) {
+                    self._clampObjectToZone(obj);
                 });
             }
+            self._ensureZoneOnTop();
+            self.fabricCanvas.discardActiveObject();
             self.fabricCanvas.renderAll();
+            self._renderLayersList();
+        } finally {
             self.isUndoRedoAction = false;
+            self._historyBusy = false;
             self._updateHistoryButtons();
-        });
+        }
+        self._scheduleDraftSync();
     },
 
     _deleteActiveObject: function () {
@@ -1020,6 +1368,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         if (!newType || newType === this.activeDesignType) return;
 
         this._saveCurrentSideState();
+        this._syncDraft(this.activeDesignType);
         this.activeDesignType = newType;
         this._loadDesignType(newType);
     },
@@ -1051,6 +1400,195 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         }
     },
 
+    // ---------------------------------------------------------------------
+    // Draft autosave: the edits are sent as JSON patches against the last
+    // revision the server acknowledged, debounced so rapid edits coalesce.
+    // ---------------------------------------------------------------------
+
+    _getDraftTarget: function () {
+        return this.editMode && this.editLineId
+            ? { line_id: this.editLineId }
+            : { variant_id: this.activeVariantId };
+    },
+
+    _resetDraftState: function () {
+        clearTimeout(this._draftTimer);
+        this.draftRevisions = {};
+        this.draftSynced = {};
+        this._draftDirtySince = null;
+        this._draftPending.clear();
+    },
+
+    _loadDrafts: function () {
+        const self = this;
+        return rpc('/shop/personalize/draft/load', self._getDraftTarget()).then(function (result) {
+            if (!result || !result.success) {
+                return;
+            }
+            Object.entries(result.drafts || {}).forEach(function ([designType, draft]) {
+                self.designData[designType] = Object.assign(self.designData[designType] || {}, { json: draft.json });
+                self.draftRevisions[designType] = draft.revision;
+                self.draftSynced[designType] = JSON.stringify(draft.json);
+            });
+        }).catch(function (error) {
+            console.warn('Could not load the autosaved designs:', error);
+        });
+    },
+
+    _scheduleDraftSync: function () {
+        const self = this;
+        if (self.isUndoRedoAction || !self.activeDesignType) {
+            return;
+        }
+        const now = Date.now();
+        self._draftDirtySince = self._draftDirtySince || now;
+        clearTimeout(self._draftTimer);
+        // debounce, but never hold edits back for more than DRAFT_MAX_WAIT
+        const delay = Math.max(0, Math.min(DRAFT_DEBOUNCE, self._draftDirtySince + DRAFT_MAX_WAIT - now));
+        self._draftTimer = setTimeout(function () {
+            self._saveCurrentSideState();
+            self._syncDraft(self.activeDesignType);
+        }, delay);
+    },
+
+    /**
+     * @returns {Object|null} the sync parameters of ``designType``, null when
+     *      the server already has its current state
+     */
+    _prepareDraftSync: function (designType, fullDesign) {
+        const saved = this.designData[designType];
+        if (!saved || !saved.json) {
+            return null;
+        }
+        const current = JSON.parse(JSON.stringify(saved.json));
+        const params = Object.assign({ design_type: designType }, this._getDraftTarget());
+        const synced = this.draftSynced[designType];
+        if (synced && !fullDesign) {
+            const patch = this._diffJson(JSON.parse(synced), current, '');
+            if (!patch.length) {
+                return null;
+            }
+            params.base_revision = this.draftRevisions[designType];
+            params.patch = patch;
+        } else {
+            params.base_revision = this.draftRevisions[designType] || 0;
+            params.design = current;
+        }
+        return { params: params, current: current };
+    },
+
+    _syncDraft: function (designType, fullDesign) {
+        const self = this;
+        if (!designType) {
+            return Promise.resolve();
+        }
+        if (self._draftInFlight) {
+            // sent once the running sync is answered; kept per side, so that
+            // switching sides meanwhile does not drop the edits of the side left
+            self._draftPending.add(designType);
+            return Promise.resolve();
+        }
+        const sync = self._prepareDraftSync(designType, fullDesign);
+        self._draftDirtySince = null;
+        if (!sync) {
+            return self._syncPendingDraft();
+        }
+        self._draftInFlight = true;
+        return rpc('/shop/personalize/draft/sync', sync.params).then(function (result) {
+            self._draftInFlight = false;
+            if (result && result.success) {
+                self.draftRevisions[designType] = result.revision;
+                self.draftSynced[designType] = JSON.stringify(sync.current);
+            } else if (result && result.conflict && !fullDesign) {
+                self.draftRevisions[designType] = result.revision;
+                return self._syncDraft(designType, true);
+            } else if (result && result.error) {
+                console.warn('Autosave refused:', result.error);
+            }
+        }).catch(function (error) {
+            self._draftInFlight = false;
+            console.warn('Autosave failed:', error);
+        }).then(function () {
+            return self._syncPendingDraft();
+        });
+    },
+
+    _syncPendingDraft: function () {
+        if (this._draftInFlight || !this._draftPending.size) {
+            return Promise.resolve();
+        }
+        const designType = this._draftPending.values().next().value;
+        this._draftPending.delete(designType);
+        return this._syncDraft(designType);
+    },
+
+    /**
+     * Send the pending autosave while the page is being hidden. A keepalive
+     * request outlives the page and, unlike a beacon, sends a JSON body the
+     * JSON-RPC route accepts.
+     */
+    _flushDraftOnHide: function () {
+        if (!this._draftDirtySince || !this.activeDesignType) {
+            return;
+        }
+        this._saveCurrentSideState();
+        const sync = this._prepareDraftSync(this.activeDesignType);
+        if (!sync) {
+            return;
+        }
+        const body = JSON.stringify({ jsonrpc: '2.0', method: 'call', id: Date.now(), params: sync.params });
+        fetch('/shop/personalize/draft/sync', {
+            method: 'POST',
+            keepalive: true,
+            credentials: 'same-origin',
+            headers: { 'Content-Type': 'application/json' },
+            body: body,
+        }).catch(function (error) {
+            // keepalive bodies are limited to 64 KiB
+            console.warn('Autosave on leave failed:', error);
+        });
+    },
+
+    /**
+     * JSON patch (RFC 6902) turning ``before`` into ``after``.
+     */
+    _diffJson: function (before, after, path, ops) {
+        ops = ops || [];
+        if (before === after) {
+            return ops;
+        }
+        const isPlainObject = (value) => value !== null && typeof value === 'object' && !Array.isArray(value);
+        if (Array.isArray(before) && Array.isArray(after)) {
+            const common = Math.min(before.length, after.length);
+            for (let i = 0; i < common; i++) {
+                this._diffJson(before[i], after[i], `${path}/${i}`, ops);
+            }
+            for (let i = before.length - 1; i >= common; i--) {
+                ops.push({ op: 'remove', path: `${path}/${i}` });
+            }
+            for (let i = common; i < after.length; i++) {
+                ops.push({ op: 'add', path: `${path}/-`, value: after[i] });
+            }
+        } else if (isPlainObject(before) && isPlainObject(after)) {
+            const escape = (key) => key.replace(/~/g, '~0').replace(/\//g, '~1');
+            Object.keys(before).forEach((key) => {
+                if (!(key in after)) {
+                    ops.push({ op: 'remove', path: `${path}/${escape(key)}` });
+                }
+            });
+            Object.keys(after).forEach((key) => {
+                if (key in before) {
+                    this._diffJson(before[key], after[key], `${path}/${escape(key)}`, ops);
+                } else {
+                    ops.push({ op: 'add', path: `${path}/${escape(key)}`, value: after[key] });
+                }
+            });
+        } else if (JSON.stringify(before) !== JSON.stringify(after)) {
+            ops.push({ op: 'replace', path: path, value: after });
+        }
+        return ops;
+    },
+
     _loadDesignType: function (designType) {
         const self = this;
 
@@ -1098,37 +1636,52 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
         }
     },
 
-    _setBackgroundFromUrl: function (url, callback) {
-        const self = this;
+    /**
+     * Start loading the background of every side, so switching sides and
+     * building the previews do not wait on the network or on decoding.
+     */
+    _prefetchBackgrounds: function () {
+        const data = this.productData || {};
+        const urls = new Set();
+        (data.design_types || []).forEach(function (dt) {
+            const designConfig = data.designs && data.designs[dt];
+            const url = designConfig ? designConfig.image_url : data.fallback_image_url;
+            if (url) {
+                urls.add(url);
+            }
+        });
+        urls.forEach(function (url) {
+            imageCache.get(url).catch(function (error) {
+                console.warn('Background prefetch failed:', error);
+            });
+        });
+    },
 
-        fabric.Image.fromURL(url, function (img) {
-            if (!img) {
+    /**
+     * Fabric image of ``url``, built on the shared decoded element. Relative
+     * URLs that fail are retried with an absolute path.
+     */
+    _loadFabricImage: function (url) {
+        return imageCache.get(url).catch(function (error) {
+            if (url && url.startsWith('/')) {
                 console.warn('Failed to load image from URL:', url, '- retrying with absolute path');
-
-                // If URL is relative, try with absolute path
-                if (url && url.startsWith('/')) {
-                    const absoluteUrl = window.location.origin + url;
-                    fabric.Image.fromURL(absoluteUrl, function (img2) {
-                        if (img2) {
-                            self._applyBackgroundImage(img2);
-                        } else {
-                            console.error('Failed to load image from both relative and absolute URLs:', url, absoluteUrl);
-                        }
-                        if (callback) callback();
-                    }, null, {
-                        crossOrigin: 'anonymous'
-                    });
-                } else {
-                    console.error('Failed to load image from URL:', url);
-                    if (callback) callback();
-                }
-                return;
+                return imageCache.get(window.location.origin + url);
             }
+            throw error;
+        }).then(function (element) {
+            return new fabric.Image(element);
+        });
+    },
+
+    _setBackgroundFromUrl: function (url, callback) {
+        const self = this;
 
+        self._loadFabricImage(url).then(function (img) {
             self._applyBackgroundImage(img);
+        }).catch(function (error) {
+            console.error('Failed to load background image:', url, error);
+        }).then(function () {
             if (callback) callback();
-        }, null, {
-            crossOrigin: 'anonymous'
         });
     },
 
@@ -1196,9 +1749,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
 
                     // Initialize history for this design type
                     setTimeout(function () {
-                        self.history = [];
-                        self.historyStep = -1;
-                        self._saveState();
+                        self._resetHistory();
                     }, 100);
                 });
             } else {
@@ -1210,9 +1761,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
 
                 // Initialize history
                 setTimeout(function () {
-                    self.history = [];
-                    self.historyStep = -1;
-                    self._saveState();
+                    self._resetHistory();
                 }, 100);
             }
         } catch (e) {
@@ -1387,68 +1936,145 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
 
         // Save current active design type state
         self._saveCurrentSideState();
+        clearTimeout(self._draftTimer);
 
         const designs = {};
+        const previewBlobs = {};
         const allDesignTypes = self.productData.design_types || [];
-
-        // Process each design type separately
-        for (const dt of allDesignTypes) {
-            let canvasJSON, previewURL;
-            const designConfig = self.productData.designs[dt];
-            const backgroundUrl = designConfig ? designConfig.image_url : self.productData.fallback_image_url;
-
-            if (self.designData[dt] && self.designData[dt].json && self.designData[dt].json.objects && self.designData[dt].json.objects.length > 0) {
-                // User customized - save their work
-                canvasJSON = self.designData[dt].json;
-                previewURL = await self._generatePreviewForDesignType(dt);
-            } else {
-                // Not customized - save empty objects with original image
-                previewURL = backgroundUrl;
-                canvasJSON = { version: "5.3.0", objects: [] };
+        const isCustomized = function (dt) {
+            return self.designData[dt] && self.designData[dt].json && self.designData[dt].json.objects && self.designData[dt].json.objects.length > 0;
+        };
+        const $button = self.$('#add_to_cart_personalized').prop('disabled', true);
+        const isEdit = self.editMode && self.editLineId;
+        const errorMessage = isEdit ? 'Failed to update design' : 'Failed to add product to cart';
+        // the button stays disabled only when leaving for the cart
+        let leaving = false;
+        try {
+            // The previews of all the sides are built concurrently; the server
+            // renders them itself when configured to
+            const previews = {};
+            if (!self.productData.server_side_preview) {
+                const customizedTypes = allDesignTypes.filter(isCustomized);
+                const results = await Promise.all(customizedTypes.map(function (dt) {
+                    return self._generatePreviewForDesignType(dt, true);
+                }));
+                customizedTypes.forEach(function (dt, index) {
+                    previews[dt] = results[index];
+                });
             }
 
-            designs[dt] = {
-                json: JSON.stringify(canvasJSON),
-                preview: previewURL,
-                background_url: backgroundUrl,
-            };
-        }
-
-        const qty = parseInt(self.$('#product_qty').val() || 1);
-        if (self.editMode && self.editLineId) {
-            rpc('/shop/cart/update_line_personalization', {
-                line_id: self.editLineId,
-                add_qty: qty,
-                designs: designs
-            }).then(function (result) {
-                if (result && result.success) {
-                    window.location.href = '/shop/cart';
+            // Process each design type separately
+            for (const dt of allDesignTypes) {
+                let canvasJSON, previewURL;
+                const designConfig = self.productData.designs[dt];
+                const backgroundUrl = designConfig ? designConfig.image_url : self.productData.fallback_image_url;
+
+                if (isCustomized(dt)) {
+                    // User customized - save their work
+                    canvasJSON = self.designData[dt].json;
+                    previewURL = null;
+                    if (previews[dt] instanceof Blob) {
+                        previewBlobs[dt] = previews[dt];
+                    } else if (previews[dt]) {
+                        previewURL = previews[dt];
+                    }
                 } else {
-                    alert(result.error || 'Failed to update design');
+                    // Not customized - save empty objects with original image
+                    previewURL = backgroundUrl;
+                    canvasJSON = { version: "5.3.0", objects: [] };
                 }
-            }).catch(function (error) {
-                console.error('Update design error:', error);
-                alert('Failed to update design');
-            });
-        } else {
-            rpc('/shop/cart/update_personalization', {
-                variant_id: self.activeVariantId,
-                add_qty: qty,
-                designs: designs
-            }).then(function (result) {
-                if (result && result.success) {
-                    window.location.href = '/shop/cart';
+
+                designs[dt] = {
+                    json: JSON.stringify(canvasJSON),
+                    preview: previewURL,
+                    background_url: backgroundUrl,
+                };
+            }
+
+            // Previews go as binary; the JSON-RPC call only references them
+            const uploaded = await self._uploadPreviews(previewBlobs);
+            for (const [dt, blob] of Object.entries(previewBlobs)) {
+                if (uploaded[dt]) {
+                    designs[dt].preview_checksum = uploaded[dt].checksum;
                 } else {
-                    alert(result.error || 'Failed to add product to cart');
+                    designs[dt].preview = await self._blobToDataURL(blob);
                 }
-            }).catch(function (error) {
-                console.error('Add to cart error:', error);
-                alert('Failed to add product to cart');
-            });
+            }
+
+            const qty = parseInt(self.$('#product_qty').val() || 1);
+            const result = isEdit
+                ? await rpc('/shop/cart/update_line_personalization', {
+                    line_id: self.editLineId,
+                    add_qty: qty,
+                    designs: designs
+                })
+                : await rpc('/shop/cart/update_personalization', {
+                    variant_id: self.activeVariantId,
+                    add_qty: qty,
+                    designs: designs
+                });
+            if (result && result.success) {
+                leaving = true;
+                window.location.href = '/shop/cart';
+            } else {
+                alert((result && result.error) || errorMessage);
+            }
+        } catch (error) {
+            console.error(isEdit ? 'Update design error:' : 'Add to cart error:', error);
+            alert(errorMessage);
+        } finally {
+            if (!leaving) {
+                $button.prop('disabled', false);
+            }
+        }
+    },
+
+    /**
+     * Upload preview blobs, keyed by design type, in one multipart request.
+     * Resolves to ``{design_type: {checksum, size}}``; sides that failed
+     * are missing, and nothing is rejected.
+     */
+    _uploadPreviews: function (blobs) {
+        const designTypes = Object.keys(blobs);
+        if (!designTypes.length) {
+            return Promise.resolve({});
         }
+        const formData = new FormData();
+        designTypes.forEach(function (dt) {
+            formData.append(dt, blobs[dt], `${dt}.png`);
+        });
+        const params = this.editMode && this.editLineId
+            ? {line_id: this.editLineId}
+            : {variant_id: this.activeVariantId};
+        return fetch(`/shop/personalize/upload_previews?${new URLSearchParams(params)}`, {
+            method: 'POST',
+            body: formData,
+            credentials: 'same-origin',
+        }).then(function (response) {
+            return response.ok ? response.json() : {};
+        }).then(function (result) {
+            return (result && result.previews) || {};
+        }).catch(function (error) {
+            console.warn('Preview upload failed, sending them inline:', error);
+            return {};
+        });
     },
 
-    _generatePreviewForDesignType: function (designType) {
+    _blobToDataURL: function (blob) {
+        return new Promise(function (resolve) {
+            const reader = new FileReader();
+            reader.onload = function () { resolve(reader.result); };
+            reader.onerror = function () { resolve(null); };
+            reader.readAsDataURL(blob);
+        });
+    },
+
+    /**
+     * Preview of a side with its background, as a data URL, or as a PNG
+     * Blob when ``asBlob`` is set. Uncustomized sides resolve to the URL
+     * of their background.
+     */
+    _generatePreviewForDesignType: function (designType, asBlob) {
         const self = this;
         const savedData = self.designData[designType];
 
@@ -1460,9 +2086,12 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
 
         // Has customization - generate preview with background + objects
         try {
-            const tempCanvas = new fabric.Canvas(document.createElement('canvas'));
-            tempCanvas.setWidth(800);
-            tempCanvas.setHeight(800);
+            // no interaction layer: a static canvas is enough to draw a preview
+            const tempCanvas = new fabric.StaticCanvas(document.createElement('canvas'), {
+                width: 800,
+                height: 800,
+                renderOnAddRemove: false,
+            });
 
             const designConfig = self.productData.designs[designType];
             const bgUrl = designConfig ? designConfig.image_url : self.productData.fallback_image_url;
@@ -1481,6 +2110,18 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                 function loadObjects() {
                     tempCanvas.loadFromJSON(jsonToLoad, function() {
                         tempCanvas.renderAll(); // Render after loading
+                        if (asBlob) {
+                            // the lower canvas is scaled for retina screens:
+                            // export at 1x so the Blob is 800x800 like the data URL
+                            const exportEl = tempCanvas.toCanvasElement(1);
+                            if (exportEl.toBlob) {
+                                exportEl.toBlob(function (blob) {
+                                    tempCanvas.dispose();
+                                    resolve(blob);
+                                }, 'image/png');
+                                return;
+                            }
+                        }
                         const dataURL = tempCanvas.toDataURL({ format: 'png', quality: 0.8 });
                         tempCanvas.dispose();
                         resolve(dataURL);
@@ -1488,7 +2129,9 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                 }
 
                 if (bgUrl) {
-                    fabric.Image.fromURL(bgUrl, function (img) {
+                    self._loadFabricImage(bgUrl).catch(function () {
+                        return null;
+                    }).then(function (img) {
                         if (img) {
                             const canvasWidth = tempCanvas.getWidth();
                             const canvasHeight = tempCanvas.getHeight();
@@ -1508,7 +2151,7 @@ publicWidget.registry.ProductPersonalizationEditor = publicWidget.Widget.extend(
                             console.warn('Could not load background for preview from URL:', bgUrl);
                             loadObjects();
                         }
-                    }, null, { crossOrigin: 'anonymous' });
+                    });
                 } else {
                     loadObjects();
                 }
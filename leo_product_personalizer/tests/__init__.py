@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from . import test_performance
+from . import test_personalization_job
+from . import test_cart_personalization
+from . import test_personalization_storage
+from . import test_fabric_renderer
+from . import test_pack_archive
+from . import test_preview_upload
+from . import test_personalization_draft
+from . import test_fabric_json
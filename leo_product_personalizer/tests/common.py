@@ -0,0 +1,187 @@
+import base64
+import io
+import json
+import logging
+import os
+import time
+
+from PIL import Image
+
+from odoo import Command
+from odoo.tests import HttpCase
+
+_logger = logging.getLogger(__name__)
+
+# 1x1 PNG, enough for the image fields and the renderer
+PIXEL_PNG = b"iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+PIXEL_DATA_URL = "data:image/png;base64," + PIXEL_PNG.decode()
+
+
+def make_png(color, size=(2, 2)):
+    """PNG of ``size`` filled with ``color``: distinct colors give distinct images."""
+    stream = io.BytesIO()
+    Image.new("RGB", size, color).save(stream, format="PNG")
+    return stream.getvalue()
+
+
+def _env_size(name, default):
+    return max(int(os.environ.get(name) or default), 1)
+
+
+class PersonalizerBenchmarkCommon(HttpCase):
+    """Synthetic catalog and measuring helpers for the personalizer routes.
+
+    The sizes can be raised from the environment to benchmark larger shops:
+    ``LEO_BENCH_VARIANTS`` (N variants), ``LEO_BENCH_DESIGNS`` (M design
+    configs per variant) and ``LEO_BENCH_LINES`` (K cart lines, each with M
+    personalizations).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.variant_count = _env_size("LEO_BENCH_VARIANTS", 4)
+        cls.design_count = _env_size("LEO_BENCH_DESIGNS", 2)
+        cls.line_count = _env_size("LEO_BENCH_LINES", 5)
+        cls.website = cls.env["website"].get_current_website()
+
+        attribute = cls.env["product.attribute"].create({
+            "name": "Benchmark Size",
+            "create_variant": "always",
+            "value_ids": [Command.create({"name": f"S{index}"}) for index in range(cls.variant_count)],
+        })
+        cls.template = cls.env["product.template"].create({
+            "name": "Benchmark Shirt",
+            "is_product_personalization": True,
+            "is_published": True,
+            "sale_ok": True,
+            "list_price": 10.0,
+            "image_1920": PIXEL_PNG,
+            "attribute_line_ids": [Command.create({
+                "attribute_id": attribute.id,
+                "value_ids": [Command.set(attribute.value_ids.ids)],
+            })],
+        })
+        cls.variants = cls.template.product_variant_ids
+        cls.variant = cls.variants[0]
+        cls.env["product.design.config"].create([
+            {
+                "product_variant_id": variant.id,
+                "design_type": f"side{index}",
+                "design_image": PIXEL_PNG,
+                "is_restricted_area": True,
+                "bound_x": 100,
+                "bound_y": 100,
+                "bound_width": 400,
+                "bound_height": 400,
+            }
+            for variant in cls.variants
+            for index in range(cls.design_count)
+        ])
+
+        cls.order = cls.env["sale.order"].create({
+            "partner_id": cls.website.user_id.partner_id.id,
+            "website_id": cls.website.id,
+            "order_line": [
+                Command.create({"product_id": cls.variants[index % cls.variant_count].id, "product_uom_qty": 1})
+                for index in range(cls.line_count)
+            ],
+        })
+        cls.lines = cls.order.order_line
+        cls.env["sale.order.line.personalization"].create([
+            {
+                "sale_order_line_id": line.id,
+                "design_type": config.design_type,
+                "design_config_id": config.id,
+                "personalized_json": cls._design_json(config.design_type),
+                "product_image": PIXEL_PNG,
+            }
+            for line in cls.lines
+            for config in line.product_id.design_config_ids
+        ])
+
+    @classmethod
+    def _design_json(cls, label="front", with_upload=True):
+        objects = [
+            {"type": "textbox", "left": 150, "top": 150, "width": 200, "height": 45, "text": label, "fill": "#222222"},
+            {"type": "rect", "left": 120, "top": 300, "width": 80, "height": 40, "fill": "#cc0000"},
+        ]
+        if with_upload:
+            objects.append({"type": "image", "left": 200, "top": 200, "width": 1, "height": 1, "src": PIXEL_DATA_URL})
+        return json.dumps({"version": "5.3.0", "objects": objects})
+
+    def _create_personalization(self, personalized_json, preview=None, defer=False, line=None):
+        """Save a design on the first side of ``line`` (the first cart line
+        by default), processed inline or left to the job queue."""
+        line = line or self.lines[0]
+        config = line.product_id.design_config_ids[0]
+        personalization = self.env["sale.order.line.personalization"].with_context(
+            defer_personalization_processing=defer,
+        ).create({
+            "sale_order_line_id": line.id,
+            "design_type": config.design_type,
+            "design_config_id": config.id,
+            "personalized_json": personalized_json,
+            "product_image": base64.b64encode(preview) if preview else False,
+        })
+        return personalization.with_env(self.env)
+
+    @classmethod
+    def _image_design_json(cls, *images):
+        """Design JSON holding ``images`` (raw bytes or URLs) as image objects."""
+        objects = [{"type": "textbox", "left": 150, "top": 150, "text": "artwork", "fill": "#222222"}]
+        for image in images:
+            src = image if isinstance(image, str) else "data:image/png;base64," + base64.b64encode(image).decode()
+            objects.append({"type": "image", "left": 200, "top": 200, "width": 2, "height": 2, "src": src})
+        return json.dumps({"version": "5.3.0", "objects": objects})
+
+    def _add_cart_line(self, label="front", variant=None):
+        """Add a personalized line to the cart of the test session."""
+        variant = variant or self.variant
+        result, _queries, _elapsed, _size = self._jsonrpc("/shop/cart/update_personalization", {
+            "variant_id": variant.id,
+            "designs": self._designs_payload(variant, label),
+            "add_qty": 1,
+        })
+        self.env.invalidate_all()
+        return self.env["sale.order.line"].browse(result["line_id"])
+
+    def _designs_payload(self, variant, label="front"):
+        return {
+            config.design_type: {
+                "json": self._design_json(label),
+                "preview": PIXEL_DATA_URL,
+                "background_url": f"/web/image/product.design.config/{config.id}/design_image",
+            }
+            for config in variant.design_config_ids
+        }
+
+    def _jsonrpc(self, route, params=None):
+        """Call a JSON-RPC route and measure it.
+
+        :return: (result, number of queries, wall time in seconds, size of
+            the response body in bytes)
+        """
+        self.env.flush_all()
+        payload = json.dumps({"jsonrpc": "2.0", "method": "call", "id": 1, "params": params or {}})
+        queries_before = self.cr.sql_log_count
+        start = time.perf_counter()
+        response = self.url_open(route, data=payload, headers={"Content-Type": "application/json"})
+        elapsed = time.perf_counter() - start
+        queries = self.cr.sql_log_count - queries_before
+        response.raise_for_status()
+        body = response.json()
+        self.assertNotIn("error", body, "%s failed: %s" % (route, body.get("error")))
+        self.assertNotIn("error", body["result"], "%s failed: %s" % (route, body["result"].get("error")))
+        _logger.info(
+            "%s: %s queries, %.1f ms, %s bytes (N=%s M=%s K=%s)",
+            route, queries, elapsed * 1000, len(response.content),
+            self.variant_count, self.design_count, self.line_count,
+        )
+        return body["result"], queries, elapsed, len(response.content)
+
+    def assertQueryBudget(self, route, queries, budget):
+        self.assertLessEqual(
+            queries, budget,
+            "%s made %s queries, over its budget of %s" % (route, queries, budget),
+        )
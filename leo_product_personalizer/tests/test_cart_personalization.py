@@ -0,0 +1,87 @@
+import json
+
+from odoo.tests import tagged
+
+from .common import PersonalizerBenchmarkCommon
+
+
+@tagged("post_install", "-at_install")
+class TestCartPersonalization(PersonalizerBenchmarkCommon):
+
+    def _add(self, label="front", variant=None):
+        variant = variant or self.variant
+        result, _queries, _elapsed, _size = self._jsonrpc("/shop/cart/update_personalization", {
+            "variant_id": variant.id,
+            "designs": self._designs_payload(variant, label),
+            "add_qty": 1,
+        })
+        self.env.invalidate_all()
+        return result, self.env["sale.order.line"].browse(result["line_id"])
+
+    def test_identical_designs_merge(self):
+        result, line = self._add()
+        self.assertFalse(result["merged"])
+        self.assertTrue(line.personalization_fingerprint)
+
+        result, same_line = self._add()
+        self.assertTrue(result["merged"])
+        self.assertEqual(same_line, line)
+        self.assertEqual(line.product_uom_qty, 2)
+        self.assertEqual(result["created_personalization_ids"], line.personalization_ids.ids)
+        self.assertEqual(len(line.personalization_ids), self.design_count)
+
+    def test_different_designs_do_not_merge(self):
+        _result, line = self._add("front")
+        result, other_line = self._add("back")
+        self.assertFalse(result["merged"])
+        self.assertNotEqual(other_line, line)
+        self.assertNotEqual(other_line.personalization_fingerprint, line.personalization_fingerprint)
+        self.assertEqual(line.product_uom_qty, 1)
+
+    def test_plain_add_skips_personalized_lines(self):
+        _result, line = self._add()
+        order = line.order_id
+        values = order.with_context(skip_cart_verification=True)._cart_add(product_id=self.variant.id, quantity=1)
+        self.env.invalidate_all()
+        plain_line = self.env["sale.order.line"].browse(values["line_id"])
+        self.assertNotEqual(plain_line, line)
+        self.assertFalse(plain_line.personalization_ids)
+        self.assertEqual(line.product_uom_qty, 1)
+
+    def test_bulk_identical_entries_share_a_line(self):
+        entry = {"variant_id": self.variant.id, "designs": self._designs_payload(self.variant), "add_qty": 1}
+        other_entry = dict(entry, designs=self._designs_payload(self.variant, "back"))
+        result, _queries, _elapsed, _size = self._jsonrpc("/shop/cart/update_personalization_bulk", {
+            "entries": [entry, other_entry, entry],
+        })
+        self.env.invalidate_all()
+        first, other, last = result["results"]
+        self.assertTrue(result["success"])
+        self.assertFalse(first["merged"])
+        self.assertTrue(last["merged"])
+        self.assertEqual(last["line_id"], first["line_id"])
+        self.assertNotEqual(other["line_id"], first["line_id"])
+        self.assertEqual(last["created_personalization_ids"], first["created_personalization_ids"])
+
+        line = self.env["sale.order.line"].browse(first["line_id"])
+        self.assertEqual(line.product_uom_qty, 2)
+        self.assertEqual(line.personalization_ids.ids, first["created_personalization_ids"])
+
+    def test_previews_of_own_lines_only(self):
+        _result, line = self._add()
+        result, _queries, _elapsed, _size = self._jsonrpc("/shop/cart/preview_personalization", {"line_id": line.id})
+        self.assertEqual(len(result["previews"]), self.design_count)
+        self.assertEqual(self.url_open(f"/shop/cart/preview_personalization/{line.id}").status_code, 200)
+
+        # a line of another cart
+        other_line = self.lines[0]
+        self.env.flush_all()
+        response = self.url_open("/shop/cart/preview_personalization", data=json.dumps({
+            "jsonrpc": "2.0", "method": "call", "id": 1, "params": {"line_id": other_line.id},
+        }), headers={"Content-Type": "application/json"})
+        self.assertEqual(response.json()["result"], {"error": "Cart line not found"})
+        self.assertEqual(self.url_open(f"/shop/cart/preview_personalization/{other_line.id}").status_code, 404)
+
+        # users who may read the order see its previews
+        self.authenticate("admin", "admin")
+        self.assertEqual(self.url_open(f"/shop/cart/preview_personalization/{other_line.id}").status_code, 200)
@@ -0,0 +1,59 @@
+import json
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools.fabric_json import canonical_json, compress_json, decompress_json, strip_defaults
+
+CANVAS = {
+    "version": "5.3.0",
+    "objects": [
+        {
+            "type": "textbox", "left": 150, "top": 0, "width": 200, "fill": "#222222", "text": "Hello",
+            "fontSize": 40, "fontFamily": "Arial", "scaleX": 1, "opacity": 1, "flipX": False, "strokeWidth": 1,
+            "styles": [], "minWidth": 20,
+        },
+        {
+            "type": "group", "left": 10, "angle": 0, "objects": [
+                {"type": "rect", "left": 0, "width": 80, "rx": 0, "fill": "rgb(0,0,0)", "visible": True},
+            ],
+            "clipPath": {"type": "rect", "width": 10, "originX": "left"},
+        },
+        # a boolean is not the numeric default it equals
+        {"type": "rect", "left": True, "opacity": 0.5},
+    ],
+}
+
+
+@tagged("post_install", "-at_install")
+class TestFabricJson(BaseCase):
+
+    def test_strip_defaults(self):
+        self.assertEqual(strip_defaults(CANVAS), {
+            "version": "5.3.0",
+            "objects": [
+                {"type": "textbox", "left": 150, "width": 200, "fill": "#222222", "text": "Hello",
+                 "fontFamily": "Arial", "strokeWidth": 1},
+                {"type": "group", "left": 10, "objects": [{"type": "rect", "width": 80}],
+                 "clipPath": {"type": "rect", "width": 10}},
+                {"type": "rect", "left": True, "opacity": 0.5},
+            ],
+        })
+        # the input is left untouched
+        self.assertEqual(CANVAS["objects"][0]["fontSize"], 40)
+
+    def test_compress_round_trip(self):
+        value = json.dumps(CANVAS)
+        data = compress_json(value)
+        self.assertLess(len(data), len(value))
+        self.assertEqual(decompress_json(data), canonical_json(value))
+        self.assertEqual(json.loads(decompress_json(data)), strip_defaults(CANVAS))
+        # key order and spacing do not change the stored bytes
+        self.assertEqual(compress_json(json.dumps(CANVAS, indent=2, sort_keys=True)), data)
+
+        # stored as sent
+        self.assertEqual(decompress_json(compress_json(value, canonical=False)), value)
+        self.assertEqual(decompress_json(compress_json("not a design")), "not a design")
+        self.assertEqual(compress_json(""), b"")
+        self.assertEqual(compress_json(False), b"")
+        self.assertEqual(decompress_json(b""), "")
@@ -0,0 +1,90 @@
+import base64
+import io
+from unittest.mock import patch
+
+from PIL import Image
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..tools import fabric_renderer
+from ..tools.fabric_renderer import CANVAS_SIZE, MAX_BITMAP_LAYERS, render_fabric_json
+from .common import make_png
+
+
+def _data_url(raw):
+    return "data:image/png;base64," + base64.b64encode(raw).decode()
+
+
+@tagged("post_install", "-at_install")
+class TestFabricRenderer(BaseCase):
+
+    def _render(self, objects, size=CANVAS_SIZE, **kwargs):
+        raw = render_fabric_json({"version": "5.3.0", "objects": objects}, size=size, **kwargs)
+        return Image.open(io.BytesIO(raw)).convert("RGBA")
+
+    def test_shapes_text_and_images(self):
+        red_data_url = _data_url(make_png("red", (40, 20)))
+        image = self._render([
+            {"type": "rect", "left": 100, "top": 100, "width": 100, "height": 50, "fill": "#0000ff"},
+            {"type": "textbox", "left": 400, "top": 100, "width": 200, "height": 60, "fontSize": 40,
+             "text": "Hello", "fill": "#00ff00"},
+            {"type": "image", "left": 100, "top": 400, "width": 40, "height": 20, "scaleX": 2, "scaleY": 2,
+             "src": red_data_url},
+        ])
+        self.assertEqual(image.size, (CANVAS_SIZE, CANVAS_SIZE))
+        self.assertEqual(image.getpixel((150, 125)), (0, 0, 255, 255))
+        self.assertEqual(image.getpixel((140, 420)), (255, 0, 0, 255))
+        text_box = image.crop((400, 100, 600, 160))
+        self.assertIn((0, 255, 0), {pixel[:3] for pixel in text_box.getdata() if pixel[3] == 255})
+        self.assertEqual(image.getpixel((700, 700))[3], 0)
+
+    def test_scaled_output(self):
+        image = self._render(
+            [{"type": "rect", "left": 100, "top": 100, "width": 100, "height": 50, "fill": "#0000ff"}],
+            size=CANVAS_SIZE * 2,
+        )
+        self.assertEqual(image.size, (CANVAS_SIZE * 2, CANVAS_SIZE * 2))
+        self.assertEqual(image.getpixel((300, 250)), (0, 0, 255, 255))
+        self.assertEqual(image.getpixel((150, 125))[3], 0)
+
+    def test_clip_box(self):
+        image = self._render(
+            [{"type": "rect", "left": 0, "top": 0, "width": 800, "height": 800, "fill": "#0000ff"}],
+            clip_box=(100, 100, 300, 300),
+        )
+        self.assertEqual(image.getpixel((200, 200)), (0, 0, 255, 255))
+        self.assertEqual(image.getpixel((50, 50))[3], 0)
+        self.assertEqual(image.getpixel((400, 400))[3], 0)
+
+    def test_image_crop_beyond_source(self):
+        data_url = _data_url(make_png("red", (40, 40)))
+        image = self._render([
+            {"type": "image", "left": 100, "top": 100, "width": 60, "height": 60, "cropX": 10, "cropY": 10,
+             "src": data_url},
+        ])
+        # the visible part of the source is 30x30, the rest of the box is empty
+        self.assertEqual(image.getpixel((115, 115)), (255, 0, 0, 255))
+        self.assertEqual(image.getpixel((145, 145))[3], 0)
+
+    def test_oversized_objects_stay_bounded(self):
+        data_url = _data_url(make_png("red", (10, 10)))
+        objects = [
+            {"type": "textbox", "left": -4000, "top": -4000, "width": 8000, "height": 8000,
+             "text": "huge\n" * 500, "fill": "#000000", "fontSize": 400},
+            {"type": "textbox", "left": 0, "top": 0, "width": 800, "height": 800, "scaleX": 50, "scaleY": 50,
+             "text": "zoomed", "fill": "#000000"},
+            {"type": "image", "left": 0, "top": 0, "width": 10 ** 6, "height": 10 ** 6, "src": data_url},
+        ]
+        allocated = []
+        new = Image.new
+
+        def tracking_new(mode, size, *args, **kwargs):
+            allocated.append(size[0] * size[1])
+            return new(mode, size, *args, **kwargs)
+
+        with patch.object(fabric_renderer.Image, "new", side_effect=tracking_new):
+            image = self._render(objects)
+        self.assertEqual(image.size, (CANVAS_SIZE, CANVAS_SIZE))
+        work_size = CANVAS_SIZE * fabric_renderer.SUPERSAMPLE
+        self.assertLessEqual(max(allocated), MAX_BITMAP_LAYERS * work_size * work_size)
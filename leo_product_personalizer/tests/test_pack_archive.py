@@ -0,0 +1,160 @@
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.sale_order_line_personalization import PACK_GRACE_HOURS
+from ..tools.pack_archive import PackError, PackReader, write_pack
+from .common import PersonalizerBenchmarkCommon
+
+
+def _age(path, hours=PACK_GRACE_HOURS + 1):
+    """Make the file at ``path`` look written ``hours`` ago."""
+    mtime = time.time() - hours * 3600
+    os.utime(path, (mtime, mtime))
+
+
+@tagged("post_install", "-at_install")
+class TestPackArchive(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = os.path.join(tmp_dir.name, "test.lpp")
+
+    def test_round_trip(self):
+        entries = [(7, b"seven"), (3, b"three"), (12, b""), (5, os.urandom(4096))]
+        self.assertEqual(write_pack(self.path, entries), len(entries))
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+        reader = PackReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual(len(reader), len(entries))
+        for record_id, payload in entries:
+            self.assertEqual(reader.get(record_id), payload)
+        self.assertIsNone(reader.get(4))
+        self.assertIsNone(reader.get(100))
+
+    def test_corrupted_entry(self):
+        write_pack(self.path, [(1, b"first payload"), (2, b"second payload")])
+        with open(self.path, "r+b") as pack:
+            data = pack.read()
+            offset = data.index(b"second")
+            pack.seek(offset)
+            pack.write(b"S")
+
+        reader = PackReader(self.path)
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.get(1), b"first payload")
+        with self.assertRaises(PackError):
+            reader.get(2)
+
+    def test_truncated_pack(self):
+        write_pack(self.path, [(1, b"payload")])
+        with open(self.path, "r+b") as pack:
+            pack.truncate(os.path.getsize(self.path) - 4)
+        with self.assertRaises(PackError):
+            PackReader(self.path)
+
+        open(self.path, "wb").close()
+        with self.assertRaises(PackError):
+            PackReader(self.path)
+
+
+@tagged("post_install", "-at_install")
+class TestPersonalizationArchive(PersonalizerBenchmarkCommon):
+
+    def setUp(self):
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.archive_dir = tmp_dir.name
+        Personalization = self.registry["sale.order.line.personalization"]
+        patcher = patch.object(Personalization, "_get_archive_dir", return_value=self.archive_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_designs(self, count):
+        Personalization = self.env["sale.order.line.personalization"]
+        personalizations = Personalization.browse()
+        for index in range(count):
+            personalizations |= self._create_personalization(self._design_json(f"archived {index}", with_upload=False))
+        return personalizations
+
+    def _packs(self):
+        return sorted(os.listdir(self.archive_dir))
+
+    def test_archive_and_read(self):
+        personalizations = self._create_designs(3)
+        designs = personalizations.mapped("personalized_json")
+        checksums = personalizations.mapped("json_checksum")
+
+        personalizations._archive_to_pack()
+        self.env.invalidate_all()
+        pack_name = personalizations[0].archive_pack
+        self.assertEqual(self._packs(), [pack_name])
+        self.assertEqual(set(personalizations.mapped("archive_pack")), {pack_name})
+        self.assertFalse(any(personalizations.with_context(bin_size=False).mapped("personalized_json_data")))
+        self.assertEqual(personalizations.mapped("personalized_json"), designs)
+        self.assertEqual(personalizations.mapped("json_checksum"), checksums)
+
+    def test_edit_archived_design(self):
+        personalization = self._create_designs(1)
+        personalization._archive_to_pack()
+        self.env.invalidate_all()
+        self.assertTrue(personalization.archive_pack)
+
+        edited = self._design_json("edited", with_upload=False)
+        personalization.personalized_json = edited
+        self.env.invalidate_all()
+        self.assertFalse(personalization.archive_pack)
+        self.assertTrue(personalization.with_context(bin_size=False).personalized_json_data)
+        self.assertEqual(personalization.personalized_json, self._create_personalization(edited).personalized_json)
+
+    def test_gc_deletes_unreferenced_packs(self):
+        personalization = self._create_designs(1)
+        personalization._archive_to_pack()
+        live_pack = personalization.archive_pack
+        # left by a rolled back archival, and by one still running
+        for name in ("rolled-back.lpp", "running.lpp"):
+            write_pack(os.path.join(self.archive_dir, name), [(personalization.id, b"stale")])
+        for name in (live_pack, "rolled-back.lpp"):
+            _age(os.path.join(self.archive_dir, name))
+
+        self.env["sale.order.line.personalization"]._gc_packs()
+        self.assertEqual(self._packs(), sorted([live_pack, "running.lpp"]))
+        self.env.invalidate_all()
+        self.assertEqual(personalization.archive_pack, live_pack)
+        self.assertTrue(personalization.personalized_json)
+
+        # an edited design no longer points to its pack
+        personalization.personalized_json = self._design_json("edited", with_upload=False)
+        self.env["sale.order.line.personalization"]._gc_packs()
+        self.assertEqual(self._packs(), ["running.lpp"])
+
+    def test_gc_compacts_mostly_dead_packs(self):
+        personalizations = self._create_designs(3)
+        kept = personalizations[0]
+        design = kept.personalized_json
+        personalizations._archive_to_pack()
+        old_pack = kept.archive_pack
+        (personalizations - kept).unlink()
+        _age(os.path.join(self.archive_dir, old_pack))
+
+        Personalization = self.env["sale.order.line.personalization"]
+        Personalization._gc_packs()
+        self.env.invalidate_all()
+        new_pack = kept.archive_pack
+        self.assertNotEqual(new_pack, old_pack)
+        self.assertEqual(self._packs(), sorted([old_pack, new_pack]))
+        self.assertEqual(kept.personalized_json, design)
+
+        # the old pack goes once nothing points to it anymore
+        Personalization._gc_packs()
+        self.assertEqual(self._packs(), [new_pack])
+        self.env.invalidate_all()
+        self.assertEqual(kept.personalized_json, design)
@@ -0,0 +1,148 @@
+from odoo.tests import tagged
+
+from .common import PersonalizerBenchmarkCommon
+
+# Query budgets per route, including the website request overhead. Routes
+# that create or rewrite one record per design side get an allowance per
+# side (M); nothing may grow with the number of variants or cart lines.
+PAYLOAD_COLD_BUDGET = 40
+PAYLOAD_WARM_BUDGET = 25
+ADD_TO_CART_BUDGET = 90
+ADD_TO_CART_PER_SIDE_BUDGET = 20
+GET_LINE_BUDGET = 30
+UPDATE_LINE_UNCHANGED_BUDGET = 35
+UPDATE_LINE_PER_SIDE_BUDGET = 20
+PREVIEW_BUDGET = 25
+
+
+@tagged("post_install", "-at_install", "leo_product_personalizer_benchmark")
+class TestPersonalizerPerformance(PersonalizerBenchmarkCommon):
+    # designs saved by the routes are processed by the job queue
+    deferred_processing = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env["ir.config_parameter"].sudo().set_param(
+            "leo_product_personalizer.deferred_processing", str(cls.deferred_processing),
+        )
+
+    def test_product_personalization_data(self):
+        route = "/shop/product_personalization_data"
+        params = {"product_id": self.template.id, "variant_id": self.variant.id}
+        self._jsonrpc(route, params)  # warm up routing and the session
+
+        self.env.registry.clear_cache()
+        result, queries, _elapsed, _size = self._jsonrpc(route, params)
+        self.assertEqual(len(result["variants"]), self.variant_count)
+        self.assertEqual(len(result["design_types"]), self.design_count)
+        self.assertQueryBudget(route + " (cold)", queries, PAYLOAD_COLD_BUDGET)
+
+        _result, queries, _elapsed, _size = self._jsonrpc(route, params)
+        self.assertQueryBudget(route + " (warm)", queries, PAYLOAD_WARM_BUDGET)
+
+    def test_product_personalization_payload_cache(self):
+        template = self.template.with_env(self.env(context=dict(self.env.context, lang="en_US")))
+        self.env.registry.clear_cache()
+        payload = template._get_personalization_payload(self.variant.id, self.website.id)
+        self.env.invalidate_all()
+        # only the cache version is read
+        with self.assertQueryCount(1):
+            self.assertEqual(template._get_personalization_payload(self.variant.id, self.website.id), payload)
+
+        # values the payload does not read keep the cache warm
+        template.description_sale = "Benchmark description"
+        self.variant.barcode = "LEO-BENCH-0001"
+        self.env.invalidate_all()
+        with self.assertQueryCount(1):
+            template._get_personalization_payload(self.variant.id, self.website.id)
+
+        config = self.variant.design_config_ids[0]
+        config.bound_width = 42.0
+        payload = template._get_personalization_payload(self.variant.id, self.website.id)
+        self.assertEqual(payload["designs"][config.design_type]["bound_width"], 42.0)
+
+        # the value names make the variant names
+        value = self.variant.product_template_attribute_value_ids.product_attribute_value_id
+        value.name = "Renamed"
+        payload = template._get_personalization_payload(self.variant.id, self.website.id)
+        variant_data = next(data for data in payload["variants"] if data["id"] == self.variant.id)
+        self.assertIn("Renamed", variant_data["name"])
+
+    def test_product_personalization_payload_cache_scope(self):
+        template = self.template.with_env(self.env(context=dict(self.env.context, lang="en_US")))
+        other_template = self.env["product.template"].create({
+            "name": "Other Shirt",
+            "is_product_personalization": True,
+        })
+        template._get_personalization_payload(self.variant.id, self.website.id)
+        other_template._get_personalization_payload()
+        self.env["ir.model"]._get_id("res.partner")
+        misses = template._get_personalization_cache_stats()["misses"]
+
+        # an edit leaves the payloads of the other templates, and the other
+        # caches of the registry, warm
+        self.variant.design_config_ids[0].bound_width = 42.0
+        with self.assertQueryCount(0):
+            self.env["ir.model"]._get_id("res.partner")
+        other_template._get_personalization_payload()
+        self.assertEqual(template._get_personalization_cache_stats()["misses"], misses)
+        template._get_personalization_payload(self.variant.id, self.website.id)
+        self.assertEqual(template._get_personalization_cache_stats()["misses"], misses + 1)
+
+    def test_update_personalization(self):
+        route = "/shop/cart/update_personalization"
+        self._jsonrpc(route, {"variant_id": self.variant.id, "designs": self._designs_payload(self.variant, "warmup")})
+
+        result, queries, _elapsed, _size = self._jsonrpc(route, {
+            "variant_id": self.variant.id,
+            "designs": self._designs_payload(self.variant),
+            "add_qty": 1,
+        })
+        self.assertEqual(len(result["created_personalization_ids"]), self.design_count)
+        self.assertQueryBudget(
+            route, queries, ADD_TO_CART_BUDGET + ADD_TO_CART_PER_SIDE_BUDGET * self.design_count,
+        )
+
+    def test_get_line_personalization(self):
+        route = "/shop/cart/get_line_personalization"
+        line = self.lines[-1]
+        self._jsonrpc(route, {"line_id": self.lines[0].id})
+
+        result, queries, _elapsed, _size = self._jsonrpc(route, {"line_id": line.id})
+        self.assertEqual(len(result["designs"]), self.design_count)
+        self.assertQueryBudget(route, queries, GET_LINE_BUDGET)
+
+    def test_update_line_personalization(self):
+        route = "/shop/cart/update_line_personalization"
+        line = self.lines[-1]
+        designs = self._designs_payload(line.product_id, "updated")
+        self._jsonrpc(route, {"line_id": self.lines[0].id, "designs": self._designs_payload(self.lines[0].product_id)})
+
+        result, queries, _elapsed, _size = self._jsonrpc(route, {"line_id": line.id, "designs": designs})
+        self.assertEqual(len(result["updated_personalization_ids"]), self.design_count)
+        self.assertQueryBudget(
+            route + " (changed)", queries,
+            UPDATE_LINE_UNCHANGED_BUDGET + UPDATE_LINE_PER_SIDE_BUDGET * self.design_count,
+        )
+
+        # sending the same design again must not rewrite anything
+        result, queries, _elapsed, _size = self._jsonrpc(route, {"line_id": line.id, "designs": designs})
+        self.assertFalse(result["changed_design_types"])
+        self.assertQueryBudget(route + " (unchanged)", queries, UPDATE_LINE_UNCHANGED_BUDGET)
+
+    def test_preview_personalization(self):
+        route = "/shop/cart/preview_personalization"
+        # previews are only given for the lines of the visitor's cart
+        first_line, line = self._add_cart_line("first"), self._add_cart_line("second")
+        self._jsonrpc(route, {"line_id": first_line.id})
+
+        result, queries, _elapsed, _size = self._jsonrpc(route, {"line_id": line.id})
+        self.assertEqual(len(result["previews"]), self.design_count)
+        self.assertQueryBudget(route, queries, PREVIEW_BUDGET)
+
+
+@tagged("post_install", "-at_install", "leo_product_personalizer_benchmark")
+class TestPersonalizerPerformanceInline(TestPersonalizerPerformance):
+    # the same budgets, with the designs processed while saving them
+    deferred_processing = False
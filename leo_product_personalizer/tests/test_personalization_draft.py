@@ -0,0 +1,131 @@
+import json
+
+from odoo.tests import tagged
+from odoo.tests.common import BaseCase
+
+from ..models.sale_order_line_personalization_draft import MAX_DRAFT_SIZE
+from ..tools.json_patch import JsonPatchError, apply_patch
+from .common import PersonalizerBenchmarkCommon
+
+SYNC_ROUTE = "/shop/personalize/draft/sync"
+
+
+@tagged("post_install", "-at_install")
+class TestJsonPatch(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = {"version": "5.3.0", "objects": [{"type": "rect", "left": 10}, {"type": "textbox"}]}
+
+    def test_operations(self):
+        patched = apply_patch(self.document, [
+            {"op": "test", "path": "/version", "value": "5.3.0"},
+            {"op": "replace", "path": "/objects/0/left", "value": 20},
+            {"op": "add", "path": "/objects/0/top", "value": 5},
+            {"op": "add", "path": "/objects/-", "value": {"type": "image"}},
+            {"op": "add", "path": "/objects/0", "value": {"type": "circle"}},
+            {"op": "remove", "path": "/objects/2"},
+            {"op": "replace", "path": "/background", "value": "#fff"},
+        ])
+        self.assertEqual(patched, {
+            "version": "5.3.0",
+            "background": "#fff",
+            "objects": [{"type": "circle"}, {"type": "rect", "left": 20, "top": 5}, {"type": "image"}],
+        })
+        # the document itself is left untouched
+        self.assertEqual(self.document["objects"][0], {"type": "rect", "left": 10})
+        self.assertEqual(apply_patch(self.document, [{"op": "replace", "path": "", "value": {}}]), {})
+        self.assertEqual(apply_patch({"a/b": {"~": 1}}, [{"op": "replace", "path": "/a~1b/~0", "value": 2}]),
+                         {"a/b": {"~": 2}})
+
+    def test_invalid_patches(self):
+        for patch in (
+            {"op": "add", "path": "/x", "value": 1},
+            [{"op": "add", "path": "/x"}],
+            [{"op": "replace", "value": 1}],
+            [{"op": "move", "from": "/version", "path": "/x"}],
+            [{"op": "add", "path": "x", "value": 1}],
+            [{"op": "remove", "path": "/missing"}],
+            [{"op": "remove", "path": "/objects/2"}],
+            [{"op": "replace", "path": "/objects/01", "value": 1}],
+            [{"op": "replace", "path": "/objects/-", "value": 1}],
+            [{"op": "add", "path": "/missing/child", "value": 1}],
+            [{"op": "add", "path": "/version/child", "value": 1}],
+            [{"op": "test", "path": "/version", "value": "4.0.0"}],
+            [{"op": "remove", "path": ""}],
+        ):
+            with self.assertRaises(JsonPatchError, msg=patch):
+                apply_patch(self.document, patch)
+
+
+@tagged("post_install", "-at_install")
+class TestPersonalizationDraft(PersonalizerBenchmarkCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Draft = cls.env["sale.order.line.personalization.draft"]
+        cls.draft_key = cls.Draft._get_draft_key("session", variant_id=cls.variant.id)
+        cls.design_type = cls.variant.design_config_ids[0].design_type
+
+    def _sync(self, base_revision, patch=None, design=None):
+        return self.Draft._sync(
+            self.draft_key, self.design_type, base_revision, patch=patch, design=design, variant_id=self.variant.id,
+        )
+
+    def _design(self):
+        return self.Draft._get_drafts(self.draft_key)[self.design_type]
+
+    def test_sync_patches_and_conflicts(self):
+        design = {"version": "5.3.0", "objects": [{"type": "rect", "left": 10}]}
+        # a patch needs a draft to apply to
+        self.assertEqual(self._sync(0, patch=[{"op": "add", "path": "/x", "value": 1}]),
+                         {"conflict": True, "revision": 0})
+        self.assertEqual(self._sync(0, design=design), {"revision": 1})
+
+        self.assertEqual(self._sync(1, patch=[{"op": "replace", "path": "/objects/0/left", "value": 20}]),
+                         {"revision": 2})
+        self.assertEqual(self._design()["json"]["objects"][0]["left"], 20)
+        self.assertEqual(self._sync(2, patch=[]), {"revision": 2})
+
+        # a patch against an older revision, or that does not apply, is refused
+        self.assertEqual(self._sync(1, patch=[{"op": "replace", "path": "/objects/0/left", "value": 30}]),
+                         {"conflict": True, "revision": 2})
+        self.assertEqual(self._sync(2, patch=[{"op": "remove", "path": "/objects/5"}]),
+                         {"conflict": True, "revision": 2})
+        self.assertEqual(self._design(), {"revision": 2, "json": dict(design, objects=[{"type": "rect", "left": 20}])})
+
+        # the full design resent by the editor then wins
+        self.assertEqual(self._sync(2, design=design), {"revision": 3})
+        self.assertEqual(self._design(), {"revision": 3, "json": design})
+
+    def test_sync_size_limit(self):
+        design = {"version": "5.3.0", "objects": []}
+        self.assertEqual(self._sync(0, design=design), {"revision": 1})
+        too_large = {"version": "5.3.0", "objects": [{"type": "textbox", "text": "x" * MAX_DRAFT_SIZE}]}
+        self.assertEqual(self._sync(1, design=too_large), {"error": "Design too large", "revision": 1})
+        self.assertEqual(self._sync(1, patch=[{"op": "add", "path": "/objects/-", "value": too_large["objects"][0]}]),
+                         {"error": "Design too large", "revision": 1})
+        self.assertEqual(self._design(), {"revision": 1, "json": design})
+
+    def test_sync_route_validation(self):
+        design = {"version": "5.3.0", "objects": []}
+        for params in (
+            {"design_type": "back-of-mug", "variant_id": self.variant.id},
+            # a line of another cart, and a line that does not exist
+            {"design_type": self.design_type, "line_id": self.lines[0].id},
+            {"design_type": self.design_type, "line_id": self.lines[-1].id + 10 ** 6},
+        ):
+            self.env.flush_all()
+            response = self.url_open(SYNC_ROUTE, data=json.dumps({
+                "jsonrpc": "2.0", "method": "call", "id": 1, "params": dict(params, design=design),
+            }), headers={"Content-Type": "application/json"})
+            result = response.json()["result"]
+            self.assertFalse(result["success"], params)
+            self.assertNotIn("conflict", result, params)
+        self.assertFalse(self.Draft.search([("design_type", "=", "back-of-mug")]))
+
+        result, _queries, _elapsed, _size = self._jsonrpc(SYNC_ROUTE, {
+            "design_type": self.design_type, "variant_id": self.variant.id, "design": design,
+        })
+        self.assertEqual(result, {"revision": 1, "success": True})
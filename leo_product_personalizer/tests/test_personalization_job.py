@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from ..models.sale_order_line_personalization_job import MAX_ATTEMPTS
+from .common import PersonalizerBenchmarkCommon, make_png
+
+
+@tagged("post_install", "-at_install")
+class TestPersonalizationJob(PersonalizerBenchmarkCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env["sale.order.line.personalization.job"]
+
+    def _get_job(self, personalization):
+        return self.Job.search([("personalization_id", "=", personalization.id)])
+
+    def test_enqueue_once(self):
+        personalization = self._create_personalization(self._design_json(), defer=True)
+        job = self._get_job(personalization)
+        self.assertEqual(job.state, "pending")
+
+        self.assertFalse(self.Job._enqueue(personalization))
+        personalization.with_context(defer_personalization_processing=True).personalized_json = self._design_json("edited")
+        self.assertEqual(self._get_job(personalization), job)
+
+        job._run()
+        self.assertEqual(job.state, "done")
+        new_job = self.Job._enqueue(personalization)
+        self.assertTrue(new_job)
+        self.assertEqual(self._get_job(personalization), job | new_job)
+
+    def test_run_retries_until_max_attempts(self):
+        job = self._get_job(self._create_personalization(self._design_json(), defer=True))
+        Personalization = self.registry["sale.order.line.personalization"]
+        with patch.object(Personalization, "_process_deferred", side_effect=RuntimeError("renderer down")):
+            previous_attempt = job.next_attempt
+            for attempt in range(1, MAX_ATTEMPTS):
+                job._run()
+                self.assertEqual(job.state, "pending")
+                self.assertEqual(job.attempts, attempt)
+                self.assertGreater(job.next_attempt, previous_attempt)
+                self.assertEqual(job.last_error, "renderer down")
+                previous_attempt = job.next_attempt
+            job._run()
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+
+        job.action_retry()
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.attempts, 0)
+
+    def test_run_invalid_design_fails_at_once(self):
+        personalization = self._create_personalization("not a design", defer=True)
+        job = self._get_job(personalization)
+        job._run()
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.attempts, 1)
+        self.assertTrue(job.last_error)
+        # the design is kept as sent
+        self.assertEqual(personalization.personalized_json, "not a design")
+
+    def test_deferred_matches_inline(self):
+        design = self._image_design_json(make_png("red"))
+        preview = make_png("blue")
+
+        deferred = self._create_personalization(design, preview, defer=True)
+        job = self._get_job(deferred)
+        self.assertEqual(job.state, "pending")
+        self.assertIn("data:image/png", deferred.personalized_json)
+        self.assertFalse(deferred.asset_image_ids)
+        self.assertFalse(deferred.image_id.with_context(bin_size=True).image_large)
+
+        job._run()
+        self.assertEqual(job.state, "done", job.last_error)
+
+        inline = self._create_personalization(design, preview)
+        self.assertFalse(self._get_job(inline))
+        self.env.invalidate_all()
+        for field_name in ("personalized_json", "json_checksum", "is_customized", "image_id", "asset_image_ids"):
+            self.assertEqual(deferred[field_name], inline[field_name], field_name)
+        self.assertNotIn("data:image/png", deferred.personalized_json)
+        self.assertTrue(deferred.asset_image_ids)
+        for image in (deferred.image_id | deferred.asset_image_ids).with_context(bin_size=True):
+            self.assertTrue(image.image_small and image.image_medium and image.image_large)
@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import timedelta
+
+from odoo import Command, fields
+from odoo.tests import tagged
+
+from ..tools.fabric_json import decompress_json, strip_defaults
+from .common import PersonalizerBenchmarkCommon, make_png
+
+
+@tagged("post_install", "-at_install")
+class TestPersonalizationStorage(PersonalizerBenchmarkCommon):
+
+    def test_absolute_asset_url_keeps_its_image(self):
+        personalization = self._create_personalization(self._image_design_json(make_png("green")))
+        image = personalization.asset_image_ids
+        self.assertEqual(len(image), 1)
+        relative_src = json.loads(personalization.personalized_json)["objects"][1]["src"]
+        checksum = personalization.json_checksum
+
+        # as the editor saves a reopened design: Fabric gives the source back absolute
+        design = json.loads(personalization.personalized_json)
+        design["objects"][1]["src"] = "https://shop.example.com" + relative_src
+        personalization.personalized_json = json.dumps(design)
+
+        self.assertTrue(image.exists())
+        self.assertEqual(personalization.asset_image_ids, image)
+        self.assertEqual(json.loads(personalization.personalized_json)["objects"][1]["src"], relative_src)
+        self.assertEqual(personalization.json_checksum, checksum)
+
+    def test_design_stored_compressed(self):
+        design = json.loads(self._design_json("compressed", with_upload=False))
+        design["objects"][0].update({"angle": 0, "opacity": 1, "fontSize": 40})
+        personalization = self._create_personalization(json.dumps(design, indent=2))
+        self.env.invalidate_all()
+        stored = base64.b64decode(personalization.with_context(bin_size=False).personalized_json_data)
+        self.assertEqual(decompress_json(stored), personalization.personalized_json)
+        self.assertEqual(json.loads(personalization.personalized_json), strip_defaults(design))
+
+    def test_shared_images_freed_with_last_reference(self):
+        design = self._image_design_json(make_png("purple"))
+        preview = make_png("orange")
+        first = self._create_personalization(design, preview)
+        second = self._create_personalization(design, preview, line=self.lines[1])
+        preview_image, asset_image = first.image_id, first.asset_image_ids
+        self.assertTrue(preview_image and asset_image)
+        self.assertEqual(second.image_id, preview_image)
+        self.assertEqual(second.asset_image_ids, asset_image)
+
+        # still used by the second design
+        first.write({
+            "personalized_json": self._design_json("edited", with_upload=False),
+            "product_image": base64.b64encode(make_png("olive")),
+        })
+        self.assertFalse(first.asset_image_ids)
+        self.assertNotEqual(first.image_id, preview_image)
+        self.assertTrue(preview_image.exists())
+        self.assertTrue(asset_image.exists())
+
+        second.unlink()
+        self.assertFalse(preview_image.exists())
+        self.assertFalse(asset_image.exists())
+        self.assertTrue(first.image_id.exists())
+
+    def test_cleanup_abandoned_cart_lines(self):
+        cart = self.env["sale.order"].create({
+            "partner_id": self.website.user_id.partner_id.id,
+            "website_id": self.website.id,
+            "order_line": [
+                Command.create({"product_id": self.variant.id, "product_uom_qty": 1}),
+                Command.create({"product_id": self.variant.id, "product_uom_qty": 1}),
+            ],
+        })
+        personalized_line, plain_line = cart.order_line
+        for config in self.variant.design_config_ids:
+            self._create_personalization(self._design_json(config.design_type), line=personalized_line)
+        personalizations = personalized_line.personalization_ids
+        self.assertEqual(len(personalizations), self.design_count)
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE sale_order SET write_date = %s WHERE id = %s",
+            (fields.Datetime.now() - timedelta(days=31), cart.id),
+        )
+        self.env.invalidate_all()
+
+        Personalization = self.env["sale.order.line.personalization"]
+        abandoned = Personalization.search(Personalization._get_abandoned_domain(30))
+        self.assertEqual(abandoned, personalizations)
+
+        # a batch holding part of the designs of a line still takes the whole line
+        stats = dict.fromkeys(("lines", "personalizations", "images", "bytes"), 0)
+        self.assertEqual(abandoned[:1]._cleanup_batch(stats), self.design_count)
+        self.assertFalse(personalized_line.exists())
+        self.assertFalse(personalizations.exists())
+        self.assertEqual(cart.order_line, plain_line)
+        self.assertEqual(stats["lines"], 1)
+        self.assertEqual(stats["personalizations"], self.design_count)
+        self.assertTrue(self.lines.personalization_ids)
@@ -0,0 +1,67 @@
+import io
+
+from PIL import Image
+
+from odoo.tests import tagged
+
+from .common import PersonalizerBenchmarkCommon, make_png
+
+UPLOAD_ROUTE = "/shop/personalize/upload_previews"
+
+
+@tagged("post_install", "-at_install")
+class TestPreviewUpload(PersonalizerBenchmarkCommon):
+
+    def _upload(self, files, **params):
+        query = "&".join("%s=%s" % item for item in params.items())
+        return self.url_open("%s?%s" % (UPLOAD_ROUTE, query), files={
+            design_type: ("%s.img" % design_type, content, "application/octet-stream")
+            for design_type, content in files.items()
+        })
+
+    def test_upload_for_variant(self):
+        design_types = self.variant.design_config_ids.mapped("design_type")
+        response = self._upload({design_types[0]: make_png("red")}, variant_id=self.variant.id)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body["success"])
+        checksum = body["previews"][design_types[0]]["checksum"]
+        self.assertTrue(self.env["sale.order.line.personalization.image"].search([("checksum", "=", checksum)]))
+
+    def test_upload_restrictions(self):
+        design_type = self.variant.design_config_ids[0].design_type
+        gif = io.BytesIO()
+        Image.new("RGB", (2, 2), "red").save(gif, format="GIF")
+        # mostly blank 1-bit image: small file, too many pixels
+        huge = io.BytesIO()
+        Image.new("1", (8000, 8000)).save(huge, format="PNG")
+
+        for content, error in (
+            (gif.getvalue(), "Unsupported preview format"),
+            (huge.getvalue(), "resolution"),
+            (b"not an image", "not a valid image"),
+        ):
+            body = self._upload({design_type: content}, variant_id=self.variant.id).json()
+            self.assertFalse(body["success"])
+            self.assertIn(error, body["errors"][design_type])
+
+        # sides of another product, or none at all
+        body = self._upload({"back-of-mug": make_png("red")}, variant_id=self.variant.id).json()
+        self.assertFalse(body["success"])
+        self.assertEqual(body["errors"], {"back-of-mug": "Unknown design type"})
+        plain = self.env["product.product"].create({"name": "Not Personalized"})
+        response = self._upload({design_type: make_png("red")}, variant_id=plain.id)
+        self.assertEqual(response.status_code, 403)
+
+    def test_upload_for_cart_line(self):
+        design_type = self.variant.design_config_ids[0].design_type
+        line = self._add_cart_line()
+        response = self._upload({design_type: make_png("red")}, line_id=line.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["success"])
+
+        # a line of another cart, and a line that does not exist
+        for line_id in (self.lines[0].id, self.lines[-1].id + 10 ** 6, "abc"):
+            response = self._upload({design_type: make_png("red")}, line_id=line_id)
+            self.assertEqual(response.status_code, 403, line_id)
+            self.assertEqual(response.json(), {"error": "Unknown product or cart line"})
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See LICENSE file for full copyright and licensing details.
+
+from . import fabric_json
+from . import fabric_renderer
+from . import instrumentation
+from . import json_patch
+from . import pack_archive
+from . import print_export
+from . import thumbnails
@@ -0,0 +1,138 @@
+"""Compact storage of Fabric.js 5.3.0 canvas JSON.
+
+``canvas.toJSON()`` writes every property of every object, most of them
+holding the class default. Those are dropped before storing, since Fabric
+(and the server renderer) fill them back in on load, and the remaining JSON
+is zlib-compressed.
+
+Only defaults shared by every Fabric class are stripped, plus a few
+per-type ones; ``strokeWidth`` is kept as its default differs between
+classes and it shifts the object origin.
+"""
+import json
+import zlib
+
+COMPRESSION_LEVEL = 9
+# for designs stored as sent, until they are compacted in the background
+FAST_COMPRESSION_LEVEL = 1
+
+OBJECT_DEFAULTS = {
+    "originX": "left",
+    "originY": "top",
+    "left": 0,
+    "top": 0,
+    "fill": "rgb(0,0,0)",
+    "stroke": None,
+    "strokeDashArray": None,
+    "strokeLineCap": "butt",
+    "strokeDashOffset": 0,
+    "strokeLineJoin": "miter",
+    "strokeUniform": False,
+    "strokeMiterLimit": 4,
+    "scaleX": 1,
+    "scaleY": 1,
+    "angle": 0,
+    "flipX": False,
+    "flipY": False,
+    "opacity": 1,
+    "shadow": None,
+    "visible": True,
+    "backgroundColor": "",
+    "fillRule": "nonzero",
+    "paintFirst": "fill",
+    "globalCompositeOperation": "source-over",
+    "skewX": 0,
+    "skewY": 0,
+}
+
+TEXT_DEFAULTS = {
+    "fontSize": 40,
+    "fontWeight": "normal",
+    "fontFamily": "Times New Roman",
+    "fontStyle": "normal",
+    "lineHeight": 1.16,
+    "underline": False,
+    "overline": False,
+    "linethrough": False,
+    "textAlign": "left",
+    "textBackgroundColor": "",
+    "charSpacing": 0,
+    "styles": [],
+    "direction": "ltr",
+    "path": None,
+    "pathStartOffset": 0,
+    "pathSide": "left",
+    "pathAlign": "baseline",
+}
+
+TYPE_DEFAULTS = {
+    "rect": {"rx": 0, "ry": 0},
+    "image": {"cropX": 0, "cropY": 0, "filters": [], "crossOrigin": None},
+    "text": TEXT_DEFAULTS,
+    "i-text": TEXT_DEFAULTS,
+    "textbox": dict(TEXT_DEFAULTS, minWidth=20, splitByGrapheme=False),
+}
+
+
+def _is_default(value, default):
+    # True == 1 in Python, do not let a boolean stand in for a number
+    if isinstance(value, bool) or isinstance(default, bool):
+        return value is default
+    return value == default
+
+
+def _strip_object(obj):
+    if not isinstance(obj, dict):
+        return obj
+    defaults = dict(OBJECT_DEFAULTS, **TYPE_DEFAULTS.get(obj.get("type"), {}))
+    stripped = {}
+    for key, value in obj.items():
+        if key in defaults and _is_default(value, defaults[key]):
+            continue
+        if key == "objects" and isinstance(value, list):
+            value = [_strip_object(child) for child in value]
+        elif key == "clipPath":
+            value = _strip_object(value)
+        stripped[key] = value
+    return stripped
+
+
+def strip_defaults(canvas_json):
+    """Return a copy of ``canvas_json`` without default object properties."""
+    if not isinstance(canvas_json, dict):
+        return canvas_json
+    canvas_json = dict(canvas_json)
+    if isinstance(canvas_json.get("objects"), list):
+        canvas_json["objects"] = [_strip_object(obj) for obj in canvas_json["objects"]]
+    return canvas_json
+
+
+def canonical_json(value):
+    """Stripped, key-sorted and compact form of the JSON string ``value``.
+
+    Strings that are not JSON are returned unchanged.
+    """
+    try:
+        data = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    return json.dumps(strip_defaults(data), sort_keys=True, separators=(",", ":"))
+
+
+def compress_json(value, canonical=True):
+    """Canonicalize and compress the JSON string ``value`` to bytes.
+
+    With ``canonical=False`` the string is compressed as is, and fast.
+    """
+    if not value:
+        return b""
+    if not canonical:
+        return zlib.compress(value.encode(), FAST_COMPRESSION_LEVEL)
+    return zlib.compress(canonical_json(value).encode(), COMPRESSION_LEVEL)
+
+
+def decompress_json(data):
+    """Inverse of :func:`compress_json`."""
+    if not data:
+        return ""
+    return zlib.decompress(data).decode()
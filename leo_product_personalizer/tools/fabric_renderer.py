@@ -0,0 +1,567 @@
+"""Server-side rendering of Fabric.js 5.3.0 canvas JSON with Pillow.
+
+The customizer edits designs on an 800x800 Fabric canvas whose background is
+the design config image fitted inside the canvas. This module redraws the
+``objects`` of a saved ``personalized_json`` the same way, at any output
+size, so previews and print files can be produced without client bitmaps.
+
+Everything here is pure: no ORM access, only bytes in and bytes out, so the
+functions can run in worker processes.
+"""
+import base64
+import io
+import logging
+import math
+from functools import lru_cache
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+_logger = logging.getLogger(__name__)
+
+# size of the editing canvas in product_customizer.js
+CANVAS_SIZE = 800
+# anti-aliasing factor for vector shapes, only used for moderate output sizes
+SUPERSAMPLE = 2
+SUPERSAMPLE_MAX_SIZE = 2048
+# Fabric multiplies the font size by this to get the height of a text line
+FONT_SIZE_MULT = 1.13
+CURVE_STEPS = 24
+# largest text bitmap, in layer areas: objects bigger than the layer are only
+# rasterized where they overlap it, this bounds what is left (skew, scale)
+MAX_BITMAP_LAYERS = 4
+
+ORIGINS = {"left": -0.5, "top": -0.5, "center": 0.0, "right": 0.5, "bottom": 0.5}
+TEXT_TYPES = {"text", "i-text", "textbox", "curved-text"}
+FALLBACK_FONTS = ("DejaVuSans.ttf", "LiberationSans-Regular.ttf", "Arial.ttf")
+
+
+# ----------------------------------------------------------------------
+# Matrices, as Fabric stores them: [a, b, c, d, e, f]
+# ----------------------------------------------------------------------
+
+def _multiply(m1, m2):
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (
+        a1 * a2 + c1 * b2,
+        b1 * a2 + d1 * b2,
+        a1 * c2 + c1 * d2,
+        b1 * c2 + d1 * d2,
+        a1 * e2 + c1 * f2 + e1,
+        b1 * e2 + d1 * f2 + f1,
+    )
+
+
+def _invert(m):
+    a, b, c, d, e, f = m
+    det = a * d - b * c
+    if not det:
+        return None
+    return (
+        d / det,
+        -b / det,
+        -c / det,
+        a / det,
+        (c * f - d * e) / det,
+        (b * e - a * f) / det,
+    )
+
+
+def _apply(m, x, y):
+    a, b, c, d, e, f = m
+    return (a * x + c * y + e, b * x + d * y + f)
+
+
+def _scale_of(m):
+    """Average linear scale factor of a matrix."""
+    a, b, c, d, _e, _f = m
+    return math.sqrt(abs(a * d - b * c)) or 1.0
+
+
+def _object_matrix(obj):
+    """Matrix from the object's local space (centered on 0, 0) to its parent.
+
+    Follows ``fabric.Object.calcOwnMatrix``: the origin point is moved to the
+    center, then translate, rotate, scale/flip and skew are composed.
+    """
+    width = float(obj.get("width") or 0.0)
+    height = float(obj.get("height") or 0.0)
+    stroke_width = float(obj.get("strokeWidth") or 0.0)
+    scale_x = float(obj.get("scaleX", 1.0) or 0.0)
+    scale_y = float(obj.get("scaleY", 1.0) or 0.0)
+    angle = math.radians(float(obj.get("angle") or 0.0))
+    cos, sin = math.cos(angle), math.sin(angle)
+
+    origin_x = obj.get("originX", "left")
+    origin_y = obj.get("originY", "top")
+    origin_x = ORIGINS.get(origin_x, origin_x if isinstance(origin_x, (int, float)) else -0.5)
+    origin_y = ORIGINS.get(origin_y, origin_y if isinstance(origin_y, (int, float)) else -0.5)
+    dim_x = (width + stroke_width) * scale_x
+    dim_y = (height + stroke_width) * scale_y
+    offset_x = -origin_x * dim_x
+    offset_y = -origin_y * dim_y
+    center_x = float(obj.get("left") or 0.0) + offset_x * cos - offset_y * sin
+    center_y = float(obj.get("top") or 0.0) + offset_x * sin + offset_y * cos
+
+    matrix = (cos, sin, -sin, cos, center_x, center_y)
+    dimensions = (
+        scale_x * (-1 if obj.get("flipX") else 1), 0.0,
+        0.0, scale_y * (-1 if obj.get("flipY") else 1),
+        0.0, 0.0,
+    )
+    if obj.get("skewX"):
+        dimensions = _multiply(dimensions, (1, 0, math.tan(math.radians(obj["skewX"])), 1, 0, 0))
+    if obj.get("skewY"):
+        dimensions = _multiply(dimensions, (1, math.tan(math.radians(obj["skewY"])), 0, 1, 0, 0))
+    return _multiply(matrix, dimensions)
+
+
+# ----------------------------------------------------------------------
+# Colors and fonts
+# ----------------------------------------------------------------------
+
+def _parse_color(value, opacity=1.0):
+    """Fabric color string to an RGBA tuple, or None when nothing is painted."""
+    if not value or not isinstance(value, str) or value in ("transparent", "none"):
+        return None
+    value = value.strip()
+    alpha = 1.0
+    try:
+        if value.startswith("rgba(") or value.startswith("hsla("):
+            # Fabric writes alpha as a 0-1 float, Pillow expects 0-255
+            parts = value[value.index("(") + 1:value.rindex(")")].split(",")
+            alpha = float(parts[3])
+            value = "%s(%s)" % (value[:3], ",".join(parts[:3]))
+        rgba = ImageColor.getcolor(value, "RGBA")
+    except (ValueError, IndexError):
+        _logger.debug("Unsupported Fabric color %r", value)
+        return None
+    return rgba[:3] + (round(rgba[3] * alpha * opacity),)
+
+
+@lru_cache(maxsize=64)
+def _load_font(family, size, bold=False, italic=False):
+    size = max(int(round(size)), 1)
+    family = (family or "").strip("'\" ")
+    style = ("Bold" if bold else "") + ("Italic" if italic else "")
+    candidates = []
+    if family:
+        if style:
+            candidates += [f"{family}-{style}.ttf", f"{family.replace(' ', '')}-{style}.ttf"]
+        candidates += [f"{family}.ttf", f"{family.replace(' ', '')}.ttf"]
+    candidates += list(FALLBACK_FONTS)
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+# ----------------------------------------------------------------------
+# Geometry of the supported shapes, in local coordinates
+# ----------------------------------------------------------------------
+
+def _ellipse_points(rx, ry, start=0.0, end=360.0, steps=64):
+    start, end = math.radians(start), math.radians(end)
+    return [
+        (rx * math.cos(start + (end - start) * i / steps), ry * math.sin(start + (end - start) * i / steps))
+        for i in range(steps + 1)
+    ]
+
+
+def _bbox_offset(points):
+    xs = [x for x, _y in points]
+    ys = [y for _x, y in points]
+    return (min(xs) + max(xs)) / 2.0, (min(ys) + max(ys)) / 2.0
+
+
+def _flatten_path(commands):
+    """Flatten Fabric path commands (absolute M/L/H/V/C/Q/Z) into subpaths."""
+    subpaths, current = [], []
+    x = y = start_x = start_y = 0.0
+    for command in commands or []:
+        if not command:
+            continue
+        op, args = command[0], [float(v) for v in command[1:]]
+        if op == "M":
+            if len(current) > 1:
+                subpaths.append((current, False))
+            x, y = start_x, start_y = args[0], args[1]
+            current = [(x, y)]
+        elif op == "L":
+            x, y = args[0], args[1]
+            current.append((x, y))
+        elif op == "H":
+            x = args[0]
+            current.append((x, y))
+        elif op == "V":
+            y = args[0]
+            current.append((x, y))
+        elif op == "C":
+            x1, y1, x2, y2, x3, y3 = args[:6]
+            for i in range(1, CURVE_STEPS + 1):
+                t = i / CURVE_STEPS
+                mt = 1 - t
+                current.append((
+                    mt ** 3 * x + 3 * mt ** 2 * t * x1 + 3 * mt * t ** 2 * x2 + t ** 3 * x3,
+                    mt ** 3 * y + 3 * mt ** 2 * t * y1 + 3 * mt * t ** 2 * y2 + t ** 3 * y3,
+                ))
+            x, y = x3, y3
+        elif op == "Q":
+            x1, y1, x2, y2 = args[:4]
+            for i in range(1, CURVE_STEPS + 1):
+                t = i / CURVE_STEPS
+                mt = 1 - t
+                current.append((
+                    mt ** 2 * x + 2 * mt * t * x1 + t ** 2 * x2,
+                    mt ** 2 * y + 2 * mt * t * y1 + t ** 2 * y2,
+                ))
+            x, y = x2, y2
+        elif op in ("Z", "z"):
+            if len(current) > 1:
+                subpaths.append((current, True))
+            current = [(start_x, start_y)]
+            x, y = start_x, start_y
+        else:
+            _logger.debug("Unsupported path command %r", op)
+    if len(current) > 1:
+        subpaths.append((current, False))
+    return subpaths
+
+
+def _shape_subpaths(obj):
+    """Local outline of a vector object as ``[(points, closed), ...]``."""
+    kind = obj.get("type")
+    width = float(obj.get("width") or 0.0)
+    height = float(obj.get("height") or 0.0)
+    if kind == "rect":
+        w, h = width / 2.0, height / 2.0
+        return [([(-w, -h), (w, -h), (w, h), (-w, h)], True)]
+    if kind == "circle":
+        radius = float(obj.get("radius") or 0.0)
+        start = float(obj.get("startAngle") or 0.0)
+        end = float(obj.get("endAngle", 360.0))
+        return [(_ellipse_points(radius, radius, start, end), True)]
+    if kind == "ellipse":
+        return [(_ellipse_points(float(obj.get("rx") or 0.0), float(obj.get("ry") or 0.0)), True)]
+    if kind == "triangle":
+        w, h = width / 2.0, height / 2.0
+        return [([(-w, h), (0.0, -h), (w, h)], True)]
+    if kind == "line":
+        return [([
+            (float(obj.get("x1") or 0.0), float(obj.get("y1") or 0.0)),
+            (float(obj.get("x2") or 0.0), float(obj.get("y2") or 0.0)),
+        ], False)]
+    if kind in ("polygon", "polyline"):
+        points = [(float(p["x"]), float(p["y"])) for p in obj.get("points") or []]
+        if not points:
+            return []
+        off_x, off_y = _bbox_offset(points)
+        return [([(x - off_x, y - off_y) for x, y in points], kind == "polygon")]
+    if kind == "path":
+        subpaths = _flatten_path(obj.get("path"))
+        all_points = [p for points, _closed in subpaths for p in points]
+        if not all_points:
+            return []
+        off_x, off_y = _bbox_offset(all_points)
+        return [([(x - off_x, y - off_y) for x, y in points], closed) for points, closed in subpaths]
+    return None
+
+
+# ----------------------------------------------------------------------
+# Renderer
+# ----------------------------------------------------------------------
+
+def decode_data_url(src):
+    """Raw bytes of a ``data:`` URL, or None."""
+    if not isinstance(src, str) or not src.startswith("data:") or "," not in src:
+        return None
+    try:
+        return base64.b64decode(src.split(",", 1)[1])
+    except ValueError:
+        return None
+
+
+def _visible_local_box(matrix, width, height, layer):
+    """Part of the ``width`` x ``height`` box of an object that ``matrix``
+    puts over ``layer``, as (left, top, right, bottom) from the box corner,
+    or None when the object is off the layer."""
+    inverse = _invert(matrix)
+    if not inverse:
+        return None
+    # one pixel of margin around the layer for the resampling at the edges
+    corners = [
+        _apply(inverse, x, y)
+        for x, y in ((-1, -1), (layer.width + 1, -1), (layer.width + 1, layer.height + 1), (-1, layer.height + 1))
+    ]
+    left = max(min(x for x, _y in corners) + width / 2.0, 0.0)
+    top = max(min(y for _x, y in corners) + height / 2.0, 0.0)
+    right = min(max(x for x, _y in corners) + width / 2.0, width)
+    bottom = min(max(y for _x, y in corners) + height / 2.0, height)
+    if left >= right or top >= bottom:
+        return None
+    return left, top, right, bottom
+
+
+class FabricRenderer:
+    """Draw Fabric objects onto a Pillow image.
+
+    :param int size: output width and height in pixels
+    :param dict images: raw image bytes of the non ``data:`` sources used by
+        image objects, keyed by their ``src``
+    """
+
+    def __init__(self, size=CANVAS_SIZE, images=None):
+        self.size = int(size)
+        self.images = images or {}
+        self.supersample = SUPERSAMPLE if self.size <= SUPERSAMPLE_MAX_SIZE else 1
+        self.scale = self.size / CANVAS_SIZE
+
+    def render(self, canvas_json, background=None, clip_box=None):
+        """Return the composited RGBA image.
+
+        :param dict canvas_json: Fabric ``toJSON`` output
+        :param bytes background: background image, fitted like the editor does
+        :param tuple clip_box: (left, top, right, bottom) in canvas pixels;
+            objects are clipped to this restricted area
+        """
+        canvas = Image.new("RGBA", (self.size, self.size), (0, 0, 0, 0))
+        if background:
+            self._draw_background(canvas, background)
+
+        work_size = self.size * self.supersample
+        layer = Image.new("RGBA", (work_size, work_size), (0, 0, 0, 0))
+        viewport = (self.scale * self.supersample, 0.0, 0.0, self.scale * self.supersample, 0.0, 0.0)
+        for obj in (canvas_json or {}).get("objects") or []:
+            if not isinstance(obj, dict) or obj.get("isZoneRect") or obj.get("name") == "zoneRect":
+                continue
+            try:
+                self._draw_object(layer, obj, viewport, 1.0)
+            except Exception:
+                _logger.warning("Could not render Fabric object of type %s", obj.get("type"), exc_info=True)
+        if self.supersample > 1:
+            layer = layer.resize((self.size, self.size), Image.LANCZOS)
+
+        if clip_box:
+            mask = Image.new("L", (self.size, self.size), 0)
+            left, top, right, bottom = (round(v * self.scale) for v in clip_box)
+            ImageDraw.Draw(mask).rectangle((left, top, right - 1, bottom - 1), fill=255)
+            alpha = Image.composite(layer.getchannel("A"), mask, mask)
+            layer.putalpha(alpha)
+
+        canvas.alpha_composite(layer)
+        return canvas
+
+    def _draw_background(self, canvas, background):
+        try:
+            image = Image.open(io.BytesIO(background))
+            image.load()
+        except Exception:
+            _logger.warning("Could not decode the personalization background", exc_info=True)
+            return
+        image = image.convert("RGBA")
+        # same "contain" fit as _applyBackgroundImage in product_customizer.js
+        fit = min(self.size / image.width, self.size / image.height)
+        width, height = max(round(image.width * fit), 1), max(round(image.height * fit), 1)
+        image = image.resize((width, height), Image.LANCZOS)
+        canvas.alpha_composite(image, ((self.size - width) // 2, (self.size - height) // 2))
+
+    def _draw_object(self, layer, obj, parent_matrix, parent_opacity):
+        if obj.get("visible") is False:
+            return
+        matrix = _multiply(parent_matrix, _object_matrix(obj))
+        opacity = parent_opacity * float(1.0 if obj.get("opacity") is None else obj["opacity"])
+        kind = obj.get("type")
+        if kind == "group":
+            for child in obj.get("objects") or []:
+                self._draw_object(layer, child, matrix, opacity)
+        elif kind in TEXT_TYPES:
+            self._draw_text(layer, obj, matrix, opacity)
+        elif kind == "image":
+            self._draw_image(layer, obj, matrix, opacity)
+        else:
+            self._draw_shape(layer, obj, matrix, opacity)
+
+    def _draw_shape(self, layer, obj, matrix, opacity):
+        subpaths = _shape_subpaths(obj)
+        if not subpaths:
+            if subpaths is None:
+                _logger.debug("Unsupported Fabric object type %r", obj.get("type"))
+            return
+        fill = _parse_color(obj.get("fill", "rgb(0,0,0)"), opacity)
+        stroke = _parse_color(obj.get("stroke"), opacity)
+        stroke_width = max(round(float(obj.get("strokeWidth") or 0.0) * _scale_of(matrix)), 1)
+        if obj.get("type") == "line":
+            fill = None
+
+        transformed = [([_apply(matrix, x, y) for x, y in points], closed) for points, closed in subpaths]
+        xs = [x for points, _c in transformed for x, _y in points]
+        ys = [y for points, _c in transformed for _x, y in points]
+        pad = stroke_width + 2
+        box = (
+            max(int(min(xs)) - pad, 0), max(int(min(ys)) - pad, 0),
+            min(int(max(xs)) + pad, layer.width), min(int(max(ys)) + pad, layer.height),
+        )
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return
+        shape = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(shape)
+        for points, closed in transformed:
+            points = [(x - box[0], y - box[1]) for x, y in points]
+            if fill and closed and len(points) > 2:
+                draw.polygon(points, fill=fill)
+            if stroke and float(obj.get("strokeWidth") or 0.0) > 0:
+                draw.line(points + (points[:1] if closed else []), fill=stroke, width=stroke_width, joint="curve")
+        layer.alpha_composite(shape, box[:2])
+
+    def _draw_text(self, layer, obj, matrix, opacity):
+        text = str(obj.get("text") or "")
+        fill = _parse_color(obj.get("fill", "rgb(0,0,0)"), opacity)
+        if not text or not fill:
+            return
+        width = float(obj.get("width") or 0.0)
+        height = float(obj.get("height") or 0.0)
+        if width <= 0 or height <= 0:
+            return
+        # raster the part of the text over the layer at the final resolution,
+        # then place it like an image
+        visible = _visible_local_box(matrix, width, height, layer)
+        if not visible:
+            return
+        left, top, right, bottom = visible
+        density = max(_scale_of(matrix), 0.01)
+        max_pixels = MAX_BITMAP_LAYERS * layer.width * layer.height
+        density = min(density, math.sqrt(max_pixels / max((right - left) * (bottom - top), 1e-6)))
+        font_size = float(obj.get("fontSize") or 40) * density
+        font = _load_font(
+            obj.get("fontFamily") or "",
+            font_size,
+            bold=str(obj.get("fontWeight")) in ("bold", "700", "800", "900"),
+            italic=obj.get("fontStyle") == "italic",
+        )
+        bitmap = Image.new(
+            "RGBA",
+            (max(round((right - left) * density), 1), max(round((bottom - top) * density), 1)),
+            (0, 0, 0, 0),
+        )
+        draw = ImageDraw.Draw(bitmap)
+        line_height = font_size * FONT_SIZE_MULT * float(obj.get("lineHeight") or 1.16)
+        align = obj.get("textAlign") or "left"
+        # the bitmap starts at (left, top) of the text box
+        anchor, x = {
+            "center": ("ma", width * density / 2.0),
+            "right": ("ra", width * density),
+        }.get(align, ("la", 0.0))
+        x -= left * density
+        y = -top * density
+        for line in text.split("\n"):
+            if y > bitmap.height:
+                break
+            if y + line_height < 0:
+                y += line_height
+                continue
+            draw.text((x, y), line, font=font, fill=fill, anchor=anchor)
+            if obj.get("underline"):
+                line_width = draw.textlength(line, font=font)
+                start = {"ma": x - line_width / 2.0, "ra": x - line_width}.get(anchor, x)
+                baseline = y + font_size * 0.95
+                draw.line((start, baseline, start + line_width, baseline), fill=fill, width=max(round(font_size / 15), 1))
+            y += line_height
+        self._paste_transformed(layer, bitmap, matrix, width, height, visible)
+
+    def _draw_image(self, layer, obj, matrix, opacity):
+        src = obj.get("src")
+        raw = decode_data_url(src) or self.images.get(src)
+        if not raw:
+            _logger.debug("Image source not available for rendering: %.80s", src)
+            return
+        try:
+            image = Image.open(io.BytesIO(raw))
+            image.load()
+        except Exception:
+            _logger.warning("Could not decode image object", exc_info=True)
+            return
+        image = image.convert("RGBA")
+        width = float(obj.get("width") or image.width)
+        height = float(obj.get("height") or image.height)
+        if width <= 0 or height <= 0:
+            return
+        crop_x = float(obj.get("cropX") or 0.0)
+        crop_y = float(obj.get("cropY") or 0.0)
+        # what the box shows of the image; around it the box is transparent,
+        # so nothing larger than the image itself is allocated
+        source = (
+            max(round(crop_x), 0), max(round(crop_y), 0),
+            min(round(crop_x + width), image.width), min(round(crop_y + height), image.height),
+        )
+        if source[0] >= source[2] or source[1] >= source[3]:
+            return
+        if source != (0, 0, image.width, image.height):
+            image = image.crop(source)
+        if opacity < 1.0:
+            image.putalpha(image.getchannel("A").point(lambda a: round(a * opacity)))
+        local_box = (source[0] - crop_x, source[1] - crop_y, source[2] - crop_x, source[3] - crop_y)
+        self._paste_transformed(layer, image, matrix, width, height, local_box)
+
+    def _paste_transformed(self, layer, bitmap, matrix, width, height, local_box=None):
+        """Composite ``bitmap`` through ``matrix``.
+
+        :param tuple local_box: (left, top, right, bottom) of the object box
+            of ``width`` x ``height`` covered by ``bitmap``, all of it by default
+        """
+        left, top, right, bottom = local_box or (0.0, 0.0, width, height)
+        to_local = (
+            (right - left) / bitmap.width, 0.0,
+            0.0, (bottom - top) / bitmap.height,
+            left - width / 2.0, top - height / 2.0,
+        )
+        to_layer = _multiply(matrix, to_local)
+        corners = [_apply(to_layer, x, y) for x, y in ((0, 0), (bitmap.width, 0), (bitmap.width, bitmap.height), (0, bitmap.height))]
+        box = (
+            max(int(min(x for x, _y in corners)) - 1, 0),
+            max(int(min(y for _x, y in corners)) - 1, 0),
+            min(int(math.ceil(max(x for x, _y in corners))) + 1, layer.width),
+            min(int(math.ceil(max(y for _x, y in corners))) + 1, layer.height),
+        )
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return
+        inverse = _invert(to_layer)
+        if not inverse:
+            return
+        # output pixel (u, v) of the patch is layer pixel (u + box.x, v + box.y)
+        inverse = _multiply(inverse, (1, 0, 0, 1, box[0], box[1]))
+        a, b, c, d, e, f = inverse
+        patch = bitmap.transform(
+            (box[2] - box[0], box[3] - box[1]),
+            Image.AFFINE,
+            (a, c, e, b, d, f),
+            resample=Image.BICUBIC,
+        )
+        layer.alpha_composite(patch, box[:2])
+
+
+def render_fabric_json(canvas_json, background=None, clip_box=None, size=CANVAS_SIZE,
+                       images=None, output_format="PNG"):
+    """Render a Fabric canvas JSON and return the encoded image bytes.
+
+    :param dict canvas_json: Fabric ``toJSON`` output
+    :param bytes background: design config (or variant) image
+    :param tuple clip_box: restricted area (left, top, right, bottom) in
+        canvas pixels
+    :param int size: output width and height in pixels
+    :param dict images: raw bytes of the URL image sources, keyed by ``src``
+    :param str output_format: any Pillow format, e.g. PNG, JPEG or WEBP
+    """
+    image = FabricRenderer(size=size, images=images).render(canvas_json, background, clip_box)
+    output_format = output_format.upper()
+    if output_format in ("JPEG", "JPG"):
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        image, output_format = flat, "JPEG"
+    stream = io.BytesIO()
+    image.save(stream, format=output_format, optimize=True)
+    return stream.getvalue()
@@ -0,0 +1,92 @@
+"""Sampled timing and SQL counting of the personalizer requests.
+
+A :class:`RequestProfile` is attached to the running request by
+:func:`start_profile`; the code of the request then records its phases with
+:func:`phase` and its payload sizes with :func:`add_size`. Both are no-ops
+when the request was not sampled, so they can stay in hot paths.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_profile = ContextVar("leo_product_personalizer_profile", default=None)
+
+
+class RequestProfile:
+    """Timings, query counts and sizes measured during one request."""
+
+    def __init__(self, route, cr):
+        self.route = route
+        self.cr = cr
+        self.start = time.perf_counter()
+        self.start_queries = cr.sql_log_count
+        self.phases = {}
+        self.sizes = {}
+        self.image_sizes = {}
+        self.duration = 0.0
+        self.query_count = 0
+
+    def add_phase(self, name, duration, query_count):
+        total_duration, total_queries, count = self.phases.get(name, (0.0, 0, 0))
+        self.phases[name] = (total_duration + duration, total_queries + query_count, count + 1)
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.start
+        self.query_count = self.cr.sql_log_count - self.start_queries
+
+    def to_dict(self):
+        return {
+            "route": self.route,
+            "duration_ms": round(self.duration * 1000, 2),
+            "query_count": self.query_count,
+            "sizes": self.sizes,
+            "image_sizes": self.image_sizes,
+            "phases": {
+                name: {"duration_ms": round(duration * 1000, 2), "query_count": queries, "calls": calls}
+                for name, (duration, queries, calls) in self.phases.items()
+            },
+        }
+
+
+def current_profile():
+    """The profile of the running request, None when it is not sampled."""
+    return _current_profile.get()
+
+
+@contextmanager
+def start_profile(route, cr):
+    """Profile the code run inside the block."""
+    profile = RequestProfile(route, cr)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.stop()
+        _current_profile.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Add the time and queries of the block to the phase ``name``."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    start_queries = profile.cr.sql_log_count
+    try:
+        yield
+    finally:
+        profile.add_phase(name, time.perf_counter() - start, profile.cr.sql_log_count - start_queries)
+
+
+def add_size(name, size, design_type=None):
+    """Record a payload size in bytes, per design type for images."""
+    profile = _current_profile.get()
+    if profile is None or size is None:
+        return
+    if design_type:
+        key = "%s:%s" % (design_type, name)
+        profile.image_sizes[key] = profile.image_sizes.get(key, 0) + size
+    else:
+        profile.sizes[name] = profile.sizes.get(name, 0) + size
@@ -0,0 +1,102 @@
+"""Minimal JSON Patch (RFC 6902) for design deltas.
+
+Supports the ``add``, ``remove``, ``replace`` and ``test`` operations, which
+is what the customizer sends. ``replace`` of a missing object member adds
+it, as drafts may be stored without some members the client has.
+"""
+import copy
+
+
+class JsonPatchError(ValueError):
+    """The patch does not apply to the document."""
+
+
+def _parse_pointer(pointer):
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise JsonPatchError("Invalid JSON pointer %r" % (pointer,))
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _index(container, token, allow_end=False):
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise JsonPatchError("Invalid array index %r" % token)
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError("Array index %s out of range" % index)
+    return index
+
+
+def _resolve_parent(document, tokens):
+    target = document
+    for token in tokens[:-1]:
+        if isinstance(target, list):
+            target = target[_index(target, token)]
+        elif isinstance(target, dict) and token in target:
+            target = target[token]
+        else:
+            raise JsonPatchError("Path not found: /%s" % "/".join(tokens))
+    return target
+
+
+def _apply_operation(document, operation):
+    op = operation.get("op")
+    tokens = _parse_pointer(operation.get("path"))
+    if not tokens:
+        if op in ("add", "replace"):
+            return copy.deepcopy(operation["value"])
+        if op == "test":
+            if document != operation.get("value"):
+                raise JsonPatchError("Test failed at the root")
+            return document
+        raise JsonPatchError("Cannot %s the root" % op)
+
+    parent = _resolve_parent(document, tokens)
+    key = tokens[-1]
+    if isinstance(parent, list):
+        if op == "add":
+            parent.insert(_index(parent, key, allow_end=True), copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            del parent[_index(parent, key)]
+        elif op == "replace":
+            parent[_index(parent, key)] = copy.deepcopy(operation["value"])
+        elif op == "test":
+            if parent[_index(parent, key)] != operation.get("value"):
+                raise JsonPatchError("Test failed at %s" % operation["path"])
+        else:
+            raise JsonPatchError("Unsupported operation %r" % op)
+    elif isinstance(parent, dict):
+        if op in ("add", "replace"):
+            parent[key] = copy.deepcopy(operation["value"])
+        elif op == "remove":
+            if key not in parent:
+                raise JsonPatchError("Path not found: %s" % operation["path"])
+            del parent[key]
+        elif op == "test":
+            if parent.get(key) != operation.get("value"):
+                raise JsonPatchError("Test failed at %s" % operation["path"])
+        else:
+            raise JsonPatchError("Unsupported operation %r" % op)
+    else:
+        raise JsonPatchError("Path not found: %s" % operation["path"])
+    return document
+
+
+def apply_patch(document, patch):
+    """Return a copy of ``document`` with the operations of ``patch`` applied.
+
+    :raise JsonPatchError: when an operation does not apply
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError("A patch is a list of operations")
+    document = copy.deepcopy(document)
+    for operation in patch:
+        if not isinstance(operation, dict) or "path" not in operation:
+            raise JsonPatchError("Invalid operation %r" % (operation,))
+        if operation.get("op") in ("add", "replace") and "value" not in operation:
+            raise JsonPatchError("Missing value in %r" % (operation,))
+        document = _apply_operation(document, operation)
+    return document
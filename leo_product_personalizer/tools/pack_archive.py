@@ -0,0 +1,133 @@
+"""Immutable pack files holding archived design payloads.
+
+A pack is written once and never modified::
+
+    header   b"LPPK" + version (uint8) + 3 padding bytes
+    blobs    the payloads, one after the other
+    index    one (record id, offset, length, crc32) entry per payload,
+             sorted by record id
+    footer   index offset (uint64) + entry count (uint32) + b"LPPK"
+
+Packs are read through a memory map and the index is binary searched in
+place, so opening a pack costs no more than reading its footer, and the
+pages of the payloads that are never read are never loaded.
+"""
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+MAGIC = b"LPPK"
+VERSION = 1
+HEADER = struct.Struct("<4sB3x")
+ENTRY = struct.Struct("<QQII")
+FOOTER = struct.Struct("<QI4s")
+PACK_SUFFIX = ".lpp"
+# open packs kept mapped, per process
+MAX_OPEN_PACKS = 32
+
+
+class PackError(ValueError):
+    """The pack file is missing, corrupted or does not hold the record."""
+
+
+def write_pack(path, entries):
+    """Write the ``(record id, payload bytes)`` of ``entries`` to a new pack.
+
+    The pack is written to a temporary file and moved in place once synced,
+    so a pack is either complete or absent.
+
+    :return: number of payloads written
+    """
+    index = []
+    tmp_path = "%s.tmp" % path
+    with open(tmp_path, "wb") as pack:
+        pack.write(HEADER.pack(MAGIC, VERSION))
+        offset = HEADER.size
+        for record_id, payload in entries:
+            pack.write(payload)
+            index.append((record_id, offset, len(payload), zlib.crc32(payload)))
+            offset += len(payload)
+        index.sort()
+        for entry in index:
+            pack.write(ENTRY.pack(*entry))
+        pack.write(FOOTER.pack(offset, len(index), MAGIC))
+        pack.flush()
+        os.fsync(pack.fileno())
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+class PackReader:
+    """Memory-mapped read access to the payloads of one pack."""
+
+    def __init__(self, path):
+        with open(path, "rb") as pack:
+            try:
+                self._map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise PackError("Invalid pack %s" % path) from e
+        if len(self._map) < HEADER.size + FOOTER.size:
+            raise PackError("Truncated pack %s" % path)
+        magic, version = HEADER.unpack_from(self._map, 0)
+        self._index_offset, self._count, end_magic = FOOTER.unpack_from(self._map, len(self._map) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC or version != VERSION:
+            raise PackError("Invalid pack %s" % path)
+        self.path = path
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, position):
+        return ENTRY.unpack_from(self._map, self._index_offset + position * ENTRY.size)
+
+    def get(self, record_id):
+        """Payload of ``record_id``, None when the pack does not hold it."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry_id, offset, length, crc = self._entry(middle)
+            if entry_id == record_id:
+                payload = self._map[offset:offset + length]
+                if zlib.crc32(payload) != crc:
+                    raise PackError("Corrupted payload %s in pack %s" % (record_id, self.path))
+                return payload
+            if entry_id < record_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self):
+        self._map.close()
+
+
+_readers = OrderedDict()
+_readers_lock = threading.Lock()
+
+
+def get_reader(path):
+    """Shared reader of the pack at ``path``, mapped on first use."""
+    with _readers_lock:
+        reader = _readers.get(path)
+        if reader is not None:
+            _readers.move_to_end(path)
+            return reader
+    if not os.path.exists(path):
+        raise PackError("Missing pack %s" % path)
+    reader = PackReader(path)
+    with _readers_lock:
+        _readers[path] = reader
+        while len(_readers) > MAX_OPEN_PACKS:
+            # readers still in use by another thread keep their own reference
+            _readers.popitem(last=False)
+    return reader
+
+
+def drop_reader(path):
+    """Forget the shared reader of a pack, e.g. once the pack is deleted."""
+    with _readers_lock:
+        # readers still in use by another thread keep their own reference
+        _readers.pop(path, None)
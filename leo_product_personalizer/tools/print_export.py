@@ -0,0 +1,114 @@
+"""Parallel rendering of print files into a streamed ZIP archive.
+
+Designs are rendered by :func:`render_fabric_json`, in the current
+process or in a pool of forked processes. Jobs are pulled lazily and only a
+few are in flight at a time, and the archive is yielded file by file, so
+memory stays bounded whatever the size of the export.
+
+The pool is forked by :func:`start_render_pool` before any cursor is
+opened: a child must not inherit a connection the parent is using.
+"""
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .fabric_renderer import render_fabric_json
+
+_logger = logging.getLogger(__name__)
+
+# jobs submitted ahead of the results, per worker process
+PENDING_PER_WORKER = 2
+
+
+def _render_job(job):
+    name, render_kwargs = job
+    try:
+        return name, render_fabric_json(**render_kwargs), None
+    except Exception as e:
+        return name, None, str(e)
+
+
+def start_render_pool(workers):
+    """Fork the processes rendering an export.
+
+    All the processes are forked right away, so this must be called before
+    a cursor is opened.
+
+    :param int workers: number of processes, capped to the number of cores
+    :return: the executor, None when the jobs are to be rendered in the
+        current process, i.e. for 1 worker or when processes cannot be forked
+    """
+    workers = min(workers or 1, os.cpu_count() or 1)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    # fork: the children only run pure rendering code, and they do not need
+    # to re-import the addons like spawned processes would
+    executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    # a forking pool starts all its processes on the first submission
+    executor.submit(int).result()
+    return executor
+
+
+def render_jobs(jobs, executor=None, workers=1):
+    """Render ``(name, render_fabric_json kwargs)`` jobs.
+
+    :param jobs: iterable of jobs, consumed lazily
+    :param executor: pool returned by :func:`start_render_pool`, the jobs
+        are rendered in the current process without one
+    :param int workers: size of the pool, to bound the jobs in flight
+    :return: generator of ``(name, content, error)`` in completion order
+    """
+    if executor is None:
+        yield from map(_render_job, jobs)
+        return
+
+    jobs = iter(jobs)
+    max_pending = workers * PENDING_PER_WORKER
+    pending = set()
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_pending:
+            job = next(jobs, None)
+            if job is None:
+                exhausted = True
+            else:
+                pending.add(executor.submit(_render_job, job))
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+class _ZipStream:
+    """Write-only file object collecting what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(files):
+    """Yield a ZIP archive of the ``(name, content)`` pairs, file by file.
+
+    Entries are stored uncompressed: PNG and JPEG do not compress further.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_STORED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+            yield stream.pop()
+    yield stream.pop()
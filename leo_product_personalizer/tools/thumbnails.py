@@ -0,0 +1,32 @@
+"""Small encoded derivatives of personalization previews."""
+import io
+
+from PIL import Image, features
+
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_format():
+    """WebP when this Pillow build supports it, JPEG otherwise."""
+    return "WEBP" if features.check("webp") else "JPEG"
+
+
+def make_thumbnail(raw, max_size, quality=THUMBNAIL_QUALITY):
+    """Return ``raw`` fitted inside a ``max_size`` square, encoded as WebP/JPEG.
+
+    Images are never upscaled. JPEG has no alpha channel, so transparent
+    areas are flattened on white, like the cart and backend show them.
+    """
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    image = image.convert("RGBA")
+    image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output_format = thumbnail_format()
+    if output_format == "JPEG":
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        image = flat
+    options = {"method": 4} if output_format == "WEBP" else {"optimize": True}
+    stream = io.BytesIO()
+    image.save(stream, format=output_format, quality=quality, **options)
+    return stream.getvalue()